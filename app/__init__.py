@@ -1 +1,2 @@
-# This file is intentionally left empty to make this directory a Python package 
\ No newline at end of file
+# Loads .env and the shared settings before any other module of the package
+from . import settings
@@ -0,0 +1,148 @@
+import asyncio
+import os
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Deque, Dict
+
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .settings import settings
+
+# Requests let through at once per class; past that they queue. Admin traffic has
+# its own slots, so a flood of public requests never queues or sheds it
+ADMISSION_PUBLIC_READ_LIMIT = int(os.getenv("ADMISSION_PUBLIC_READ_LIMIT", "32"))
+# Subscribes are written in batches, so writes keep enough slots to fill one
+ADMISSION_PUBLIC_WRITE_LIMIT = int(os.getenv("ADMISSION_PUBLIC_WRITE_LIMIT", "64"))
+ADMISSION_ADMIN_LIMIT = int(os.getenv("ADMISSION_ADMIN_LIMIT", "8"))
+# Waiting requests per class; further requests are shed straight away
+ADMISSION_QUEUE_LENGTH = int(os.getenv("ADMISSION_QUEUE_LENGTH", "128"))
+# How long a request may wait for a slot before it is shed; admins wait longer
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "250"))
+ADMISSION_ADMIN_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_ADMIN_QUEUE_TIMEOUT_MS", "5000"))
+# Seconds sent in Retry-After on a 503
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# Liveness checks must answer under load, or the platform restarts a busy machine
+EXEMPT_PATHS = {"/health"}
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+@dataclass
+class GateStats:
+    admitted: int = 0
+    queued: int = 0
+    shed_queue_full: int = 0
+    shed_timeout: int = 0
+
+class Gate:
+    """
+    At most `limit` requests in flight; up to `queue_length` more wait, first
+    come first served, for at most `timeout` seconds each
+    """
+
+    def __init__(self, limit: int, queue_length: int, timeout: float):
+        self.limit = limit
+        self.queue_length = queue_length
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.stats = GateStats()
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting for one if needed; False if the request should be shed"""
+        if self.in_flight < self.limit and not self.waiters:
+            self.in_flight += 1
+            self.stats.admitted += 1
+            return True
+        if len(self.waiters) >= self.queue_length:
+            self.stats.shed_queue_full += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.stats.queued += 1
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            if not (waiter.done() and not waiter.cancelled()):
+                self.stats.shed_timeout += 1
+                return False
+            # The slot was handed over just as the deadline hit: use it
+        except BaseException:
+            # Client gone while waiting: give back a slot handed over meanwhile
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+        self.stats.admitted += 1
+        return True
+
+    def release(self) -> None:
+        """Hand the slot to the next waiter still waiting, or free it"""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot passes on; in_flight stays the same
+                return
+        self.in_flight -= 1
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**asdict(self.stats), "in_flight": self.in_flight, "waiting": len(self.waiters)}
+
+gates: Dict[str, Gate] = {
+    "admin": Gate(ADMISSION_ADMIN_LIMIT, ADMISSION_QUEUE_LENGTH, ADMISSION_ADMIN_QUEUE_TIMEOUT_MS / 1000),
+    "public_read": Gate(ADMISSION_PUBLIC_READ_LIMIT, ADMISSION_QUEUE_LENGTH, ADMISSION_QUEUE_TIMEOUT_MS / 1000),
+    "public_write": Gate(ADMISSION_PUBLIC_WRITE_LIMIT, ADMISSION_QUEUE_LENGTH, ADMISSION_QUEUE_TIMEOUT_MS / 1000),
+}
+
+def route_class(scope: Scope) -> str:
+    """
+    Admin if the request carries the right admin password (a wrong one is
+    public, so it cannot jump the queue), else by method
+    """
+    if Headers(scope=scope).get("x-admin-password") == settings.admin_password:
+        return "admin"
+    return "public_read" if scope["method"] in READ_METHODS else "public_write"
+
+def snapshot() -> Dict[str, Dict[str, int]]:
+    return {name: gate.snapshot() for name, gate in gates.items()}
+
+def prometheus_extra() -> Dict[str, int]:
+    """Counters and gauges for render_prometheus, e.g. admission_public_read_shed_timeout_total"""
+    extra = {}
+    for route_class, gate in gates.items():
+        for name, value in gate.snapshot().items():
+            suffix = "" if name in ("in_flight", "waiting") else "_total"
+            extra[f"admission_{route_class}_{name}{suffix}"] = value
+    return extra
+
+class AdmissionMiddleware:
+    """
+    Caps in-flight requests per route class, so that under a spike requests
+    wait briefly or get a 503 with Retry-After instead of all slowing down
+    together on the database
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        gate = gates[route_class(scope)]
+        if not await gate.acquire():
+            response = ORJSONResponse(
+                {"detail": "Server is busy, please retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
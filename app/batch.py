@@ -0,0 +1,44 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fastapi import HTTPException, status
+
+# Most items one multi-get may ask for; keeps the IN list and the response bounded
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
+
+def parse_keys(raw: str, name: str = "keys") -> List[str]:
+    """Comma-separated keys, de-duplicated in request order"""
+    keys = list(dict.fromkeys(key.strip() for key in raw.split(",") if key.strip()))
+    if not keys:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"`{name}` must list at least one value"
+        )
+    if len(keys) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"`{name}` may list at most {MAX_BATCH_SIZE} values"
+        )
+    return keys
+
+def parse_ids(raw: str, name: str = "ids") -> List[int]:
+    """Comma-separated integer ids, de-duplicated in request order"""
+    try:
+        return list(dict.fromkeys(int(key) for key in parse_keys(raw, name)))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"`{name}` must be comma-separated integers"
+        )
+
+def keyed(items: Iterable[Dict[str, Any]], field: str, requested: List[Any], include: Optional[Set[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Map each requested key to its item, in request order. Keys with no
+    matching row are left out. `include` limits the fields of each item.
+    """
+    found = {item[field]: item for item in items}
+    return {
+        str(key): found[key] if include is None else {name: value for name, value in found[key].items() if name in include}
+        for key in requested
+        if key in found
+    }
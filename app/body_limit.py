@@ -0,0 +1,54 @@
+from typing import Dict
+
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+def too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request body is larger than {limit // (1024 * 1024)} MB")
+
+class BodyLimitMiddleware:
+    """
+    Rejects request bodies above a per-path limit with 413 before they are
+    parsed. The form parser otherwise receives and spools the whole body to
+    disk before the handler can look at the file size.
+
+    A Content-Length over the limit is answered without reading the body; a
+    body sent without one (or with a wrong one) is cut off once it passes
+    the limit.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            error = too_large(limit)
+            # Connection: close, as the unread body is still on its way
+            response = ORJSONResponse({"detail": error.detail}, status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the route while it parses the form, so it becomes a 413
+                    raise too_large(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
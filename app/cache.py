@@ -0,0 +1,279 @@
+import hashlib
+import os
+import time
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from . import coherence, serialization
+
+logger = logging.getLogger(__name__)
+
+# Public reads only change when an admin writes, so entries can live a while;
+# the TTL mainly bounds staleness of the date-based `upcoming` filter
+CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))  # seconds
+CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Per-entry overhead on top of the body (key, headers, bookkeeping), rough estimate
+ENTRY_OVERHEAD = 256
+# How long browsers and a CDN may reuse a public read before revalidating with the ETag
+HTTP_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "30"))  # seconds
+CACHE_CONTROL = f"public, max-age={HTTP_MAX_AGE}, stale-while-revalidate={HTTP_MAX_AGE * 2}"
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    headers: Dict[str, str]
+    namespace: str
+    expires_at: float
+    size: int
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+class ResponseCache:
+    """
+    TTL + LRU cache of serialized JSON responses, bounded by total bytes.
+
+    Entries are grouped by namespace (one per table). Write handlers call
+    invalidate() after they commit; each namespace also has a generation number
+    so a read that started before the write cannot store its now-stale result.
+    With several worker processes, share() makes invalidations reach all of
+    them (see coherence.SharedGenerations).
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.size = 0
+        self.stats = CacheStats()
+        self.generations: Dict[str, int] = {}
+        # Nothing is known about writes before this process started
+        self.started_at = time.time()
+        self.modified_at: Dict[str, float] = {}
+        # Called with the namespace after each invalidate(), and with None after clear()
+        self.listeners: List[Callable[[Optional[str]], None]] = []
+        # Namespaces in use here, to map another worker's write back to names
+        self.namespaces: Set[str] = set()
+        self.shared: Optional[coherence.SharedGenerations] = None
+
+    def share(self, shared: coherence.SharedGenerations) -> None:
+        """Exchange invalidations with the other worker processes through `shared`"""
+        self.shared = shared
+
+    def track(self, *namespaces: str) -> None:
+        """Follow namespaces this process has not read or written yet, e.g. for listeners"""
+        self.namespaces.update(namespaces)
+
+    def sync(self) -> None:
+        """Apply invalidations committed by other worker processes"""
+        if self.shared is None:
+            return
+        for slot, modified_at in self.shared.changes():
+            for namespace in [name for name in self.namespaces if coherence.slot_of(name) == slot]:
+                self.drop(namespace, modified_at)
+
+    def generation(self, namespace: str) -> int:
+        """Version counter of a namespace, bumped by every invalidate() here or in another worker"""
+        self.sync()
+        self.namespaces.add(namespace)
+        return self.generations.get(namespace, 0)
+
+    def last_modified(self, namespace: str) -> float:
+        return self.modified_at.get(namespace, self.started_at)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry
+
+    def set(self, key: str, namespace: str, body: bytes, headers: Dict[str, str], generation: int) -> None:
+        if generation != self.generation(namespace):
+            return
+        size = len(key) + len(body) + ENTRY_OVERHEAD
+        if size > self.max_bytes // 4:
+            # One huge listing should not flush everything else
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = CachedResponse(body, headers, namespace, time.monotonic() + self.ttl, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+    def invalidate(self, namespace: str) -> None:
+        """Drop every entry of a namespace; call after the write has committed"""
+        modified_at = time.time()
+        self.namespaces.add(namespace)
+        self.drop(namespace, modified_at)
+        if self.shared is not None:
+            self.shared.bump(namespace, modified_at)
+
+    def drop(self, namespace: str, modified_at: float) -> None:
+        self.generations[namespace] = self.generations.get(namespace, 0) + 1
+        self.modified_at[namespace] = modified_at
+        for key in [key for key, entry in self.entries.items() if entry.namespace == namespace]:
+            self._remove(key)
+        self.stats.invalidations += 1
+        for listener in self.listeners:
+            listener(namespace)
+
+    def on_invalidate(self, listener: Callable[[Optional[str]], None]) -> None:
+        """Register state derived from cached namespaces to be dropped along with them"""
+        self.listeners.append(listener)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        for namespace in list(self.generations) + [entry.namespace for entry in self.entries.values()]:
+            self.generations[namespace] = self.generations.get(namespace, 0) + 1
+        self.entries.clear()
+        self.size = 0
+        self.stats = CacheStats()
+        for listener in self.listeners:
+            listener(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **asdict(self.stats),
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "shared": self.shared.snapshot() if self.shared is not None else None,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+
+response_cache = ResponseCache()
+
+class CountCache:
+    """
+    Row counts for admin listings, keyed by namespace and filter. A count is
+    reused until the namespace is invalidated in the response cache (i.e. a
+    write committed) or the TTL passes.
+    """
+
+    def __init__(self, responses: ResponseCache, ttl: float = CACHE_TTL):
+        self.responses = responses
+        self.ttl = ttl
+        # (namespace, key) -> (generation, expires_at, count)
+        self.counts: Dict[Tuple[str, str], Tuple[int, float, int]] = {}
+
+    async def get(self, namespace: str, key: str, count: Callable[[], Awaitable[int]]) -> int:
+        generation = self.responses.generation(namespace)
+        cached = self.counts.get((namespace, key))
+        if cached is not None and cached[0] == generation and cached[1] > time.monotonic():
+            return cached[2]
+        value = await count()
+        if generation == self.responses.generation(namespace):
+            self.counts[(namespace, key)] = (generation, time.monotonic() + self.ttl, value)
+        return value
+
+count_cache = CountCache(response_cache)
+
+def cache_key(request: Request) -> str:
+    """Path plus sorted query string, so parameter order does not split entries"""
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+def etag_for(body: bytes) -> str:
+    """Strong validator: a digest of the exact response bytes"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def not_modified(request: Request, headers: Dict[str, str], modified_at: float) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no ETag was sent"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, headers["ETag"])
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(modified_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def render(response_model: Any, data: Any, include: Any = None) -> bytes:
+    """Serialize ORM data through the response model, as FastAPI would"""
+    adapter = TypeAdapter(response_model)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True), include=include)
+
+class CachedRead:
+    """
+    A public read served through the response cache with HTTP validators.
+
+    Handlers return `response` straight away when it is set (a cached body or a
+    304); otherwise they query the database and return `store(...)`.
+    """
+
+    def __init__(self, request: Request, namespace: str):
+        self.request = request
+        self.namespace = namespace
+        self.key = cache_key(request)
+        # Captured before the query so a concurrent write makes this result uncacheable
+        self.generation = response_cache.generation(namespace)
+        self.modified_at = response_cache.last_modified(namespace)
+        entry = response_cache.get(self.key)
+        self.response = self.respond(entry.body, entry.headers) if entry is not None else None
+
+    def respond(self, body: bytes, headers: Dict[str, str]) -> Response:
+        if not_modified(self.request, headers, self.modified_at):
+            validators = {name: headers[name] for name in ("ETag", "Last-Modified", "Cache-Control")}
+            return Response(status_code=304, headers=validators)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def store(
+        self,
+        response_model: Any,
+        data: Any,
+        headers: Optional[Dict[str, str]] = None,
+        include: Any = None,
+    ) -> Response:
+        """Render `data` (optionally only the `include` fields), cache the bytes and validators, and respond"""
+        return self.store_body(render(response_model, data, include), headers)
+
+    def store_rows(self, data: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+        """Like store(), for plain dicts built from database rows, which skip validation"""
+        return self.store_body(serialization.dumps(data), headers)
+
+    def store_body(self, body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+        headers = {
+            **(headers or {}),
+            "ETag": etag_for(body),
+            "Last-Modified": formatdate(self.modified_at, usegmt=True),
+            "Cache-Control": CACHE_CONTROL,
+        }
+        response_cache.set(self.key, self.namespace, body, headers, self.generation)
+        return self.respond(body, headers)
+
+def lookup(request: Request, namespace: str) -> CachedRead:
+    return CachedRead(request, namespace)
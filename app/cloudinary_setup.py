@@ -1,19 +1,71 @@
-import cloudinary
-import cloudinary.uploader
+import asyncio
+import functools
 import os
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict
 import time
 
-# Load environment variables
-load_dotenv()
+from .settings import settings
 
-# Configure Cloudinary
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True
-)
+@functools.lru_cache(maxsize=1)
+def sdk():
+    """
+    The Cloudinary SDK, imported and configured on first use. Only uploads
+    need it, and importing it (with its HTTP stack) would slow every cold start.
+    """
+    import cloudinary
+    import cloudinary.exceptions
+    import cloudinary.uploader
+    import cloudinary.utils
+
+    cloudinary.config(
+        cloud_name=settings.cloudinary_cloud_name,
+        api_key=settings.cloudinary_api_key,
+        api_secret=settings.cloudinary_api_secret,
+        secure=True
+    )
+    return cloudinary
+
+# Upload limits; the multipart parser already spools request bodies above 1 MB to disk
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+# Files above this go up in chunks of this size instead of one request
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(6 * 1024 * 1024)))
+# Uploads run on their own threads so a slow Cloudinary call never blocks the event loop
+UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", "2"))
+
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_MAX_CONCURRENCY, thread_name_prefix="upload")
+
+# (stream, size in bytes, filename, folder) -> Cloudinary-style result dict
+Uploader = Callable[[BinaryIO, int, str, str], Dict[str, Any]]
+
+def cloudinary_upload(stream: BinaryIO, size: int, filename: str, folder: str) -> Dict[str, Any]:
+    """
+    Send a spooled upload to Cloudinary. The SDK's upload() reads a file
+    into memory whole, so files up to UPLOAD_CHUNK_SIZE are held in full;
+    upload_large() reads and sends one UPLOAD_CHUNK_SIZE chunk at a time.
+    Memory per upload is therefore bounded by UPLOAD_CHUNK_SIZE (6 MB by
+    default), and by UPLOAD_MAX_CONCURRENCY times that across the pool,
+    rather than by the file size.
+    """
+    if size > UPLOAD_CHUNK_SIZE:
+        return sdk().uploader.upload_large(
+            stream,
+            folder=folder,
+            resource_type="image",
+            filename=filename,
+            chunk_size=UPLOAD_CHUNK_SIZE
+        )
+    return sdk().uploader.upload(stream, folder=folder, resource_type="image")
+
+# Swapped for a local fake in benchmarks/bench_uploads.py
+uploader: Uploader = cloudinary_upload
+
+def file_size(stream: BinaryIO) -> int:
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
 
 def generate_upload_signature():
     """
@@ -27,6 +79,7 @@ def generate_upload_signature():
         "timestamp": timestamp
     }
     
+    cloudinary = sdk()
     signature = cloudinary.utils.api_sign_request(
         params,
         cloudinary.config().api_secret
@@ -43,6 +96,8 @@ def upload_image(file, folder="event_posters"):
     """
     Upload an image directly to Cloudinary from the backend
     
+    Blocking; call it through upload_image_async from request handlers.
+
     Args:
         file: UploadFile from FastAPI
         folder: Cloudinary folder where the image should be stored
@@ -51,16 +106,9 @@ def upload_image(file, folder="event_posters"):
         dict: Contains the image URL and other upload information
     """
     try:
-        print(cloudinary.config)
-        # Read the file content
-        file_content = file.file.read()
-        
-        # Upload to Cloudinary
-        result = cloudinary.uploader.upload(
-            file_content,
-            folder=folder,
-            resource_type="image"
-        )
+        stream = file.file
+        stream.seek(0)
+        result = uploader(stream, file_size(stream), file.filename or "upload", folder)
         
         # Return the upload result (contains secure_url, public_id, etc.)
         return {
@@ -77,5 +125,11 @@ def upload_image(file, folder="event_posters"):
             "error": str(e)
         }
     finally:
-        # Reset file cursor to beginning
-        file.file.seek(0) 
\ No newline at end of file
+        # Reset file cursor to beginning (chunked uploads close the stream)
+        if not file.file.closed:
+            file.file.seek(0)
+
+async def upload_image_async(file, folder="event_posters"):
+    """Run upload_image on the bounded upload pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(upload_executor, upload_image, file, folder)
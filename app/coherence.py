@@ -0,0 +1,88 @@
+import fcntl
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, List, Tuple
+
+from sqlalchemy.engine import make_url
+
+from .settings import settings
+
+# One file per database, next to it, so workers of the same deployment find each other
+def default_generations_path() -> str:
+    url = make_url(settings.database_url)
+    if url.drivername.startswith("sqlite") and url.database:
+        return os.path.join(os.path.dirname(os.path.abspath(url.database)), "cache_generations")
+    return os.path.join(os.getcwd(), "cache_generations")
+
+CACHE_GENERATIONS_FILE = os.getenv("CACHE_GENERATIONS_FILE") or default_generations_path()
+
+# Namespaces hash into a fixed number of slots; two sharing a slot only cost
+# each other an extra invalidation
+SLOTS = 64
+# Per slot: write generation, and the time of that write (for Last-Modified)
+SLOT = struct.Struct("<Qd")
+
+def slot_of(namespace: str) -> int:
+    return zlib.crc32(namespace.encode()) % SLOTS
+
+class SharedGenerations:
+    """
+    Write generations of the response cache namespaces, in a small memory-mapped
+    file shared by every worker process.
+
+    A worker that commits a write bumps its namespace's slot (under a file
+    lock, as several workers may write at once). Before using its cache, a
+    worker compares the mapped bytes with what it saw last; any slot that
+    moved belongs to another worker's write, and the namespaces in it are
+    dropped locally. Reading costs a memory compare, no system call.
+    """
+
+    def __init__(self, path: str = CACHE_GENERATIONS_FILE):
+        self.path = path
+        size = SLOTS * SLOT.size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.fd).st_size < size:
+                os.ftruncate(self.fd, size)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.map = mmap.mmap(self.fd, size)
+        self.seen = self.map[:]
+
+    def bump(self, namespace: str, modified_at: float) -> None:
+        """Record a committed write; this worker has already dropped its own entries"""
+        offset = slot_of(namespace) * SLOT.size
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            before = self.map[offset:offset + SLOT.size]
+            generation, _ = SLOT.unpack(before)
+            SLOT.pack_into(self.map, offset, generation + 1, modified_at)
+            after = self.map[offset:offset + SLOT.size]
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        if self.seen[offset:offset + SLOT.size] == before:
+            # Nobody else wrote to the slot since we last looked: our own bump is not news
+            self.seen = self.seen[:offset] + after + self.seen[offset + SLOT.size:]
+
+    def changes(self) -> List[Tuple[int, float]]:
+        """Slots bumped by other workers since the last call, with their write times"""
+        current = self.map[:]
+        if current == self.seen:
+            return []
+        changed = []
+        for slot in range(SLOTS):
+            offset = slot * SLOT.size
+            if current[offset:offset + SLOT.size] != self.seen[offset:offset + SLOT.size]:
+                changed.append((slot, SLOT.unpack_from(current, offset)[1]))
+        self.seen = current
+        return changed
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"slots": SLOTS, "writes": sum(SLOT.unpack_from(self.map, slot * SLOT.size)[0] for slot in range(SLOTS))}
+
+    def close(self) -> None:
+        self.map.close()
+        os.close(self.fd)
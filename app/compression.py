@@ -0,0 +1,231 @@
+import gzip
+import hashlib
+import os
+import zlib
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Bodies smaller than this go out as they are; compression would barely pay for its headers
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Per-response levels: cheap enough to run on every cache miss
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+# Memory bound for compressed bodies kept for reuse; 0 compresses every response afresh
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Preferred first
+CODINGS = ("br", "gzip")
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+def accepted_encodings(headers: Headers) -> List[str]:
+    """Codings in Accept-Encoding, without those refused with q=0"""
+    accepted = []
+    for part in headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        if params.replace(" ", "").lower() in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.append(coding.strip().lower())
+    return accepted
+
+def choose_coding(headers: Headers) -> Optional[str]:
+    accepted = accepted_encodings(headers)
+    return next((coding for coding in CODINGS if coding in accepted), None)
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+class StreamCompressor:
+    """Incremental compressor for streamed bodies of unknown length"""
+
+    def __init__(self, coding: str):
+        if coding == "br":
+            self.compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+            self.process = self.compressor.process
+        else:
+            self.compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.process = self.compressor.compress
+
+    def finish(self) -> bytes:
+        if isinstance(self.compressor, brotli.Compressor):
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+@dataclass
+class CompressionStats:
+    compressed: int = 0
+    reused: int = 0
+    streamed: int = 0
+    skipped: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+class CompressedBodies:
+    """
+    LRU of compressed bodies, bounded by total bytes. Keyed by the response's
+    strong ETag when it has one (the response cache's bodies all do), else by
+    a digest of the body, so identical responses are compressed once.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self.size = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[bytes]:
+        body = self.entries.get(key)
+        if body is not None:
+            self.entries.move_to_end(key)
+        return body
+
+    def set(self, key: Tuple[str, str], body: bytes) -> None:
+        if len(body) > self.max_bytes // 4 or key in self.entries:
+            return
+        self.entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, oldest = self.entries.popitem(last=False)
+            self.size -= len(oldest)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size = 0
+
+compressed_bodies = CompressedBodies()
+compression_stats = CompressionStats()
+
+def body_key(headers: Headers, body: bytes) -> str:
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def snapshot() -> Dict[str, Any]:
+    return {
+        **asdict(compression_stats),
+        "entries": len(compressed_bodies.entries),
+        "bytes": compressed_bodies.size,
+        "max_bytes": compressed_bodies.max_bytes,
+    }
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, per the client's Accept-Encoding.
+
+    Skipped for bodies under `minimum_size`, content types that do not
+    compress (images, gzip exports), and responses that already carry a
+    Content-Encoding (the public snapshot is precompressed). Streamed bodies
+    are compressed chunk by chunk. A strong ETag becomes weak on a compressed
+    body, as the bytes differ; revalidation still matches, since
+    If-None-Match compares weakly.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = choose_coding(Headers(scope=scope))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, CompressionResponder(send, coding, self.minimum_size).send)
+
+class CompressionResponder:
+    def __init__(self, send: Send, coding: str, minimum_size: int):
+        self.downstream = send
+        self.coding = coding
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.stream: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = not self.compressible(message["status"], headers)
+            if self.passthrough:
+                compression_stats.skipped += 1
+                await self.downstream(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.stream is not None:
+            await self.send_stream(body, more_body)
+        elif more_body:
+            # First chunk of a streamed body: compress as it goes
+            self.stream = StreamCompressor(self.coding)
+            compression_stats.streamed += 1
+            headers = self.encoded_headers()
+            del headers["content-length"]
+            await self.downstream(self.start)
+            await self.send_stream(body, more_body)
+        elif len(body) < self.minimum_size:
+            compression_stats.skipped += 1
+            await self.downstream(self.start)
+            await self.downstream(message)
+        else:
+            key = (body_key(Headers(raw=self.start["headers"]), body), self.coding)
+            headers = self.encoded_headers()
+            compressed = self.compress(key, body)
+            headers["content-length"] = str(len(compressed))
+            await self.downstream(self.start)
+            await self.downstream({"type": "http.response.body", "body": compressed})
+
+    def compressible(self, status: int, headers: Headers) -> bool:
+        if status < 200 or status in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def encoded_headers(self) -> MutableHeaders:
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["content-encoding"] = self.coding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+        return headers
+
+    def compress(self, key: Tuple[str, str], body: bytes) -> bytes:
+        compressed = compressed_bodies.get(key)
+        if compressed is not None:
+            compression_stats.reused += 1
+        else:
+            compressed = compress(body, self.coding)
+            compressed_bodies.set(key, compressed)
+            compression_stats.compressed += 1
+        compression_stats.bytes_in += len(body)
+        compression_stats.bytes_out += len(compressed)
+        return compressed
+
+    async def send_stream(self, body: bytes, more_body: bool) -> None:
+        chunk = self.stream.process(body) if body else b""
+        compression_stats.bytes_in += len(body)
+        if not more_body:
+            chunk += self.stream.finish()
+        compression_stats.bytes_out += len(chunk)
+        if chunk or not more_body:
+            await self.downstream({"type": "http.response.body", "body": chunk, "more_body": more_body})
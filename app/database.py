@@ -1,94 +1,264 @@
 import sqlalchemy
-from sqlalchemy import create_engine, exc, text
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+import asyncio
 import os
-import time
+import random
 import logging
-from typing import Generator
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Generator, TypeVar
 from contextlib import contextmanager
-from dotenv import load_dotenv
+
+from .settings import settings
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
 # MySQL connection details
-MYSQL_HOST = os.getenv("MYSQL_HOST", "")
-MYSQL_PORT = os.getenv("MYSQL_PORT", "")
-MYSQL_USER = os.getenv("MYSQL_USER", "")  # Default user, change as needed
-MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "")  # Set your password through env variable
-MYSQL_DATABASE = os.getenv("MYSQL_DATABASE", "")
-# DATABASE_URL = os.getenv("DATABASE_URL")
+MYSQL_HOST = settings.mysql_host
+MYSQL_PORT = settings.mysql_port
+MYSQL_USER = settings.mysql_user
+MYSQL_PASSWORD = settings.mysql_password
+MYSQL_DATABASE = settings.mysql_database
 
-# Retry configuration
-MAX_RETRIES = 3
-RETRY_DELAY = 1  # seconds
+# Retry configuration for transactions hitting lock contention or dropped connections
+MAX_ATTEMPTS = int(os.getenv("DB_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("DB_RETRY_BASE_DELAY", "0.05"))  # seconds
+RETRY_MAX_DELAY = float(os.getenv("DB_RETRY_MAX_DELAY", "1.0"))  # seconds
+RETRYABLE_ERRORS = (
+    "database is locked",
+    "database is busy",
+    "database table is locked",
+    "lost connection",
+    "server has gone away",
+)
 
 # Construct MySQL connection URL
-# DATABASE_URL = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
-
+MYSQL_DATABASE_URL = settings.mysql_database_url
 
-# DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:////var/data/azulu.db")
-DATABASE_URL = "sqlite:////var/data/azulu.db"
+# SQLite stays the default; set DATABASE_BACKEND=mysql to use the MySQL URL above
+DATABASE_BACKEND = settings.database_backend
+SQLITE_DATABASE_URL = settings.sqlite_database_url
+DATABASE_URL = settings.database_url
 
 # If using Render with persistent disk, construct the path
 RENDER_DISK_PATH = os.getenv("RENDER_DISK_PATH")
 # if RENDER_DISK_PATH:
 #     DATABASE_URL = f"sqlite:///{RENDER_DISK_PATH}/azulu.db"
 
-# Create SQLAlchemy engine with connection pool
-# engine = create_engine(
-#     DATABASE_URL,
-#     poolclass=sqlalchemy.pool.NullPool,
-#     connect_args={"connect_timeout": 10}
-# )
+# SQLite engine profile: "tuned" (WAL, pragmas, sized pool) or "legacy" (driver defaults)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Applied to every new SQLite connection under the tuned profile
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",  # readers no longer block on a writer's commit
+    "synchronous": "NORMAL",  # fsync at checkpoints only, safe in WAL mode
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "8192")),  # negative means KiB, per connection
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+# Pool sizing for concurrent readers; WAL still allows a single writer at a time
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).drivername.startswith("sqlite")
+
+def engine_options(url: str, profile: str = SQLITE_PROFILE) -> Dict[str, Any]:
+    """
+    Keyword arguments for create_engine/create_async_engine for the given URL.
+    """
+    if not is_sqlite(url):
+        return {"pool_pre_ping": True}
+
+    options: Dict[str, Any] = {"connect_args": {"check_same_thread": False}}
+    if profile != "tuned" or make_url(url).database in (None, "", ":memory:"):
+        return options
+
+    options["connect_args"]["timeout"] = SQLITE_PRAGMAS["busy_timeout"] / 1000
+    options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT)
+    return options
+
+def apply_sqlite_pragmas(engine: Engine) -> None:
+    """Set the tuned pragmas on every connection the engine opens."""
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def build_engine(url: str, profile: str = SQLITE_PROFILE) -> Engine:
+    """Create a sync engine with the configured profile."""
+    sync_engine = create_engine(url, **engine_options(url, profile))
+    if is_sqlite(url) and profile == "tuned":
+        apply_sqlite_pragmas(sync_engine)
+    return sync_engine
+
+engine = build_engine(DATABASE_URL)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers used by the API; the sync engine above stays for Alembic and scripts
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqlconnector": "mysql+aiomysql",
+}
+
+def to_async_url(url: str) -> str:
+    """Swap the driver of a sync database URL for its asyncio counterpart."""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+def build_async_engine(url: str, profile: str = SQLITE_PROFILE) -> AsyncEngine:
+    """Create an async engine for a sync URL with the configured profile."""
+    async_url = to_async_url(url)
+    new_engine = create_async_engine(async_url, **engine_options(url, profile))
+    if is_sqlite(url) and profile == "tuned":
+        apply_sqlite_pragmas(new_engine.sync_engine)
+    return new_engine
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+
+async_engine = build_async_engine(DATABASE_URL)
+
+# Objects stay usable after commit so response models never trigger lazy IO
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # Create base class for models
 Base = declarative_base()
 
-# Context manager for handling db sessions with retry logic
+def schema_fingerprint() -> int:
+    """
+    Digest of the tables, columns and indexes the models declare, as a positive
+    32-bit integer so it fits SQLite's `user_version` header field.
+    """
+    parts = []
+    for table in sorted(Base.metadata.tables.values(), key=lambda table: table.name):
+        parts.append(table.name)
+        parts += [f"{column.name}:{type(column.type).__name__}" for column in table.columns]
+        parts += sorted(index.name for index in table.indexes)
+    return zlib.crc32("\n".join(parts).encode()) & 0x7FFFFFFF or 1
+
+def ensure_schema(bind: Engine = None) -> bool:
+    """
+    Create missing tables, unless the database was already brought up to date
+    for the current models: on SQLite the schema fingerprint is stored in
+    `PRAGMA user_version`, so a boot with an unchanged schema reads one pragma
+    instead of inspecting every table. Returns whether create_all ran.
+    """
+    bind = bind or engine
+    sqlite = is_sqlite(bind.url)
+    if sqlite and settings.schema_check:
+        with bind.connect() as connection:
+            if connection.exec_driver_sql("PRAGMA user_version").scalar() == schema_fingerprint():
+                return False
+    Base.metadata.create_all(bind=bind)
+    if sqlite:
+        with bind.begin() as connection:
+            connection.exec_driver_sql(f"PRAGMA user_version = {schema_fingerprint()}")
+    return True
+
+# Context manager for sync sessions used by scripts; retries live in run_in_transaction
 @contextmanager
 def get_db_session() -> Generator[Session, None, None]:
     """
-    Get a database session with retry logic for common database errors.
+    Get a sync database session that is rolled back on error and always closed.
     """
     session = SessionLocal()
-    retry_count = 0
-    
-    while retry_count < MAX_RETRIES:
-        try:
-            yield session
-            break
-        except exc.OperationalError as e:
-            retry_count += 1
-            if retry_count < MAX_RETRIES:
-                logger.warning(f"Database connection error: {str(e)}. Retrying {retry_count}/{MAX_RETRIES}...")
-                time.sleep(RETRY_DELAY * retry_count)  # Exponential backoff
-                continue
-            else:
-                logger.error(f"Failed to connect to database after {MAX_RETRIES} attempts: {str(e)}")
-                raise
-        except Exception as e:
-            logger.error(f"Database error: {str(e)}")
-            raise
-        finally:
-            session.close()
+    try:
+        yield session
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+@dataclass
+class RetryStats:
+    """Counters for run_in_transaction, exposed through the health endpoint"""
+    transactions: int = 0
+    retries: int = 0
+    exhausted: int = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        return asdict(self)
+
+retry_stats = RetryStats()
+
+T = TypeVar("T")
+
+def is_retryable(error: exc.DBAPIError) -> bool:
+    """Lock contention and dropped connections are worth another attempt."""
+    if error.connection_invalidated:
+        return True
+    message = str(error.orig).lower()
+    return isinstance(error, exc.OperationalError) and any(marker in message for marker in RETRYABLE_ERRORS)
+
+def retry_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff, so contending writers spread out."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+async def run_in_transaction(
+    work: Callable[[AsyncSession], Awaitable[T]],
+    max_attempts: int = MAX_ATTEMPTS,
+) -> T:
+    """
+    Run `work` in a fresh session and commit it, re-running the whole unit of
+    work from scratch when the database is locked or the connection drops.
+
+    `work` must only touch the session it is given, since a retry starts over
+    with a new one. Other exceptions (HTTPException, IntegrityError) are raised
+    straight away.
+    """
+    retry_stats.transactions += 1
+    attempt = 1
+    while True:
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await work(session)
+                await session.commit()
+                return result
+            except exc.DBAPIError as e:
+                await session.rollback()
+                if not is_retryable(e):
+                    raise
+                if attempt >= max_attempts:
+                    retry_stats.exhausted += 1
+                    logger.error(f"Transaction failed after {attempt} attempts: {str(e)}")
+                    raise
+                error = e
+        delay = retry_delay(attempt)
+        retry_stats.retries += 1
+        logger.warning(f"Database busy: {str(error.orig)}. Retrying {attempt}/{max_attempts - 1} in {delay:.3f}s...")
+        attempt += 1
+        await asyncio.sleep(delay)
 
 # FastAPI dependency for getting db session
-def get_db() -> Generator[Session, None, None]:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    FastAPI dependency that provides a database session to route handlers.
+    FastAPI dependency that provides an async database session to route handlers.
     """
-    with get_db_session() as session:
+    async with AsyncSessionLocal() as session:
         yield session
 
 # Verify database connection on startup
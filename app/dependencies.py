@@ -1,11 +1,10 @@
 from fastapi import Header, HTTPException, Depends, status
-import os
 from typing import Optional
-from dotenv import load_dotenv
+
+from .settings import settings
 
 # Get admin password from environment variable or use default (for development only)
-load_dotenv()
-ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")
+ADMIN_PASSWORD = settings.admin_password
 
 async def verify_admin(x_admin_password: Optional[str] = Header(None)) -> bool:
     """Verify that the admin password header matches the expected value"""
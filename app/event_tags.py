@@ -0,0 +1,88 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# Rows per INSERT when rebuilding every event at once
+REBUILD_BATCH_SIZE = 5000
+
+def normalize(value) -> str:
+    """Lookup key for a genre or artist: case-insensitive, whitespace collapsed"""
+    return " ".join(str(value).split()).casefold()
+
+def unique_keys(values: Optional[Iterable]) -> List[str]:
+    """Normalized, de-duplicated, non-empty entries in their original order"""
+    return list(dict.fromkeys(key for key in (normalize(value) for value in values or []) if key))
+
+def dj_index(rows: Iterable[Tuple[int, str]]) -> Dict[str, int]:
+    """
+    Normalized alias -> DJ id; the oldest DJ wins if two share an alias. DJs
+    without an alias are left out, as in the migration backfill: normalize()
+    would turn None into "none" and link it to a lineup entry of that name.
+    """
+    index: Dict[str, int] = {}
+    for dj_id, alias in sorted(rows):
+        if alias:
+            index.setdefault(normalize(alias), dj_id)
+    return index
+
+def tag_rows(event_id: int, genres, lineup, dj_ids: Dict[str, int]) -> Tuple[List[Dict], List[Dict]]:
+    genre_rows = [{"event_id": event_id, "genre": genre} for genre in unique_keys(genres)]
+    lineup_rows = [
+        {"event_id": event_id, "artist": artist, "dj_id": dj_ids.get(artist)}
+        for artist in unique_keys(lineup)
+    ]
+    return genre_rows, lineup_rows
+
+async def clear_event(db: AsyncSession, event_id: int) -> None:
+    await db.execute(delete(models.EventGenre).where(models.EventGenre.event_id == event_id))
+    await db.execute(delete(models.EventLineup).where(models.EventLineup.event_id == event_id))
+
+async def sync_event(db: AsyncSession, event: models.Event) -> None:
+    """Rewrite an event's genre and lineup rows from its JSON columns; call after a flush"""
+    await clear_event(db, event.id)
+    dj_ids = {}
+    if event.lineup:
+        dj_ids = dj_index((await db.execute(select(models.Dj.id, models.Dj.alias))).all())
+    genre_rows, lineup_rows = tag_rows(event.id, event.genres, event.lineup, dj_ids)
+    if genre_rows:
+        await db.execute(insert(models.EventGenre), genre_rows)
+    if lineup_rows:
+        await db.execute(insert(models.EventLineup), lineup_rows)
+
+async def link_dj(db: AsyncSession, dj_id: int, alias: Optional[str]) -> None:
+    """
+    Point lineup entries matching the DJ's alias at the DJ, dropping links
+    under its old alias. Pass alias=None when the DJ is deleted.
+    """
+    await db.execute(
+        update(models.EventLineup).where(models.EventLineup.dj_id == dj_id).values(dj_id=None)
+    )
+    if alias:
+        await db.execute(
+            update(models.EventLineup)
+            .where(models.EventLineup.artist == normalize(alias), models.EventLineup.dj_id.is_(None))
+            .values(dj_id=dj_id)
+        )
+
+def rebuild(connection: Connection) -> None:
+    """
+    Recreate every genre and lineup row from the JSON columns: the backfill
+    for existing databases, and for events bulk-loaded without the handlers.
+    """
+    connection.execute(delete(models.EventGenre))
+    connection.execute(delete(models.EventLineup))
+    dj_ids = dj_index(connection.execute(select(models.Dj.id, models.Dj.alias)).all())
+    genre_rows: List[Dict] = []
+    lineup_rows: List[Dict] = []
+    events = connection.execute(select(models.Event.id, models.Event.genres, models.Event.lineup))
+    for event_id, genres, lineup in events:
+        genres, lineup = tag_rows(event_id, genres, lineup, dj_ids)
+        genre_rows.extend(genres)
+        lineup_rows.extend(lineup)
+    for table, rows in ((models.EventGenre, genre_rows), (models.EventLineup, lineup_rows)):
+        for start in range(0, len(rows), REBUILD_BATCH_SIZE):
+            connection.execute(insert(table), rows[start:start + REBUILD_BATCH_SIZE])
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select
+
+from . import database, models
+
+# Rows fetched from the cursor and encoded per chunk
+EXPORT_BATCH_SIZE = int(os.getenv("MAILING_EXPORT_BATCH_SIZE", "1000"))
+
+COLUMNS = ["id", "name", "email", "created_at", "subscribed"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_query(
+    subscribed: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+):
+    """Plain column select, so rows never become ORM objects"""
+    entry = models.MailingListEntry
+    query = select(*(getattr(entry, column) for column in COLUMNS))
+    if subscribed is not None:
+        query = query.where(entry.subscribed == subscribed)
+    if created_after is not None:
+        query = query.where(entry.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(entry.created_at < created_before)
+    return query.order_by(entry.id)
+
+
+def encode_csv(rows: List, header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(COLUMNS)
+    for id, name, email, created_at, subscribed in rows:
+        writer.writerow([id, name, email, created_at.isoformat() if created_at else "", "true" if subscribed else "false"])
+    return buffer.getvalue().encode()
+
+
+def encode_ndjson(rows: List, header: bool) -> bytes:
+    return "".join(
+        json.dumps({
+            "id": id,
+            "name": name,
+            "email": email,
+            "created_at": created_at.isoformat() if created_at else None,
+            "subscribed": bool(subscribed),
+        }) + "\n"
+        for id, name, email, created_at, subscribed in rows
+    ).encode()
+
+
+async def export_rows(query, format: str, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """
+    Stream the query result as encoded chunks. The session is opened here
+    rather than taken from the request, because the body is sent after the
+    route returns.
+    """
+    encode = encode_ndjson if format == "ndjson" else encode_csv
+    header = True
+    async with database.AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield encode(rows, header)
+            header = False
+    if header and format == "csv":
+        yield encode([], header)  # empty export still gets its header row
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Compress a byte stream incrementally into a single gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
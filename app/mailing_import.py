@@ -0,0 +1,198 @@
+import asyncio
+import codecs
+import csv
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import case, select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import database, models, schemas
+
+# Rows written per transaction; 4 bound parameters each, well under SQLite's limit
+IMPORT_BATCH_SIZE = int(os.getenv("MAILING_IMPORT_BATCH_SIZE", "1000"))
+# Only the first few invalid rows are reported back
+MAX_REPORTED_ERRORS = 20
+
+FORMATS = ("csv", "ndjson")
+
+
+def detect_format(content_type: Optional[str], format: Optional[str]) -> str:
+    """Explicit ?format= wins, then the Content-Type; CSV otherwise"""
+    if format:
+        if format not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format '{format}', use csv or ndjson")
+        return format
+    if content_type and ("ndjson" in content_type or "jsonl" in content_type or "json" in content_type):
+        return "ndjson"
+    return "csv"
+
+
+async def read_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines without holding more than one chunk in memory"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Dict[str, str]]:
+    """
+    Parse CSV with a header row. A quoted field may span lines, so lines are
+    joined until the quotes balance before being handed to the csv module.
+    """
+    header: Optional[List[str]] = None
+    record = ""
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        row = next(csv.reader([text]))
+        if header is None:
+            header = [column.strip().lower() for column in row]
+            if "email" not in header:
+                raise HTTPException(status_code=400, detail="CSV header must include an 'email' column")
+            continue
+        yield dict(zip(header, row))
+
+
+async def ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Dict]:
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else {}
+
+
+def upsert_statement(dialect: str):
+    """
+    Insert new emails; an existing but unsubscribed email is subscribed again
+    with the imported name, and an active subscription is left untouched.
+    Executed with a list of rows, so it compiles once and SQLAlchemy batches
+    the rows into multi-row INSERTs itself.
+    """
+    table = models.MailingListEntry.__table__
+    if dialect == "mysql":
+        stmt = mysql.insert(table)
+        # Assignments run left to right, so name is decided before subscribed flips
+        return stmt.on_duplicate_key_update([
+            ("name", case((table.c.subscribed == True, table.c.name), else_=stmt.inserted.name)),
+            ("subscribed", True),
+        ])
+    stmt = sqlite.insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.email],
+        set_={"subscribed": True, "name": stmt.excluded.name},
+        where=table.c.subscribed == False,
+    )
+
+
+class MailingListImport:
+    """
+    Validates streamed rows and upserts them in batched transactions. Each
+    batch is written while the next one is being parsed and validated.
+    """
+
+    def __init__(self, batch_size: int = IMPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.batch: List[Dict] = []
+        self.seen: Set[str] = set()
+        self.rows = 0
+        self.inserted = 0
+        self.reactivated = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.errors: List[Dict] = []
+        self.writing: Optional[asyncio.Task] = None
+
+    async def add(self, record: Dict) -> None:
+        self.rows += 1
+        try:
+            entry = schemas.MailingListEntryCreate(
+                name=str(record.get("name") or "").strip(),
+                email=str(record.get("email") or "").strip(),
+            )
+        except ValidationError as e:
+            self.invalid += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append({"row": self.rows, "error": e.errors()[0]["msg"]})
+            return
+        if entry.email in self.seen:
+            self.skipped += 1  # repeated within this import
+            return
+        self.seen.add(entry.email)
+        self.batch.append({"name": entry.name, "email": entry.email})
+        if len(self.batch) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Wait for the batch being written, then start writing the current one"""
+        await self.wait()
+        if not self.batch:
+            return
+        rows, self.batch = self.batch, []
+        self.writing = asyncio.create_task(self.write(rows))
+
+    async def wait(self) -> None:
+        if self.writing is not None:
+            writing, self.writing = self.writing, None
+            await writing
+
+    async def write(self, rows: List[Dict]) -> None:
+        created_at = datetime.utcnow()
+        for row in rows:
+            row["created_at"] = created_at
+            row["subscribed"] = True
+
+        async def write_batch(db: AsyncSession):
+            existing = dict((await db.execute(
+                select(models.MailingListEntry.email, models.MailingListEntry.subscribed)
+                .where(models.MailingListEntry.email.in_([row["email"] for row in rows]))
+            )).all())
+            await db.execute(upsert_statement(db.bind.dialect.name), rows)
+            return existing
+
+        existing = await database.run_in_transaction(write_batch)
+        reactivated = sum(1 for subscribed in existing.values() if not subscribed)
+        self.inserted += len(rows) - len(existing)
+        self.reactivated += reactivated
+        self.skipped += len(existing) - reactivated
+
+    async def run(self, records: AsyncIterator[Dict]) -> Dict:
+        try:
+            async for record in records:
+                await self.add(record)
+            await self.flush()
+            await self.wait()
+        finally:
+            # A bad header or dropped connection must not leave a write running
+            if self.writing is not None:
+                self.writing.cancel()
+        return self.summary()
+
+    def summary(self) -> Dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "reactivated": self.reactivated,
+            "skipped": self.skipped,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
@@ -1,26 +1,30 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Response
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
-import os
-from dotenv import load_dotenv
+from fastapi.responses import ORJSONResponse
 import logging
 
-from . import models, database, cloudinary_setup
-from .database import Base, engine
-from .routers import events, content, mailing_list, djs
+from . import models, schemas, database, cloudinary_setup, pagination, cache, coherence, compression, metrics, warmup, admission, single_flight, body_limit
+from .settings import settings
+from .upload_jobs import upload_queue
+from .subscriptions import subscribe_batcher
+from .snapshot import public_snapshot
+from .routers import events, content, mailing_list, djs, search, public
 from .dependencies import verify_admin
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 # Create FastAPI app
 app = FastAPI(
     title="Azulu CRM API",
     description="API for managing events and content for Azulu Events",
-    version="1.0.0"
+    version="1.0.0",
+    # Responses FastAPI serializes itself are encoded with orjson; list
+    # endpoints skip validation too, see serialization.RowMapper
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -35,32 +39,81 @@ origins = [
     "http://localhost:3000",
 ]
 
+# Caps in-flight requests per route class; added before CORS so that CORS wraps it
+# and browsers can read its 503s
+app.add_middleware(admission.AdmissionMiddleware)
+# Oversized uploads are refused before the form parser spools them to disk
+app.add_middleware(
+    body_limit.BodyLimitMiddleware,
+    limits={"/upload/image": cloudinary_setup.MAX_UPLOAD_BYTES + body_limit.MULTIPART_OVERHEAD},
+)
+# Outside admission control, so requests waiting on an identical one hold no slot
+app.add_middleware(single_flight.SingleFlightMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,  # Allows all origins in development
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER, pagination.TOTAL_COUNT_HEADER, "Retry-After"],
 )
 
+# Brotli/gzip for large responses; compressed bodies are reused for identical responses
+app.add_middleware(compression.CompressionMiddleware)
+# Outermost, so latencies include compression
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Under serve.py with several workers, invalidations reach every worker's caches
+if settings.workers > 1:
+    cache.response_cache.share(coherence.SharedGenerations())
+
 # Include routers
 app.include_router(events.router)
 app.include_router(content.router)
 app.include_router(mailing_list.router)
 app.include_router(djs.router)
+app.include_router(search.router)
+app.include_router(public.router)
 
 
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_db_client():
-    """Verify database connection on startup"""
-    Base.metadata.create_all(bind=engine)
+    """
+    Bring the schema up to date and start the upload workers. Kept short for
+    scale-to-zero boots: the schema check is one pragma when nothing changed,
+    and the public snapshot is built on its first request, or in the background
+    with STARTUP_WARMUP.
+    """
+    # With several workers, serve.py has done the one-off work before starting them
+    single_process = settings.workers == 1
+    if single_process and database.ensure_schema():
+        logger.info("Database schema created or updated")
     try:
-        database.verify_database_connection()
-        logger.info("Database connection verified successfully")
+        await upload_queue.start(requeue=single_process)
     except Exception as e:
-        logger.error(f"Failed to connect to database: {str(e)}")
-        # We don't raise here to allow the app to start even if DB is temporarily down
+        logger.error(f"Failed to start upload workers: {str(e)}")
+    if settings.startup_warmup:
+        warmup.start(app)
+
+@app.on_event("shutdown")
+async def stop_upload_workers():
+    """Stop upload workers; unfinished jobs are picked up again on the next start"""
+    await upload_queue.stop()
+
+@app.on_event("shutdown")
+async def flush_subscriptions():
+    """Write subscribes still waiting for their batch"""
+    await subscribe_batcher.stop()
+
+@app.on_event("shutdown")
+async def close_database():
+    """Close pooled connections last, after the handlers above have written what they hold"""
+    await warmup.stop()
+    await public_snapshot.stop()
+    await database.async_engine.dispose()
+    database.engine.dispose()
 
 @app.get("/")
 async def root():
@@ -69,7 +122,41 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint for monitoring"""
-    return {"status": "healthy"}
+    return {"status": "healthy", "db_retries": database.retry_stats.snapshot()}
+
+@app.get("/cache/stats")
+async def get_cache_stats(_: bool = Depends(verify_admin)):
+    """
+    Hit/miss/eviction counters and memory use of the response cache and of
+    compressed bodies, and the reads currently coalesced, with waiters per key
+    """
+    return {
+        **cache.response_cache.snapshot(),
+        "compression": compression.snapshot(),
+        "single_flight": single_flight.single_flight.snapshot(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(_: bool = Depends(verify_admin)):
+    """Request latencies, query counts and cache counters in the Prometheus text format"""
+    stats = cache.response_cache.stats
+    extra = {
+        "response_cache_hits_total": stats.hits,
+        "response_cache_misses_total": stats.misses,
+        "response_cache_evictions_total": stats.evictions,
+        "response_cache_bytes": cache.response_cache.size,
+        "compression_bytes_in_total": compression.compression_stats.bytes_in,
+        "compression_bytes_out_total": compression.compression_stats.bytes_out,
+        **{f"db_transaction_{name}_total": value for name, value in database.retry_stats.snapshot().items()},
+        **{f"subscribe_{name}_total": value for name, value in subscribe_batcher.stats.snapshot().items() if name != "largest_batch"},
+        "subscribe_largest_batch": subscribe_batcher.stats.largest_batch,
+        **admission.prometheus_extra(),
+        **single_flight.prometheus_extra(),
+    }
+    return PlainTextResponse(
+        metrics.render_prometheus(extra),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 @app.get("/cloudinary/signature")
 async def get_cloudinary_signature(_: bool = Depends(verify_admin)):
@@ -77,12 +164,19 @@ async def get_cloudinary_signature(_: bool = Depends(verify_admin)):
     return cloudinary_setup.generate_upload_signature()
 
 @app.post("/upload/image")
-async def upload_image(file: UploadFile = File(...), _: bool = Depends(verify_admin)):
+async def upload_image(
+    response: Response,
+    file: UploadFile = File(...),
+    background: bool = False,
+    _: bool = Depends(verify_admin)
+):
     """
     Upload an image directly through the backend
     
     This endpoint handles the full image upload process to Cloudinary,
     bypassing the need for frontend signature handling.
+    With background=true the file is queued and a job is returned straight
+    away (202); poll GET /upload/jobs/{job_id} for the result.
     """
     if not file:
         raise HTTPException(status_code=400, detail="No file provided")
@@ -90,11 +184,37 @@ async def upload_image(file: UploadFile = File(...), _: bool = Depends(verify_ad
     # Check if the file is an image
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
+
+    # The body limit leaves room for multipart framing; this is the limit on the file itself
+    if file.size is not None and file.size > cloudinary_setup.MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File is larger than {cloudinary_setup.MAX_UPLOAD_BYTES // (1024 * 1024)} MB"
+        )
     
-    # Upload image to Cloudinary
-    result = cloudinary_setup.upload_image(file)
+    if background:
+        job = await upload_queue.enqueue(file)
+        response.status_code = 202
+        return schemas.UploadJob.model_validate(job, from_attributes=True)
+
+    # Upload image to Cloudinary without blocking other requests
+    result = await cloudinary_setup.upload_image_async(file)
     
     if not result["success"]:
         raise HTTPException(status_code=500, detail=f"Upload failed: {result.get('error', 'Unknown error')}")
     
-    return result 
\ No newline at end of file
+    return result 
+
+@app.get("/upload/jobs/{job_id}", response_model=schemas.UploadJob)
+async def read_upload_job(
+    job_id: str,
+    db: AsyncSession = Depends(database.get_db),
+    _: bool = Depends(verify_admin)
+):
+    """Status, progress and (once finished) the Cloudinary result of a background upload"""
+    job = await upload_queue.get(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    result = schemas.UploadJob.model_validate(job, from_attributes=True)
+    result.progress = upload_queue.progress_of(job)
+    return result
@@ -0,0 +1,208 @@
+import bisect
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with their SQL and parameters
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Longest parameter repr written to the slow-query log
+SLOW_QUERY_MAX_PARAMS = int(os.getenv("SLOW_QUERY_MAX_PARAMS", "500"))
+
+# Upper bounds in seconds, as Prometheus `le` labels
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterable[Tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield f"{bound:g}", total
+        yield "+Inf", self.count
+
+@dataclass
+class RouteStats:
+    """Everything recorded for one (method, route) pair"""
+    latency: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS))
+    queries: Histogram = field(default_factory=lambda: Histogram(QUERY_COUNT_BUCKETS))
+    db_seconds: float = 0.0
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+@dataclass
+class RequestStats:
+    """Database work of the request in progress, filled in by the engine hooks"""
+    queries: int = 0
+    db_seconds: float = 0.0
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+class Metrics:
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slow_queries = 0
+        self.started_at = time.time()
+
+    def record(self, method: str, route: str, status: int, seconds: float, request: RequestStats) -> None:
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        stats.latency.observe(seconds)
+        stats.queries.observe(request.queries)
+        stats.db_seconds += request.db_seconds
+        code = str(status)
+        stats.statuses[code] = stats.statuses.get(code, 0) + 1
+
+metrics = Metrics()
+
+# Engine hooks: registered on the Engine class, so they cover every engine,
+# including the sync engines behind the async ones
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    metrics.queries += 1
+    metrics.db_seconds += elapsed
+    request = current_request.get()
+    if request is not None:
+        request.queries += 1
+        request.db_seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        metrics.slow_queries += 1
+        if executemany and len(parameters) > 10:
+            # Bulk statements can carry thousands of rows; repr only a few
+            params = f"{parameters[:10]!r} and {len(parameters) - 10} more rows"
+        else:
+            params = repr(parameters)
+        if len(params) > SLOW_QUERY_MAX_PARAMS:
+            params = params[:SLOW_QUERY_MAX_PARAMS] + "..."
+        logger.warning(f"Slow query ({elapsed * 1000:.1f} ms): {' '.join(statement.split())} | parameters: {params}")
+
+@event.listens_for(Engine, "handle_error")
+def _failed_query(context):
+    # after_cursor_execute does not run for a failing statement
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+def route_label(scope: Scope) -> str:
+    """The matched route's path template, so /events/1 and /events/2 share a series"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """Per-route latency, status and query-count metrics for every HTTP request"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = RequestStats()
+        token = current_request.set(request)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            metrics.record(scope["method"], route_label(scope), status, time.perf_counter() - started, request)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _histogram(lines: List[str], name: str, histogram: Histogram, **labels: str) -> None:
+    for bound, count in histogram.cumulative():
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+def render_prometheus(extra: Optional[Dict[str, float]] = None) -> str:
+    """
+    All metrics in the Prometheus text exposition format. `extra` adds plain
+    counters/gauges (e.g. cache counters) as `name value` pairs.
+    """
+    lines = [
+        "# HELP http_requests_total HTTP requests by route and status.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route), stats in sorted(metrics.routes.items()):
+        for status, count in sorted(stats.statuses.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines += [
+        "# HELP http_request_duration_seconds Time from request to the end of the response body.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), stats in sorted(metrics.routes.items()):
+        _histogram(lines, "http_request_duration_seconds", stats.latency, method=method, route=route)
+
+    lines += [
+        "# HELP http_request_db_queries SQL statements executed per request.",
+        "# TYPE http_request_db_queries histogram",
+    ]
+    for (method, route), stats in sorted(metrics.routes.items()):
+        _histogram(lines, "http_request_db_queries", stats.queries, method=method, route=route)
+
+    lines += [
+        "# HELP http_request_db_seconds_total Time spent in SQL statements, by route.",
+        "# TYPE http_request_db_seconds_total counter",
+    ]
+    for (method, route), stats in sorted(metrics.routes.items()):
+        lines.append(f"http_request_db_seconds_total{_labels(method=method, route=route)} {stats.db_seconds:.6f}")
+
+    lines += [
+        "# HELP db_queries_total SQL statements executed, including outside requests.",
+        "# TYPE db_queries_total counter",
+        f"db_queries_total {metrics.queries}",
+        "# HELP db_query_seconds_total Time spent in SQL statements, including outside requests.",
+        "# TYPE db_query_seconds_total counter",
+        f"db_query_seconds_total {metrics.db_seconds:.6f}",
+        f"# HELP db_slow_queries_total SQL statements slower than {SLOW_QUERY_MS:g} ms.",
+        "# TYPE db_slow_queries_total counter",
+        f"db_slow_queries_total {metrics.slow_queries}",
+        "# HELP process_start_time_seconds Start time of the process since the epoch.",
+        "# TYPE process_start_time_seconds gauge",
+        f"process_start_time_seconds {metrics.started_at:.3f}",
+    ]
+    for name, value in (extra or {}).items():
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines += [f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
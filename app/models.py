@@ -1,23 +1,25 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean, ForeignKey, Index, event
 from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
-import json
+import orjson
 from .database import Base
+from .search import install_search_index
 from datetime import datetime
 
 class JSONList(TypeDecorator):
     """Custom type for storing lists as JSON strings"""
     impl = Text
+    cache_ok = True  # stateless, so statements using it can be cached
 
     def process_bind_param(self, value, dialect):
         if value is None:
             return None
-        return json.dumps(value)
+        return orjson.dumps(value).decode()
 
     def process_result_value(self, value, dialect):
         if value is None:
             return None
-        return json.loads(value)
+        return orjson.loads(value)
 
 class Event(Base):
     __tablename__ = "events"
@@ -39,6 +41,35 @@ class Event(Base):
     price = Column(Float, nullable=True)
     currency = Column(String(10), default="USD")
 
+    # Serves the start_date filter, the (start_date, id) ordering and keyset pagination
+    __table_args__ = (
+        Index("ix_events_start_date_id", "start_date", "id"),
+    )
+
+class EventGenre(Base):
+    """One row per genre of an event, mirroring Event.genres for indexed filtering"""
+    __tablename__ = "event_genres"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    genre = Column(String(255), primary_key=True)  # normalized, see event_tags.normalize
+
+    __table_args__ = (
+        Index("ix_event_genres_genre_event_id", "genre", "event_id"),
+    )
+
+class EventLineup(Base):
+    """One row per lineup entry of an event, mirroring Event.lineup, linked to a DJ when the alias matches"""
+    __tablename__ = "event_lineup"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    artist = Column(String(255), primary_key=True)  # normalized, see event_tags.normalize
+    dj_id = Column(Integer, ForeignKey("djs.id", ondelete="SET NULL"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_event_lineup_artist_event_id", "artist", "event_id"),
+        Index("ix_event_lineup_dj_id_event_id", "dj_id", "event_id"),
+    )
+
 class Content(Base):
     __tablename__ = "contents"
 
@@ -56,6 +87,13 @@ class MailingListEntry(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     subscribed = Column(Boolean, default=True)  # To allow users to unsubscribe 
 
+    __table_args__ = (
+        # Admin listing: WHERE subscribed = 1 ORDER BY created_at, id, paged by keyset
+        Index("ix_mailing_list_subscribed_created_at_id", "subscribed", "created_at", "id"),
+        # The same listing without the subscribed filter, and created_at ranges on export
+        Index("ix_mailing_list_created_at_id", "created_at", "id"),
+    )
+
 
 
 class DjSocials(Base):
@@ -78,3 +116,34 @@ class Dj(Base):
     social_id = Column(Integer, ForeignKey("dj_socials.id"))
     
     socials = relationship("DjSocials")
+
+class UploadJob(Base):
+    __tablename__ = "upload_jobs"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex, handed to the client
+    status = Column(String(16), default="queued", index=True)  # "queued", "running", "succeeded", "failed"
+    folder = Column(String(255))
+    filename = Column(String(255))
+    file_path = Column(String(1024))  # spooled copy of the upload, removed once it finishes
+    size = Column(Integer)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    error = Column(Text, nullable=True)
+    secure_url = Column(String(1024), nullable=True)
+    public_id = Column(String(255), nullable=True)
+    format = Column(String(16), nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Full-text search tables (SQLite FTS5) are created with the ORM tables
+event.listen(Base.metadata, "after_create", install_search_index)
+
+def backfill_event_tags(target, connection, tables=(), **kw):
+    """Index the genres and lineups of existing events when their tables are first created"""
+    if EventGenre.__table__ in tables or EventLineup.__table__ in tables:
+        from .event_tags import rebuild  # event_tags imports this module
+        rebuild(connection)
+
+event.listen(Base.metadata, "after_create", backfill_event_tags)
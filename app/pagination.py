@@ -0,0 +1,49 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+# Response header carrying the cursor for the next page of a keyset-paginated listing
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Response header with the number of rows matching a listing's filters, across all pages
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Pack the sort key of the last row of a page into an opaque, URL-safe token"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Unpack a (datetime, id) cursor produced by encode_cursor; the datetime is None for a NULL row"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (None if sort_value is None else datetime.fromisoformat(sort_value)), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        ) from e
+
+def after_cursor(sort_column, id_column, sort_value, row_id):
+    """
+    Keyset condition for rows strictly after (sort_value, row_id) in (sort_column, id_column)
+    order. Combine it with a single `sort_column >= ...` lower bound: SQLite only seeks the
+    composite index on one lower bound and scans from there.
+
+    NULLs sort first in ascending order (SQLite and MySQL), so a NULL sort_value is followed
+    by the remaining NULL rows and then every non-NULL one; there is no lower bound to add.
+    """
+    if sort_value is None:
+        return or_(
+            and_(sort_column.is_(None), id_column > row_id),
+            sort_column.is_not(None),
+        )
+    return or_(
+        sort_column > sort_value,
+        and_(sort_column == sort_value, id_column > row_id),
+    )
@@ -1,84 +1,116 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Dict, List, Optional, Union
+import logging
 
-from .. import models, schemas, database, dependencies
+from .. import models, schemas, database, dependencies, cache, serialization, batch
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/content",
     tags=["content"]
 )
 
+CONTENT_ROWS = serialization.RowMapper(models.Content, schemas.Content)
+
 @router.post("/", response_model=schemas.Content)
 async def create_content(
     content: schemas.ContentCreate,
-    db: Session = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
-    # Check if content with this key already exists
-    db_content = db.query(models.Content).filter(models.Content.key == content.key).first()
-    if db_content:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Content with key '{content.key}' already exists"
+    async def insert_content(db: AsyncSession):
+        # Check if content with this key already exists
+        db_content = await db.scalar(select(models.Content).where(models.Content.key == content.key))
+        if db_content:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Content with key '{content.key}' already exists"
+            )
+        
+        db_content = models.Content(
+            key=content.key,
+            string_collection=content.string_collection,
+            big_string=content.big_string
         )
-    
-    db_content = models.Content(
-        key=content.key,
-        string_collection=content.string_collection,
-        big_string=content.big_string
-    )
-    db.add(db_content)
-    db.commit()
-    db.refresh(db_content)
-    print(f"Db_content: {db_content}")
+        db.add(db_content)
+        await db.flush()
+        return db_content
+
+    db_content = await database.run_in_transaction(insert_content)
+    cache.response_cache.invalidate("content")
+    logger.debug(f"Created content: {db_content.key}")
     return db_content
 
-@router.get("/", response_model=List[schemas.Content])
+@router.get("/", response_model=Union[List[schemas.Content], Dict[str, schemas.Content]])
 async def read_all_content(
+    request: Request,
     skip: int = 0, 
     limit: int = 100,
-    db: Session = Depends(database.get_db)
+    keys: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_db)
 ):
-    return db.query(models.Content).offset(skip).limit(limit).all()
+    """
+    List content. With `keys` (e.g. `keys=about,faq`) those entries are
+    fetched in one query and returned as a map of key to content instead.
+    """
+    content_keys = batch.parse_keys(keys) if keys is not None else None
+    cached = cache.lookup(request, "content")
+    if cached.response is not None:
+        return cached.response
+
+    if content_keys is not None:
+        result = await db.execute(CONTENT_ROWS.select().where(models.Content.key.in_(content_keys)))
+        return cached.store_rows(batch.keyed(CONTENT_ROWS.to_dicts(result), "key", content_keys))
+
+    result = await db.execute(CONTENT_ROWS.select().offset(skip).limit(limit))
+    return cached.store_rows(CONTENT_ROWS.to_dicts(result))
 
 @router.get("/{key}", response_model=schemas.Content)
-async def read_content_by_key(key: str, db: Session = Depends(database.get_db)):
-    db_content = db.query(models.Content).filter(models.Content.key == key).first()
+async def read_content_by_key(key: str, request: Request, db: AsyncSession = Depends(database.get_db)):
+    cached = cache.lookup(request, "content")
+    if cached.response is not None:
+        return cached.response
+
+    db_content = await db.scalar(select(models.Content).where(models.Content.key == key))
     if db_content is None:
         raise HTTPException(status_code=404, detail=f"Content with key '{key}' not found")
-    return db_content
+    return cached.store(schemas.Content, db_content)
 
 @router.put("/{key}", response_model=schemas.Content)
 async def update_content(
     key: str,
     content: schemas.ContentUpdate,
-    db: Session = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
-    db_content = db.query(models.Content).filter(models.Content.key == key).first()
-    if db_content is None:
-        raise HTTPException(status_code=404, detail=f"Content with key '{key}' not found")
-    
-    # Update content attributes
     content_data = content.dict(exclude_unset=True)
-    for key, value in content_data.items():
-        setattr(db_content, key, value)
-    
-    db.commit()
-    db.refresh(db_content)
+
+    async def apply_update(db: AsyncSession):
+        db_content = await db.scalar(select(models.Content).where(models.Content.key == key))
+        if db_content is None:
+            raise HTTPException(status_code=404, detail=f"Content with key '{key}' not found")
+        
+        # Update content attributes
+        for field, value in content_data.items():
+            setattr(db_content, field, value)
+        return db_content
+
+    db_content = await database.run_in_transaction(apply_update)
+    cache.response_cache.invalidate("content")
     return db_content
 
 @router.delete("/{key}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_content(
     key: str,
-    db: Session = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
-    db_content = db.query(models.Content).filter(models.Content.key == key).first()
-    if db_content is None:
-        raise HTTPException(status_code=404, detail=f"Content with key '{key}' not found")
-    
-    db.delete(db_content)
-    db.commit()
+    async def remove_content(db: AsyncSession):
+        db_content = await db.scalar(select(models.Content).where(models.Content.key == key))
+        if db_content is None:
+            raise HTTPException(status_code=404, detail=f"Content with key '{key}' not found")
+        await db.delete(db_content)
+
+    await database.run_in_transaction(remove_content)
+    cache.response_cache.invalidate("content")
     return None 
\ No newline at end of file
@@ -1,109 +1,215 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import Date
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, noload
+from sqlalchemy import Date, select
+from typing import Dict, List, Optional, Set, Union
 from datetime import datetime, date
 import pytz
+import logging
 
-from .. import models, schemas, database, dependencies
+from .. import models, schemas, database, dependencies, cache, event_tags, serialization, batch
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/djs",
     tags=["djs"]
 )
 
+DJ_FIELDS = set(schemas.Dj.model_fields)
+DJ_ROWS = serialization.RowMapper(models.Dj, schemas.Dj)
+SOCIALS_ROWS = serialization.RowMapper(models.DjSocials, schemas.DjSocials)
+
+def dj_query(with_socials: bool = True):
+    """
+    Select DJs with their socials joined in the same query (async sessions cannot
+    lazy load, and one SELECT per DJ does not scale), or skip socials entirely.
+    """
+    loader = joinedload(models.Dj.socials) if with_socials else noload(models.Dj.socials)
+    return select(models.Dj).options(loader)
+
+async def load_dj(db: AsyncSession, dj_id: int, with_socials: bool = True) -> Optional[models.Dj]:
+    """Fetch a DJ with fresh socials, replacing any stale state in the session"""
+    query = dj_query(with_socials).where(models.Dj.id == dj_id).execution_options(populate_existing=True)
+    return await db.scalar(query)
+
+def dj_rows_query(with_socials: bool = True):
+    """dj_query() as plain columns, for listings rendered without ORM objects"""
+    if not with_socials:
+        return DJ_ROWS.select()
+    return (
+        select(*DJ_ROWS.columns, *SOCIALS_ROWS.columns)
+        .outerjoin(models.DjSocials, models.Dj.socials)
+    )
+
+def dj_dicts(rows, with_socials: bool = True):
+    """Rows of dj_rows_query() as dicts shaped like schemas.Dj"""
+    if not with_socials:
+        return [{**DJ_ROWS.to_dict(row), "socials": None} for row in rows]
+    split = len(DJ_ROWS.fields)
+    djs = []
+    for row in rows:
+        dj = DJ_ROWS.to_dict(row[:split])
+        socials = SOCIALS_ROWS.to_dict(row[split:])
+        # Outer join: a DJ without socials has NULL in every socials column
+        dj["socials"] = socials if socials["id"] is not None else None
+        djs.append(dj)
+    return djs
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """Comma-separated `fields=` projection; None means every field"""
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - DJ_FIELDS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return requested
+
 @router.post("/", response_model=schemas.Dj)
 async def create_dj(
     dj: schemas.DjCreate,
-    db: Session = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
-    # Create socials first if provided
-    print(dj)
-    socials = None
-    if dj.socials:
-        socials = models.DjSocials(**dj.socials.dict())
-        db.add(socials)
-        db.flush()  # Get the socials ID without committing
-    print(f"Dj: {dj}")
-    print(f"Socials: {socials}")
-
-    # Create DJ with optional socials reference
-    db_dj = models.Dj(
-        alias=dj.alias,
-        profile_url=dj.profile_url,
-        social_id=socials.id if socials else None
-    )
-    db.add(db_dj)
-    db.commit()
-    db.refresh(db_dj)
+    logger.debug(f"Creating DJ: {dj}")
+
+    async def insert_dj(db: AsyncSession):
+        # Create socials first if provided
+        socials = None
+        if dj.socials:
+            socials = models.DjSocials(**dj.socials.dict())
+            db.add(socials)
+            await db.flush()  # Get the socials ID without committing
+        logger.debug(f"Socials: {socials}")
+
+        # Create DJ with optional socials reference
+        db_dj = models.Dj(
+            alias=dj.alias,
+            profile_url=dj.profile_url,
+            social_id=socials.id if socials else None
+        )
+        db.add(db_dj)
+        await db.flush()
+        await event_tags.link_dj(db, db_dj.id, db_dj.alias)
+        return await load_dj(db, db_dj.id)
+
+    db_dj = await database.run_in_transaction(insert_dj)
+    cache.response_cache.invalidate("djs")
+    cache.response_cache.invalidate("events")
+    cache.response_cache.invalidate("search")
     return db_dj
 
-@router.get("/", response_model=List[schemas.Dj])
+@router.get("/", response_model=Union[List[schemas.Dj], Dict[str, schemas.Dj]])
 async def read_djs(
+    request: Request,
     skip: int = 0, 
     limit: int = 100,
-    db: Session = Depends(database.get_db)
+    fields: Optional[str] = None,
+    ids: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_db)
 ):
-    return db.query(models.Dj).offset(skip).limit(limit).all()
+    """
+    List DJs. `fields` (e.g. `id,alias,profile_url`) limits the returned fields;
+    socials are only loaded when requested. With `ids` (e.g. `ids=1,2,3`) the
+    DJs are fetched in one query and returned as a map of id to DJ instead.
+    """
+    include = parse_fields(fields)
+    dj_ids = batch.parse_ids(ids) if ids is not None else None
+    cached = cache.lookup(request, "djs")
+    if cached.response is not None:
+        return cached.response
+
+    with_socials = include is None or "socials" in include
+    if dj_ids is not None:
+        result = await db.execute(dj_rows_query(with_socials).where(models.Dj.id.in_(dj_ids)))
+        return cached.store_rows(batch.keyed(dj_dicts(result, with_socials), "id", dj_ids, include))
+
+    result = await db.execute(dj_rows_query(with_socials).offset(skip).limit(limit))
+    return cached.store_rows(serialization.project(dj_dicts(result, with_socials), include))
 
 @router.get("/{dj_id}", response_model=schemas.Dj)
-async def read_dj(dj_id: int, db: Session = Depends(database.get_db)):
-    db_dj = db.query(models.Dj).filter(models.Dj.id == dj_id).first()
+async def read_dj(
+    dj_id: int,
+    request: Request,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_db)
+):
+    include = parse_fields(fields)
+    cached = cache.lookup(request, "djs")
+    if cached.response is not None:
+        return cached.response
+
+    db_dj = await load_dj(db, dj_id, with_socials=include is None or "socials" in include)
     if db_dj is None:
         raise HTTPException(status_code=404, detail="DJ not found")
-    return db_dj
+    return cached.store(schemas.Dj, db_dj, include=include)
 
 @router.put("/{dj_id}", response_model=schemas.Dj)
 async def update_dj(
     dj_id: int,
     dj: schemas.DjUpdate,
-    db: Session = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
-    db_dj = db.query(models.Dj).filter(models.Dj.id == dj_id).first()
-    if db_dj is None:
-        raise HTTPException(status_code=404, detail="DJ not found")
-    
-    # Update DJ attributes
     dj_data = dj.dict(exclude_unset=True)
-    for key, value in dj_data.items():
-        if key == 'socials' and value is not None:
-            # Handle socials update
-            if db_dj.social_id:
-                # Update existing socials
-                db_socials = db.query(models.DjSocials).filter(models.DjSocials.id == db_dj.social_id).first()
-                for social_key, social_value in value.items():
-                    setattr(db_socials, social_key, social_value)
+
+    async def apply_update(db: AsyncSession):
+        db_dj = await load_dj(db, dj_id)
+        if db_dj is None:
+            raise HTTPException(status_code=404, detail="DJ not found")
+        
+        # Update DJ attributes
+        for key, value in dj_data.items():
+            if key == 'socials' and value is not None:
+                # Handle socials update
+                if db_dj.social_id:
+                    # Update existing socials
+                    db_socials = await db.get(models.DjSocials, db_dj.social_id)
+                    for social_key, social_value in value.items():
+                        setattr(db_socials, social_key, social_value)
+                else:
+                    # Create new socials
+                    socials = models.DjSocials(**value)
+                    db.add(socials)
+                    await db.flush()
+                    db_dj.social_id = socials.id
             else:
-                # Create new socials
-                socials = models.DjSocials(**value.dict())
-                db.add(socials)
-                db.flush()
-                db_dj.social_id = socials.id
-        else:
-            setattr(db_dj, key, value)
-    
-    db.commit()
-    db.refresh(db_dj)
+                setattr(db_dj, key, value)
+        
+        await db.flush()
+        if "alias" in dj_data:
+            await event_tags.link_dj(db, dj_id, db_dj.alias)
+        return await load_dj(db, dj_id)
+
+    db_dj = await database.run_in_transaction(apply_update)
+    cache.response_cache.invalidate("djs")
+    cache.response_cache.invalidate("events")
+    cache.response_cache.invalidate("search")
     return db_dj
 
 @router.delete("/{dj_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_dj(
     dj_id: int,
-    db: Session = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
-    db_dj = db.query(models.Dj).filter(models.Dj.id == dj_id).first()
-    if db_dj is None:
-        raise HTTPException(status_code=404, detail="DJ not found")
-    
-    # Delete associated socials if they exist
-    if db_dj.social_id:
-        db_socials = db.query(models.DjSocials).filter(models.DjSocials.id == db_dj.social_id).first()
-        if db_socials:
-            db.delete(db_socials)
-    
-    db.delete(db_dj)
-    db.commit()
+    async def remove_dj(db: AsyncSession):
+        db_dj = await load_dj(db, dj_id)
+        if db_dj is None:
+            raise HTTPException(status_code=404, detail="DJ not found")
+        
+        # Delete associated socials if they exist
+        if db_dj.social_id:
+            db_socials = await db.get(models.DjSocials, db_dj.social_id)
+            if db_socials:
+                await db.delete(db_socials)
+        
+        await event_tags.link_dj(db, dj_id, None)
+        await db.delete(db_dj)
+
+    await database.run_in_transaction(remove_dj)
+    cache.response_cache.invalidate("djs")
+    cache.response_cache.invalidate("events")
+    cache.response_cache.invalidate("search")
     return None
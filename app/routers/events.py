@@ -1,102 +1,174 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import Date
-from typing import List, Optional
-from datetime import datetime, date
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Date, select
+from typing import Dict, List, Optional, Union
+from datetime import datetime, date, time
 import pytz
 
-from .. import models, schemas, database, dependencies
+from .. import models, schemas, database, dependencies, pagination, cache, event_tags, serialization, batch
 
 router = APIRouter(
     prefix="/events",
     tags=["events"]
 )
 
+EVENT_ROWS = serialization.RowMapper(models.Event, schemas.Event)
+
 @router.post("/", response_model=schemas.Event)
 async def create_event(
     event: schemas.EventCreate,
-    db: Session = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
-    # Only store the date portion in UTC
-    db_event = models.Event(
-        name=event.name,
-        venue_name=event.venue_name,
-        address=event.address,
-        start_date=event.start_date,
-        start_time=event.start_time,
-        end_time=event.end_time,
-        time_zone=event.time_zone,
-        ticket_status=event.ticket_status,
-        ticket_link=event.ticket_link,
-        lineup=event.lineup,
-        genres=event.genres,
-        description=event.description,
-        poster_url=event.poster_url,
-        price=event.price,
-        currency=event.currency
-    )
-    db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    async def insert_event(db: AsyncSession):
+        # Only store the date portion in UTC
+        db_event = models.Event(
+            name=event.name,
+            venue_name=event.venue_name,
+            address=event.address,
+            start_date=event.start_date,
+            start_time=event.start_time,
+            end_time=event.end_time,
+            time_zone=event.time_zone,
+            ticket_status=event.ticket_status,
+            ticket_link=event.ticket_link,
+            lineup=event.lineup,
+            genres=event.genres,
+            description=event.description,
+            poster_url=event.poster_url,
+            price=event.price,
+            currency=event.currency
+        )
+        db.add(db_event)
+        await db.flush()
+        await event_tags.sync_event(db, db_event)
+        return db_event
+
+    db_event = await database.run_in_transaction(insert_event)
+    cache.response_cache.invalidate("events")
+    cache.response_cache.invalidate("search")
     return db_event
 
-@router.get("/", response_model=List[schemas.Event])
+@router.get("/", response_model=Union[List[schemas.Event], Dict[str, schemas.Event]])
 async def read_events(
+    request: Request,
     skip: int = 0, 
     limit: int = 100,
     upcoming: bool = False,
-    db: Session = Depends(database.get_db)
+    cursor: Optional[str] = None,
+    genre: Optional[str] = None,
+    artist: Optional[str] = None,
+    dj_id: Optional[int] = None,
+    ids: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_db)
 ):
-    query = db.query(models.Event)
+    """
+    List events ordered by start date. Pass the `X-Next-Cursor` header of a full
+    page back as `cursor` to fetch the next page by keyset instead of `skip`.
+    `genre` and `artist` match a genre or lineup entry, ignoring case; `dj_id`
+    matches lineup entries linked to that DJ.
+
+    With `ids` (e.g. `ids=4,8,15`) the events are fetched in one query and
+    returned as a map of id to event instead; the other filters do not apply.
+    """
+    event_ids = batch.parse_ids(ids) if ids is not None else None
+    cached = cache.lookup(request, "events")
+    if cached.response is not None:
+        return cached.response
+
+    if event_ids is not None:
+        result = await db.execute(EVENT_ROWS.select().where(models.Event.id.in_(event_ids)))
+        return cached.store_rows(batch.keyed(EVENT_ROWS.to_dicts(result), "id", event_ids))
+
+    query = EVENT_ROWS.select()
 
-    if upcoming:
-        # Compare only the date portion for upcoming events
-        today_utc = datetime.now(pytz.UTC).date()
-        query = query.filter(models.Event.start_date >= today_utc)
+    # Compare only the date portion for upcoming events
+    today_utc = datetime.combine(datetime.now(pytz.UTC).date(), time.min)
+    lower_bound = today_utc if upcoming else None
+    if not upcoming:
+        query = query.where(models.Event.start_date < today_utc)
+
+    # Resolved through the (genre, event_id), (artist, event_id) and (dj_id, event_id) indexes
+    if genre:
+        query = query.where(models.Event.id.in_(
+            select(models.EventGenre.event_id).where(models.EventGenre.genre == event_tags.normalize(genre))
+        ))
+    if artist:
+        query = query.where(models.Event.id.in_(
+            select(models.EventLineup.event_id).where(models.EventLineup.artist == event_tags.normalize(artist))
+        ))
+    if dj_id is not None:
+        query = query.where(models.Event.id.in_(
+            select(models.EventLineup.event_id).where(models.EventLineup.dj_id == dj_id)
+        ))
+
+    if cursor:
+        after_date, after_id = pagination.decode_cursor(cursor)
+        query = query.where(pagination.after_cursor(models.Event.start_date, models.Event.id, after_date, after_id))
+        if after_date is not None:
+            lower_bound = max(lower_bound, after_date) if lower_bound else after_date
     else:
-        today_utc = datetime.now(pytz.UTC).date()
-        query = query.filter(models.Event.start_date < today_utc)
+        query = query.offset(skip)
+
+    if lower_bound is not None:
+        query = query.where(models.Event.start_date >= lower_bound)
     
-    return query.order_by(models.Event.start_date).offset(skip).limit(limit).all()
+    result = await db.execute(query.order_by(models.Event.start_date, models.Event.id).limit(limit))
+    events = EVENT_ROWS.to_dicts(result)
+    headers = {}
+    if events and len(events) == limit:
+        last = events[-1]
+        headers[pagination.NEXT_CURSOR_HEADER] = pagination.encode_cursor((last["start_date"], last["id"]))
+    return cached.store_rows(events, headers)
 
 @router.get("/{event_id}", response_model=schemas.Event)
-async def read_event(event_id: int, db: Session = Depends(database.get_db)):
-    db_event = db.query(models.Event).filter(models.Event.id == event_id).first()
+async def read_event(event_id: int, request: Request, db: AsyncSession = Depends(database.get_db)):
+    cached = cache.lookup(request, "events")
+    if cached.response is not None:
+        return cached.response
+
+    db_event = await db.get(models.Event, event_id)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
-    return db_event
+    return cached.store(schemas.Event, db_event)
 
 @router.put("/{event_id}", response_model=schemas.Event)
 async def update_event(
     event_id: int,
     event: schemas.EventUpdate,
-    db: Session = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
-    db_event = db.query(models.Event).filter(models.Event.id == event_id).first()
-    if db_event is None:
-        raise HTTPException(status_code=404, detail="Event not found")
-    
-    # Update event attributes
     event_data = event.dict(exclude_unset=True)
-    for key, value in event_data.items():
-        setattr(db_event, key, value)
-    
-    db.commit()
-    db.refresh(db_event)
+
+    async def apply_update(db: AsyncSession):
+        db_event = await db.get(models.Event, event_id)
+        if db_event is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        
+        # Update event attributes
+        for key, value in event_data.items():
+            setattr(db_event, key, value)
+        if "genres" in event_data or "lineup" in event_data:
+            await event_tags.sync_event(db, db_event)
+        return db_event
+
+    db_event = await database.run_in_transaction(apply_update)
+    cache.response_cache.invalidate("events")
+    cache.response_cache.invalidate("search")
     return db_event
 
 @router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_event(
     event_id: int,
-    db: Session = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
-    db_event = db.query(models.Event).filter(models.Event.id == event_id).first()
-    if db_event is None:
-        raise HTTPException(status_code=404, detail="Event not found")
-    
-    db.delete(db_event)
-    db.commit()
+    async def remove_event(db: AsyncSession):
+        db_event = await db.get(models.Event, event_id)
+        if db_event is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        await event_tags.clear_event(db, event_id)
+        await db.delete(db_event)
+
+    await database.run_in_transaction(remove_event)
+    cache.response_cache.invalidate("events")
+    cache.response_cache.invalidate("search")
     return None 
\ No newline at end of file
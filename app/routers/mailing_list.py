@@ -1,104 +1,174 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from datetime import datetime
+from sqlalchemy import func, select
 from sqlalchemy.exc import IntegrityError
 
-from .. import models, schemas, database, dependencies
+from .. import models, schemas, database, dependencies, mailing_import, mailing_export, pagination, cache, serialization, subscriptions
 
 router = APIRouter(
     prefix="/mailing-list",
     tags=["mailing-list"]
 )
 
+ENTRY_ROWS = serialization.RowMapper(models.MailingListEntry, schemas.MailingListEntry)
+
 @router.post("/subscribe", response_model=schemas.MailingListEntry)
 async def subscribe_to_mailing_list(
-    entry: schemas.MailingListEntryCreate,
-    db: Session = Depends(database.get_db)
+    entry: schemas.MailingListEntryCreate
 ):
-    """Public endpoint for users to subscribe to the mailing list"""
+    """
+    Public endpoint for users to subscribe to the mailing list. Concurrent
+    subscribes are written together in one transaction, see subscriptions.SubscribeBatcher
+    """
     try:
-        # Check if email already exists but unsubscribed
-        existing_entry = db.query(models.MailingListEntry).filter(
-            models.MailingListEntry.email == entry.email
-        ).first()
-        
-        if existing_entry:
-            if existing_entry.subscribed:
-                # Already subscribed
-                return existing_entry
-            else:
-                # Re-subscribe
-                existing_entry.subscribed = True
-                existing_entry.name = entry.name  # Update name if changed
-                db.commit()
-                db.refresh(existing_entry)
-                return existing_entry
-        
-        # Create new entry
-        db_entry = models.MailingListEntry(
-            name=entry.name,
-            email=entry.email
-        )
-        db.add(db_entry)
-        db.commit()
-        db.refresh(db_entry)
-        return db_entry
+        db_entry, _ = await subscriptions.subscribe_batcher.subscribe(entry)
     except IntegrityError:
         # Handle potential race condition
-        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="This email is already subscribed"
         )
+    return db_entry
 
 @router.get("/unsubscribe/{email}", status_code=status.HTTP_200_OK)
 async def unsubscribe_from_mailing_list(
-    email: str,
-    db: Session = Depends(database.get_db)
+    email: str
 ):
     """Public endpoint for users to unsubscribe from the mailing list"""
-    db_entry = db.query(models.MailingListEntry).filter(
-        models.MailingListEntry.email == email
-    ).first()
-    
-    if not db_entry:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Email not found in mailing list"
-        )
-    
-    db_entry.subscribed = False
-    db.commit()
+    async def mark_unsubscribed(db: AsyncSession):
+        db_entry = await db.scalar(select(models.MailingListEntry).where(
+            models.MailingListEntry.email == email
+        ))
+        
+        if not db_entry:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Email not found in mailing list"
+            )
+        
+        db_entry.subscribed = False
+
+    await database.run_in_transaction(mark_unsubscribed)
+    cache.response_cache.invalidate("mailing_list")
     return {"message": "Successfully unsubscribed"}
 
 # Admin endpoints below - all require authentication
 
+@router.post("/import", response_model=schemas.MailingListImportSummary)
+async def import_mailing_list(
+    request: Request,
+    format: Optional[str] = None,
+    _: bool = Depends(dependencies.verify_admin)
+):
+    """
+    Admin endpoint to bulk import subscribers from a CSV (with an `email` and
+    optional `name` header) or NDJSON request body. The body is streamed and
+    written in batches, so large files never sit in memory in full.
+    """
+    body_format = mailing_import.detect_format(request.headers.get("content-type"), format)
+    lines = mailing_import.read_lines(request.stream())
+    if body_format == "ndjson":
+        records = mailing_import.ndjson_records(lines)
+    else:
+        records = mailing_import.csv_records(lines)
+    try:
+        return await mailing_import.MailingListImport().run(records)
+    finally:
+        # Batches written before a failure are committed too
+        cache.response_cache.invalidate("mailing_list")
+
+@router.get("/export")
+async def export_mailing_list(
+    format: str = "csv",
+    subscribed: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    gzip: bool = False,
+    _: bool = Depends(dependencies.verify_admin)
+):
+    """
+    Admin endpoint to download the mailing list as CSV or NDJSON. Rows are
+    read from a server-side cursor and streamed, so memory use does not grow
+    with the size of the list.
+    """
+    if format not in mailing_export.MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format '{format}', use csv or ndjson"
+        )
+
+    query = mailing_export.export_query(subscribed, created_after, created_before)
+    body = mailing_export.export_rows(query, format)
+    filename = f"mailing-list.{format}"
+    media_type = mailing_export.MEDIA_TYPES[format]
+    if gzip:
+        body = mailing_export.gzip_chunks(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/", response_model=List[schemas.MailingListEntry])
 async def get_all_mailing_list_entries(
     skip: int = 0,
     limit: int = 100,
     subscribed_only: bool = True,
-    db: Session = Depends(database.get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
-    """Admin endpoint to get all mailing list entries"""
-    query = db.query(models.MailingListEntry)
+    """
+    Admin endpoint to get all mailing list entries, oldest signup first. Pass the
+    `X-Next-Cursor` header of a full page back as `cursor` to fetch the next page
+    by keyset instead of `skip`. `X-Total-Count` holds the number of matching entries.
+    """
+    query = ENTRY_ROWS.select()
     
     if subscribed_only:
-        query = query.filter(models.MailingListEntry.subscribed == True)
+        query = query.where(models.MailingListEntry.subscribed == True)
+
+    if cursor:
+        after_created, after_id = pagination.decode_cursor(cursor)
+        query = query.where(
+            pagination.after_cursor(models.MailingListEntry.created_at, models.MailingListEntry.id, after_created, after_id)
+        )
+        if after_created is not None:
+            query = query.where(models.MailingListEntry.created_at >= after_created)
+    else:
+        query = query.offset(skip)
     
-    return query.offset(skip).limit(limit).all()
+    result = await db.execute(query.order_by(models.MailingListEntry.created_at, models.MailingListEntry.id).limit(limit))
+    entries = ENTRY_ROWS.to_dicts(result)
+    headers = {}
+    if entries and len(entries) == limit:
+        last = entries[-1]
+        headers[pagination.NEXT_CURSOR_HEADER] = pagination.encode_cursor((last["created_at"], last["id"]))
+
+    async def count_entries():
+        count_query = select(func.count()).select_from(models.MailingListEntry)
+        if subscribed_only:
+            count_query = count_query.where(models.MailingListEntry.subscribed == True)
+        return await db.scalar(count_query)
+
+    total = await cache.count_cache.get("mailing_list", f"subscribed_only={subscribed_only}", count_entries)
+    headers[pagination.TOTAL_COUNT_HEADER] = str(total)
+    return serialization.json_response(entries, headers)
 
 @router.get("/{entry_id}", response_model=schemas.MailingListEntry)
 async def get_mailing_list_entry(
     entry_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
     """Admin endpoint to get a specific mailing list entry"""
-    db_entry = db.query(models.MailingListEntry).filter(
-        models.MailingListEntry.id == entry_id
-    ).first()
+    db_entry = await db.get(models.MailingListEntry, entry_id)
     
     if db_entry is None:
         raise HTTPException(
@@ -111,20 +181,20 @@ async def get_mailing_list_entry(
 @router.delete("/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_mailing_list_entry(
     entry_id: int,
-    db: Session = Depends(database.get_db),
     _: bool = Depends(dependencies.verify_admin)
 ):
     """Admin endpoint to delete a mailing list entry"""
-    db_entry = db.query(models.MailingListEntry).filter(
-        models.MailingListEntry.id == entry_id
-    ).first()
-    
-    if db_entry is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Mailing list entry with ID {entry_id} not found"
-        )
-    
-    db.delete(db_entry)
-    db.commit()
-    return None 
\ No newline at end of file
+    async def remove_entry(db: AsyncSession):
+        db_entry = await db.get(models.MailingListEntry, entry_id)
+        
+        if db_entry is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Mailing list entry with ID {entry_id} not found"
+            )
+        
+        await db.delete(db_entry)
+
+    await database.run_in_transaction(remove_entry)
+    cache.response_cache.invalidate("mailing_list")
+    return None
\ No newline at end of file
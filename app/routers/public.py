@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Request
+
+from .. import snapshot
+
+router = APIRouter(
+    prefix="/public",
+    tags=["public"]
+)
+
+@router.get("/snapshot")
+async def read_snapshot(request: Request):
+    """
+    Upcoming events, all DJs and all content in one bundle, for rendering the
+    public site with a single request:
+    `{"events": [...], "djs": [...], "content": {"<key>": {...}}}`.
+
+    Served precompressed (brotli or gzip, per Accept-Encoding) from memory;
+    writes rebuild the affected part in the background.
+    """
+    bundle = await snapshot.public_snapshot.get()
+    return snapshot.respond(request, bundle)
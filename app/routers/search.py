@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import schemas, database, cache, search
+
+router = APIRouter(
+    prefix="/search",
+    tags=["search"]
+)
+
+@router.get("", response_model=schemas.SearchResults)
+async def search_site(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(database.get_db)
+):
+    """
+    Full-text search over event names, venues, descriptions, lineups and genres,
+    and DJ aliases. Results are ranked best first; every word must match and the
+    last one may be a prefix, so the endpoint can back a search-as-you-type box.
+
+    Events are ranked among all their matches. With SEARCH_RANK_WINDOW set,
+    only the newest that-many matching events are ranked, so an older event
+    can be missing even when it is the best match.
+    """
+    if db.bind.dialect.name != "sqlite":
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search requires the SQLite backend"
+        )
+
+    cached = cache.lookup(request, "search")
+    if cached.response is not None:
+        return cached.response
+
+    match = search.match_expression(q)
+    if match is None:
+        results = {"events": [], "djs": []}
+    else:
+        results = {
+            "events": await search.search_events(db, match, limit),
+            "djs": await search.search_djs(db, match, limit),
+        }
+    return cached.store(schemas.SearchResults, results)
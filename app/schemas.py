@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class EventBase(BaseModel):
@@ -41,6 +41,17 @@ class EventUpdate(EventBase):
 
 class Event(EventBase):
     id: int = Field(..., description="Unique identifier for the event")
+    # The columns are nullable, and list endpoints return rows unvalidated (see
+    # serialization.RowMapper); single items must render a NULL the same way
+    name: Optional[str] = Field(..., description="Name of the event")
+    venue_name: Optional[str] = Field(..., description="Name of the venue")
+    address: Optional[str] = Field(..., description="Address of the venue")
+    start_date: Optional[datetime] = Field(..., description="Start date of the event")
+    start_time: Optional[str] = Field(..., description="Time in format 'HH:MM'")
+    end_time: Optional[str] = Field(..., description="Time in format 'HH:MM'")
+    time_zone: Optional[str] = Field(..., description="IANA time zone name (e.g., 'America/New_York')")
+    ticket_status: Optional[str] = Field(..., description="Available, Sold Out, or Sold At The Door")
+    description: Optional[str] = Field(..., description="Description of the event")
 
     class Config:
         orm_mode = True
@@ -59,6 +70,9 @@ class ContentUpdate(BaseModel):
 
 class Content(ContentBase):
     id: int
+    # Nullable columns, as on Event
+    key: Optional[str]
+    string_collection: Optional[List[str]] = []
 
     class Config:
         orm_mode = True
@@ -123,8 +137,61 @@ class MailingListEntryUpdate(BaseModel):
 
 class MailingListEntry(MailingListEntryBase):
     id: int
+    # Nullable columns, as on Event
+    name: Optional[str]
+    email: Optional[EmailStr]
+    created_at: Optional[datetime]
+    subscribed: Optional[bool]
+
+    class Config:
+        orm_mode = True 
+
+class MailingListImportError(BaseModel):
+    row: int = Field(..., description="1-based data row (header excluded)")
+    error: str
+
+class MailingListImportSummary(BaseModel):
+    rows: int = Field(..., description="Data rows read")
+    inserted: int = Field(..., description="New subscribers")
+    reactivated: int = Field(..., description="Unsubscribed emails subscribed again")
+    skipped: int = Field(..., description="Already subscribed, or repeated in the file")
+    invalid: int = Field(..., description="Rows without a valid email")
+    errors: List[MailingListImportError] = Field(..., description="The first invalid rows")
+
+
+class UploadJob(BaseModel):
+    id: str = Field(..., description="Job ID to poll at /upload/jobs/{id}")
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    filename: Optional[str] = None
+    size: int = Field(..., description="File size in bytes")
+    attempts: int = Field(..., description="Upload attempts so far")
+    progress: float = Field(0.0, description="Fraction of the file sent in the current attempt")
+    secure_url: Optional[str] = None
+    public_id: Optional[str] = None
+    format: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    error: Optional[str] = None
     created_at: datetime
-    subscribed: bool
+    updated_at: datetime
 
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True
+
+class EventSearchHit(BaseModel):
+    id: int
+    name: str
+    venue_name: Optional[str] = None
+    start_date: Optional[datetime] = None
+    poster_url: Optional[str] = None
+    highlights: Dict[str, str] = Field(..., description="Matched fields with terms wrapped in <mark>; description is a snippet")
+
+class DjSearchHit(BaseModel):
+    id: int
+    alias: str
+    profile_url: Optional[str] = None
+    highlights: Dict[str, str] = Field(..., description="Matched fields with terms wrapped in <mark>")
+
+class SearchResults(BaseModel):
+    events: List[EventSearchHit]
+    djs: List[DjSearchHit]
@@ -0,0 +1,187 @@
+import os
+import re
+from typing import List, Optional
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# FTS5 tables kept in sync with events and djs by triggers; the rowid is the
+# id of the indexed row. FTS5 also creates <name>_data, _idx, _content,
+# _docsize and _config shadow tables.
+SEARCH_TABLES = ("events_fts", "djs_fts")
+
+# Events are ranked among every match by default (0). A positive value ranks only
+# the newest this-many matches, which bounds the cost of broad terms on very large
+# tables but can leave the best older match out of the results
+RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "0"))
+
+# Highlight markers put around matched terms in the returned text
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+
+# lineup and genres are stored as JSON lists; index them as plain text
+def _list_text(column: str) -> str:
+    return f"(SELECT group_concat(value, ', ') FROM json_each(CASE WHEN json_valid({column}) THEN {column} END))"
+
+_EVENT_VALUES = (
+    "new.id, new.name, new.venue_name, new.description, "
+    f"{_list_text('new.lineup')}, {_list_text('new.genres')}"
+)
+
+SEARCH_DDL = [
+    # Column weights for ranking: name, venue_name, description, lineup, genres
+    """CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+        name, venue_name, description, lineup, genres,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4 5 6 7 8'
+    )""",
+    "INSERT INTO events_fts(events_fts, rank) VALUES ('rank', 'bm25(10.0, 4.0, 1.0, 6.0, 3.0)')",
+    f"""CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts(rowid, name, venue_name, description, lineup, genres) VALUES ({_EVENT_VALUES});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS events_fts_update
+        AFTER UPDATE OF name, venue_name, description, lineup, genres ON events BEGIN
+        DELETE FROM events_fts WHERE rowid = old.id;
+        INSERT INTO events_fts(rowid, name, venue_name, description, lineup, genres) VALUES ({_EVENT_VALUES});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
+        DELETE FROM events_fts WHERE rowid = old.id;
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS djs_fts USING fts5(
+        alias, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4 5 6 7 8'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS djs_fts_insert AFTER INSERT ON djs BEGIN
+        INSERT INTO djs_fts(rowid, alias) VALUES (new.id, new.alias);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS djs_fts_update AFTER UPDATE OF alias ON djs BEGIN
+        DELETE FROM djs_fts WHERE rowid = old.id;
+        INSERT INTO djs_fts(rowid, alias) VALUES (new.id, new.alias);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS djs_fts_delete AFTER DELETE ON djs BEGIN
+        DELETE FROM djs_fts WHERE rowid = old.id;
+    END""",
+]
+
+# Index whatever rows exist when the search tables are first created
+SEARCH_BACKFILL = [
+    "DELETE FROM events_fts",
+    "INSERT INTO events_fts(rowid, name, venue_name, description, lineup, genres) "
+    f"SELECT id, name, venue_name, description, {_list_text('lineup')}, {_list_text('genres')} FROM events",
+    "DELETE FROM djs_fts",
+    "INSERT INTO djs_fts(rowid, alias) SELECT id, alias FROM djs",
+]
+
+def install_search_index(target, connection, **kw) -> None:
+    """
+    metadata after_create hook: create the FTS5 tables and triggers on SQLite
+    if they are missing and index the rows already present.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    existing = connection.exec_driver_sql(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN ('events_fts', 'djs_fts')"
+    ).scalar()
+    for statement in SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    if existing < len(SEARCH_TABLES):
+        for statement in SEARCH_BACKFILL:
+            connection.exec_driver_sql(statement)
+
+def is_search_table(name: str) -> bool:
+    """True for the FTS5 tables and their shadow tables, which are not ORM models"""
+    return any(name == table or name.startswith(f"{table}_") for table in SEARCH_TABLES)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def match_expression(q: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression: every word must match, and
+    the last word matches as a prefix so results appear while typing. Words
+    are quoted, so FTS5 operators and punctuation in the input are inert.
+    """
+    tokens = _TOKEN.findall(q)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+# Lowest rowid among the newest RANK_WINDOW matches, when a window is set; FTS5
+# walks the doclist backwards by rowid without scoring anything
+EVENT_WINDOW = text("""
+    SELECT rowid FROM events_fts WHERE events_fts MATCH :match
+    ORDER BY rowid DESC LIMIT 1 OFFSET :offset
+""")
+
+EVENT_SEARCH = text("""
+    SELECT events.id, events.name, events.venue_name, events.start_date, events.poster_url,
+        highlight(events_fts, 0, :open, :close) AS name_highlight,
+        highlight(events_fts, 1, :open, :close) AS venue_name_highlight,
+        snippet(events_fts, 2, :open, :close, '…', 16) AS description_snippet,
+        highlight(events_fts, 3, :open, :close) AS lineup_highlight,
+        highlight(events_fts, 4, :open, :close) AS genres_highlight
+    FROM events_fts JOIN events ON events.id = events_fts.rowid
+    WHERE events_fts MATCH :match AND events_fts.rowid >= :floor
+    ORDER BY events_fts.rank
+    LIMIT :limit
+""").columns(start_date=DateTime)
+
+DJ_SEARCH = text("""
+    SELECT djs.id, djs.alias, djs.profile_url,
+        highlight(djs_fts, 0, :open, :close) AS alias_highlight
+    FROM djs_fts JOIN djs ON djs.id = djs_fts.rowid
+    WHERE djs_fts MATCH :match
+    ORDER BY djs_fts.rank
+    LIMIT :limit
+""")
+
+def _highlights(row, columns) -> dict:
+    """Highlighted text of the columns that actually matched"""
+    highlights = {}
+    for field, column in columns:
+        value = row[column]
+        if value and HIGHLIGHT_OPEN in value:
+            highlights[field] = value
+    return highlights
+
+async def search_events(db: AsyncSession, match: str, limit: int) -> List[dict]:
+    floor = None
+    if RANK_WINDOW > 0:
+        floor = await db.scalar(EVENT_WINDOW, {"match": match, "offset": RANK_WINDOW - 1})
+    params = {
+        "match": match,
+        "floor": floor or 0,
+        "limit": limit,
+        "open": HIGHLIGHT_OPEN,
+        "close": HIGHLIGHT_CLOSE,
+    }
+    rows = (await db.execute(EVENT_SEARCH, params)).mappings().all()
+    return [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "venue_name": row["venue_name"],
+            "start_date": row["start_date"],
+            "poster_url": row["poster_url"],
+            "highlights": _highlights(row, [
+                ("name", "name_highlight"),
+                ("venue_name", "venue_name_highlight"),
+                ("description", "description_snippet"),
+                ("lineup", "lineup_highlight"),
+                ("genres", "genres_highlight"),
+            ]),
+        }
+        for row in rows
+    ]
+
+async def search_djs(db: AsyncSession, match: str, limit: int) -> List[dict]:
+    params = {"match": match, "limit": limit, "open": HIGHLIGHT_OPEN, "close": HIGHLIGHT_CLOSE}
+    rows = (await db.execute(DJ_SEARCH, params)).mappings().all()
+    return [
+        {
+            "id": row["id"],
+            "alias": row["alias"],
+            "profile_url": row["profile_url"],
+            "highlights": _highlights(row, [("alias", "alias_highlight")]),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,65 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# Read .env once, before any module looks at its environment; app/__init__.py
+# imports this module first so per-module tunables see it too
+load_dotenv()
+
+def env_flag(name: str, default: bool = False) -> bool:
+    return os.getenv(name, "1" if default else "0").strip().lower() in ("1", "true", "yes", "on")
+
+@dataclass(frozen=True)
+class Settings:
+    """Deployment settings shared across modules, read from the environment once at import"""
+    # SQLite stays the default; set DATABASE_BACKEND=mysql to use the MYSQL_* variables
+    database_backend: str
+    sqlite_database_url: str
+    mysql_host: str
+    mysql_port: str
+    mysql_user: str
+    mysql_password: str
+    mysql_database: str
+    # Default for development only
+    admin_password: str
+    cloudinary_cloud_name: Optional[str]
+    cloudinary_api_key: Optional[str]
+    cloudinary_api_secret: Optional[str]
+    # Boot skips create_all while the schema fingerprint stored in the database matches
+    schema_check: bool
+    # Fill the response cache and the public snapshot in the background after boot
+    startup_warmup: bool
+    # Worker processes started by serve.py; above 1, workers share cache invalidations
+    # and leave one-off startup work to the runner
+    workers: int
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_backend=os.getenv("DATABASE_BACKEND", "sqlite"),
+            sqlite_database_url=os.getenv("SQLITE_DATABASE_URL", "sqlite:////var/data/azulu.db"),
+            mysql_host=os.getenv("MYSQL_HOST", ""),
+            mysql_port=os.getenv("MYSQL_PORT", ""),
+            mysql_user=os.getenv("MYSQL_USER", ""),
+            mysql_password=os.getenv("MYSQL_PASSWORD", ""),
+            mysql_database=os.getenv("MYSQL_DATABASE", ""),
+            admin_password=os.getenv("ADMIN_PASSWORD", "admin"),
+            cloudinary_cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            cloudinary_api_key=os.getenv("CLOUDINARY_API_KEY"),
+            cloudinary_api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+            schema_check=env_flag("SCHEMA_CHECK", True),
+            startup_warmup=env_flag("STARTUP_WARMUP"),
+            workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        )
+
+    @property
+    def mysql_database_url(self) -> str:
+        return f"mysql+pymysql://{self.mysql_user}:{self.mysql_password}@{self.mysql_host}:{self.mysql_port}/{self.mysql_database}"
+
+    @property
+    def database_url(self) -> str:
+        return self.mysql_database_url if self.database_backend == "mysql" else self.sqlite_database_url
+
+settings = Settings.from_env()
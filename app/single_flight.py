@@ -0,0 +1,168 @@
+import asyncio
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import cache
+
+# Public reads to coalesce, as comma-separated path prefixes; only routes whose
+# responses depend on nothing but the URL and the conditional headers belong here
+SINGLE_FLIGHT_PATHS = tuple(
+    path for path in os.getenv("SINGLE_FLIGHT_PATHS", "/events,/content,/djs,/search").split(",") if path
+)
+# Responses larger than this are not kept for waiters; they make their own request
+SINGLE_FLIGHT_MAX_BYTES = int(os.getenv("SINGLE_FLIGHT_MAX_BYTES", str(4 * 1024 * 1024)))
+# Keys listed in snapshot(), busiest first
+SINGLE_FLIGHT_TOP_KEYS = 20
+
+# Part of the key: the same URL can answer 200 or 304 depending on these
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+
+@dataclass
+class SingleFlightStats:
+    leaders: int = 0
+    coalesced: int = 0
+    # Waiters whose leader failed, was cancelled or answered too large a body
+    fallbacks: int = 0
+
+def copy_message(message: Message) -> Message:
+    """
+    Outer middleware (CORS, compression) rewrite the messages they are sent in
+    place, per request; each request gets its own copy of the leader's
+    """
+    if "headers" in message:
+        return {**message, "headers": list(message["headers"])}
+    return dict(message)
+
+class Flight:
+    """One request in progress, and the identical requests waiting for its response"""
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.waiters = 0
+        self.messages: List[Message] = []
+        self.size = 0
+        self.shareable = True
+        self.done = asyncio.Event()
+
+    def record(self, message: Message) -> None:
+        if not self.shareable:
+            return
+        if message["type"] == "http.response.start":
+            self.shareable = message["status"] < 500
+        elif message["type"] == "http.response.body":
+            self.size += len(message.get("body", b""))
+            self.shareable = self.size <= SINGLE_FLIGHT_MAX_BYTES
+        if self.shareable:
+            self.messages.append(copy_message(message))
+        else:
+            self.messages = []
+
+    def response(self) -> Optional[List[Message]]:
+        """The leader's complete response, or None if waiters must make their own"""
+        complete = bool(self.messages) and not self.messages[-1].get("more_body", False)
+        return self.messages if self.shareable and complete else None
+
+class SingleFlight:
+    """
+    Identical public reads in flight at the same time, by key. The first
+    request of a key runs; the others wait and are sent a copy of its
+    response, so a burst of identical reads costs one session, one query and
+    one serialization.
+
+    A write closes every open flight to newcomers (through the response
+    cache's invalidation), so a request arriving after a write never gets a
+    response read before it.
+    """
+
+    def __init__(self):
+        self.flights: Dict[str, Flight] = {}
+        self.stats = SingleFlightStats()
+
+    def close(self, namespace: Optional[str] = None) -> None:
+        """Response cache listener: later arrivals start new flights"""
+        self.flights.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        busiest = sorted(self.flights.items(), key=lambda item: item[1].waiters, reverse=True)
+        return {
+            **asdict(self.stats),
+            "in_flight": len(self.flights),
+            "waiters": sum(flight.waiters for flight in self.flights.values()),
+            "waiters_by_key": {key: flight.waiters for key, flight in busiest[:SINGLE_FLIGHT_TOP_KEYS]},
+        }
+
+single_flight = SingleFlight()
+cache.response_cache.on_invalidate(single_flight.close)
+
+def prometheus_extra() -> Dict[str, int]:
+    """Counters and gauges for render_prometheus; per-key waiters stay in /cache/stats"""
+    snapshot = single_flight.snapshot()
+    return {
+        **{f"single_flight_{name}_total": value for name, value in asdict(single_flight.stats).items()},
+        "single_flight_in_flight": snapshot["in_flight"],
+        "single_flight_waiters": snapshot["waiters"],
+    }
+
+def flight_key(scope: Scope) -> Optional[str]:
+    """Path, sorted query string and conditional headers; None for requests not coalesced"""
+    if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith(SINGLE_FLIGHT_PATHS):
+        return None
+    query = urlencode(sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+    headers = Headers(scope=scope)
+    conditions = "|".join(headers.get(name, "") for name in CONDITIONAL_HEADERS)
+    return f"{scope['path']}?{query}|{conditions}"
+
+class SingleFlightMiddleware:
+    """Coalesces identical concurrent reads under SINGLE_FLIGHT_PATHS; see SingleFlight"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        key = flight_key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        # Writes committed by other worker processes close flights too
+        cache.response_cache.sync()
+        flight = single_flight.flights.get(key)
+        if flight is not None:
+            await self.wait(flight, scope, receive, send)
+            return
+
+        flight = single_flight.flights[key] = Flight(scope)
+        single_flight.stats.leaders += 1
+
+        async def send_and_record(message: Message) -> None:
+            flight.record(message)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            if single_flight.flights.get(key) is flight:
+                del single_flight.flights[key]
+            flight.done.set()
+
+    async def wait(self, flight: Flight, scope: Scope, receive: Receive, send: Send) -> None:
+        flight.waiters += 1
+        try:
+            await flight.done.wait()
+        finally:
+            flight.waiters -= 1
+        messages = flight.response()
+        if messages is None:
+            single_flight.stats.fallbacks += 1
+            await self.app(scope, receive, send)
+            return
+        single_flight.stats.coalesced += 1
+        # Metrics label this request by the route the leader matched
+        if "route" in flight.scope:
+            scope["route"] = flight.scope["route"]
+        for message in messages:
+            await send(copy_message(message))
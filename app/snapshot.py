@@ -0,0 +1,199 @@
+import asyncio
+import gzip
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time
+from email.utils import formatdate
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import brotli
+import pytz
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import cache, compression, database, models, serialization
+from .routers import content, djs, events
+
+logger = logging.getLogger(__name__)
+
+# Bundles are compressed once per rebuild, so they can afford high levels. Brotli
+# 10 and 11 are ~10x slower than 9 for a few percent, and delay every rebuild
+SNAPSHOT_GZIP_LEVEL = int(os.getenv("SNAPSHOT_GZIP_LEVEL", "9"))
+SNAPSHOT_BROTLI_QUALITY = int(os.getenv("SNAPSHOT_BROTLI_QUALITY", "9"))
+
+async def upcoming_events(db: AsyncSession, today: date) -> List[Dict[str, Any]]:
+    today_utc = datetime.combine(today, dt_time.min)
+    query = (
+        events.EVENT_ROWS.select()
+        .where(models.Event.start_date >= today_utc)
+        .order_by(models.Event.start_date, models.Event.id)
+    )
+    return events.EVENT_ROWS.to_dicts(await db.execute(query))
+
+async def all_djs(db: AsyncSession, today: date) -> List[Dict[str, Any]]:
+    return djs.dj_dicts(await db.execute(djs.dj_rows_query().order_by(models.Dj.id)))
+
+async def all_content(db: AsyncSession, today: date) -> Dict[str, Dict[str, Any]]:
+    rows = content.CONTENT_ROWS.to_dicts(await db.execute(content.CONTENT_ROWS.select().order_by(models.Content.key)))
+    return {row["key"]: row for row in rows}
+
+# Bundle sections, named after the response cache namespace whose writes change them
+SECTIONS: Dict[str, Callable[[AsyncSession, date], Awaitable[Any]]] = {
+    "events": upcoming_events,
+    "djs": all_djs,
+    "content": all_content,
+}
+
+@dataclass
+class Bundle:
+    """One rendered snapshot, in every encoding it is served in"""
+    identity: bytes
+    gzip: bytes
+    br: bytes
+    etag: str  # of the uncompressed body; each encoding gets its own suffix
+    modified_at: float
+
+    @classmethod
+    def build(cls, body: bytes) -> "Bundle":
+        return cls(
+            identity=body,
+            gzip=gzip.compress(body, compresslevel=SNAPSHOT_GZIP_LEVEL, mtime=0),
+            br=brotli.compress(body, quality=SNAPSHOT_BROTLI_QUALITY),
+            etag=cache.etag_for(body),
+            modified_at=time.time(),
+        )
+
+def today_utc() -> date:
+    return datetime.now(pytz.UTC).date()
+
+class PublicSnapshot:
+    """
+    Upcoming events, DJs and all content as one precompressed JSON bundle,
+    served from memory.
+
+    Each section is kept as encoded JSON. A write to one namespace (seen
+    through the response cache's invalidation) re-queries only that section;
+    the bundle is then re-assembled and re-compressed in the background, so
+    readers rarely wait on the database. The events section also expires at
+    midnight UTC, when events stop being upcoming.
+    """
+
+    def __init__(self):
+        self.sections: Dict[str, bytes] = {}
+        # Bumped on every write to a section; compared with the generation it was built from
+        self.generations: Dict[str, int] = {name: 0 for name in SECTIONS}
+        self.built: Dict[str, int] = {}
+        self.events_date: Optional[date] = None
+        self.bundle: Optional[Bundle] = None
+        self.lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+        self.rebuilds = 0
+
+    def invalidate(self, namespace: Optional[str]) -> None:
+        """
+        Response cache listener: mark the namespace's section stale and rebuild
+        it. A cache clear (namespace None) marks everything stale for the next read.
+        """
+        if namespace is None:
+            for name in SECTIONS:
+                self.generations[name] += 1
+        elif namespace in self.generations:
+            self.generations[namespace] += 1
+            if self.bundle is not None:
+                # Nothing to keep fresh until the snapshot has been asked for once
+                self.schedule()
+
+    def schedule(self) -> None:
+        """Start a background rebuild, unless one is running (it picks up the change)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop, e.g. during setup; the next read rebuilds
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self.refresh())
+
+    async def stop(self) -> None:
+        """Wait for a background rebuild, so it does not outlive the database at shutdown"""
+        if self.task is not None and self.task.get_loop() is asyncio.get_running_loop():
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    def dirty(self) -> List[str]:
+        if self.events_date != today_utc():
+            self.generations["events"] += 1
+            self.events_date = today_utc()
+        return [name for name in SECTIONS if self.built.get(name) != self.generations[name]]
+
+    def stale(self) -> bool:
+        return self.bundle is None or bool(self.dirty())
+
+    async def get(self) -> Bundle:
+        cache.response_cache.sync()  # writes made through other worker processes
+        if self.stale():
+            await self.refresh(until_fresh=False)
+        return self.bundle
+
+    async def refresh(self, until_fresh: bool = True) -> None:
+        """
+        Rebuild stale sections until the bundle matches the latest writes. The
+        lock is taken per rebuild, so a reader (until_fresh=False) waits for the
+        rebuild in progress and at most one more, which covers every write
+        committed before it arrived, rather than for as long as writes keep coming.
+        """
+        while True:
+            async with self.lock:
+                if not self.stale():
+                    return
+                try:
+                    await self.rebuild(self.dirty())
+                except Exception as e:
+                    logger.error(f"Public snapshot rebuild failed: {str(e)}")
+                    if self.bundle is None:
+                        raise
+                    return  # keep serving the previous bundle; the next write or read retries
+            if not until_fresh:
+                return
+
+    async def rebuild(self, names: List[str]) -> None:
+        today = self.events_date
+        async with database.AsyncSessionLocal() as db:
+            for name in names:
+                # Captured before the query: a write committing meanwhile leaves the section stale
+                generation = self.generations[name]
+                self.sections[name] = serialization.dumps(await SECTIONS[name](db, today))
+                self.built[name] = generation
+        body = b"".join([
+            b'{"events":', self.sections["events"],
+            b',"djs":', self.sections["djs"],
+            b',"content":', self.sections["content"],
+            b"}",
+        ])
+        # Compression is CPU-bound; keep it off the event loop
+        self.bundle = await asyncio.to_thread(Bundle.build, body)
+        self.rebuilds += 1
+
+public_snapshot = PublicSnapshot()
+cache.response_cache.on_invalidate(public_snapshot.invalidate)
+cache.response_cache.track(*SECTIONS)
+
+def respond(request: Request, bundle: Bundle) -> Response:
+    """Serve the bundle in the best encoding the client accepts, honouring If-None-Match"""
+    accepted = compression.accepted_encodings(request.headers)
+    if "br" in accepted:
+        body, coding = bundle.br, "br"
+    elif "gzip" in accepted:
+        body, coding = bundle.gzip, "gzip"
+    else:
+        body, coding = bundle.identity, None
+    headers = {
+        "ETag": bundle.etag[:-1] + f'-{coding}"' if coding else bundle.etag,
+        "Last-Modified": formatdate(bundle.modified_at, usegmt=True),
+        "Cache-Control": cache.CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if cache.not_modified(request, headers, bundle.modified_at):
+        return Response(status_code=304, headers=headers)
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type="application/json", headers=headers)
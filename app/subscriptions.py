@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import cache, database, models, schemas
+
+logger = logging.getLogger(__name__)
+
+# How long the writer waits after the first subscribe of a burst for the rest to arrive
+SUBSCRIBE_BATCH_WINDOW_MS = float(os.getenv("SUBSCRIBE_BATCH_WINDOW_MS", "5"))
+# Most subscribes written in one transaction; 4 bound parameters per new row
+SUBSCRIBE_BATCH_MAX = int(os.getenv("SUBSCRIBE_BATCH_MAX", "500"))
+
+# Outcome of one subscribe
+CREATED = "created"
+RESUBSCRIBED = "resubscribed"
+ALREADY_SUBSCRIBED = "already_subscribed"
+
+Result = Tuple[models.MailingListEntry, str]
+Pending = Tuple[schemas.MailingListEntryCreate, asyncio.Future]
+
+@dataclass
+class SubscribeStats:
+    requests: int = 0
+    batches: int = 0
+    largest_batch: int = 0
+    created: int = 0
+    resubscribed: int = 0
+    already_subscribed: int = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        return asdict(self)
+
+async def upsert(db: AsyncSession, entries: List[schemas.MailingListEntryCreate]) -> List[Result]:
+    """
+    Subscribe every entry, in order, with one SELECT and one flush. A new email
+    is inserted, an unsubscribed one is subscribed again under the new name,
+    and an active subscription is returned untouched. An email repeated
+    within the batch sees the outcome of its earlier occurrence.
+    """
+    existing = {
+        row.email: row
+        for row in await db.scalars(select(models.MailingListEntry).where(
+            models.MailingListEntry.email.in_({entry.email for entry in entries})
+        ))
+    }
+    results = []
+    for entry in entries:
+        row = existing.get(entry.email)
+        if row is None:
+            row = existing[entry.email] = models.MailingListEntry(name=entry.name, email=entry.email)
+            db.add(row)
+            results.append((row, CREATED))
+        elif not row.subscribed:
+            row.subscribed = True
+            row.name = entry.name
+            results.append((row, RESUBSCRIBED))
+        else:
+            results.append((row, ALREADY_SUBSCRIBED))
+    await db.flush()
+    return results
+
+class SubscribeBatcher:
+    """
+    Group commit for `POST /mailing-list/subscribe`.
+
+    Requests queue their entry and wait on a future. A single writer task
+    takes whatever has queued up, waiting up to SUBSCRIBE_BATCH_WINDOW_MS
+    after the first arrival (less once SUBSCRIBE_BATCH_MAX are waiting), and
+    writes the batch in one transaction, so a burst costs one commit per batch
+    rather than one per request and requests stop queueing on SQLite's write
+    lock. Each future is resolved after the commit with that request's own row
+    and outcome.
+    """
+
+    def __init__(self, max_batch: int = SUBSCRIBE_BATCH_MAX, window: float = SUBSCRIBE_BATCH_WINDOW_MS / 1000):
+        self.max_batch = max_batch
+        self.window = window
+        self.pending: List[Pending] = []
+        self.task: Optional[asyncio.Task] = None
+        self.arrived = asyncio.Event()
+        self.full = asyncio.Event()
+        self.closing = False
+        self.stats = SubscribeStats()
+
+    async def subscribe(self, entry: schemas.MailingListEntryCreate) -> Result:
+        loop = asyncio.get_running_loop()
+        self.start(loop)
+        future = loop.create_future()
+        self.pending.append((entry, future))
+        self.stats.requests += 1
+        self.arrived.set()
+        if len(self.pending) >= self.max_batch:
+            self.full.set()
+        return await future
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start the writer on first use, and again after stop() or on a new event loop"""
+        if self.task is not None and not self.task.done() and self.task.get_loop() is loop:
+            return
+        if self.task is not None and self.task.get_loop() is not loop:
+            self.pending = []  # waiters of a closed loop; nobody is left to resolve them for
+        self.arrived = asyncio.Event()
+        self.full = asyncio.Event()
+        self.closing = False
+        self.task = loop.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Write what is queued, then end the writer"""
+        task = self.task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            return
+        self.closing = True
+        self.arrived.set()
+        await task
+
+    async def run(self) -> None:
+        while True:
+            if not self.pending:
+                if self.closing:
+                    return
+                self.arrived.clear()
+                await self.arrived.wait()
+                if self.pending and len(self.pending) < self.max_batch and not self.closing:
+                    # Let the rest of the burst catch up
+                    try:
+                        await asyncio.wait_for(self.full.wait(), self.window)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+            batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            if len(self.pending) < self.max_batch:
+                self.full.clear()
+            # Arrivals during the write make up the next batch, with no extra wait
+            await self.write(batch)
+
+    async def write(self, batch: List[Pending]) -> None:
+        entries = [entry for entry, _ in batch]
+        try:
+            results = await database.run_in_transaction(lambda db: upsert(db, entries))
+        except IntegrityError as e:
+            if len(batch) > 1:
+                # An email written outside the batcher raced one of ours; write each
+                # entry alone so only the clashing request fails
+                for pending in batch:
+                    await self.write([pending])
+                return
+            self.fail(batch, e)
+            return
+        except Exception as e:
+            logger.error(f"Subscribe batch of {len(batch)} failed: {str(e)}")
+            self.fail(batch, e)
+            return
+
+        self.stats.batches += 1
+        self.stats.largest_batch = max(self.stats.largest_batch, len(batch))
+        for (_, future), (row, outcome) in zip(batch, results):
+            setattr(self.stats, outcome, getattr(self.stats, outcome) + 1)
+            if not future.done():  # the client may have gone away
+                future.set_result((row, outcome))
+        if any(outcome != ALREADY_SUBSCRIBED for _, outcome in results):
+            cache.response_cache.invalidate("mailing_list")
+
+    def fail(self, batch: List[Pending], error: Exception) -> None:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+subscribe_batcher = SubscribeBatcher()
@@ -0,0 +1,333 @@
+import asyncio
+import logging
+import os
+import random
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import cloudinary_setup, database, models
+
+logger = logging.getLogger(__name__)
+
+# Uploads are copied next to the database so queued jobs survive a restart
+def default_spool_dir() -> str:
+    url = make_url(database.DATABASE_URL)
+    if url.drivername.startswith("sqlite") and url.database:
+        return os.path.join(os.path.dirname(os.path.abspath(url.database)), "upload_spool")
+    return os.path.join(os.getcwd(), "upload_spool")
+
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or default_spool_dir()
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", str(cloudinary_setup.UPLOAD_MAX_CONCURRENCY)))
+UPLOAD_MAX_ATTEMPTS = int(os.getenv("UPLOAD_MAX_ATTEMPTS", "5"))
+UPLOAD_RETRY_BASE_DELAY = float(os.getenv("UPLOAD_RETRY_BASE_DELAY", "2"))  # seconds
+UPLOAD_RETRY_MAX_DELAY = float(os.getenv("UPLOAD_RETRY_MAX_DELAY", "120"))  # seconds
+# A running job's updated_at is renewed while its upload runs; a job not renewed
+# for this long belongs to a worker that died, and another worker takes it over
+UPLOAD_LEASE_SECONDS = float(os.getenv("UPLOAD_LEASE_SECONDS", "60"))
+# Workers also wake on this interval to pick up jobs whose retry delay has passed
+POLL_INTERVAL = 1.0  # seconds
+# How long stop() lets workers finish a database call before cancelling them
+STOP_GRACE = 2.0  # seconds
+COPY_CHUNK = 1024 * 1024
+
+# Network trouble and Cloudinary-side failures are retried; bad requests and auth errors are not
+def is_transient(error: Exception) -> bool:
+    # The SDK is only imported once an upload has run, see cloudinary_setup.sdk
+    exceptions = cloudinary_setup.sdk().exceptions
+    if isinstance(error, (exceptions.BadRequest, exceptions.AuthorizationRequired,
+                          exceptions.NotAllowed, exceptions.NotFound)):
+        return False
+    transient = (ConnectionError, TimeoutError, exceptions.GeneralError, exceptions.RateLimited)
+    return isinstance(error, transient) or type(error).__module__.startswith("urllib3")
+
+def retry_delay(attempt: int) -> float:
+    return random.uniform(0, min(UPLOAD_RETRY_MAX_DELAY, UPLOAD_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+class ProgressReader:
+    """File wrapper that records how many bytes the uploader has read so far"""
+
+    def __init__(self, stream, job_id: str, progress: Dict[str, int]):
+        self.stream = stream
+        self.job_id = job_id
+        self.progress = progress
+        self.progress[job_id] = 0
+        self.name = stream.name
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.stream.read(size)
+        self.progress[self.job_id] = self.stream.tell()
+        return chunk
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self.stream.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.stream.tell()
+
+    def close(self) -> None:
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class UploadQueue:
+    """
+    Durable in-process queue of Cloudinary uploads.
+
+    Jobs live in the upload_jobs table and their files in UPLOAD_SPOOL_DIR.
+    Worker tasks claim queued jobs, run the uploader on the upload pool and
+    record the result; transient failures go back in the queue with backoff.
+    """
+
+    def __init__(self, workers: int = UPLOAD_WORKERS, spool_dir: str = UPLOAD_SPOOL_DIR):
+        self.worker_count = workers
+        self.spool_dir = spool_dir
+        self.wakeup = asyncio.Event()
+        self.tasks: List[asyncio.Task] = []
+        self.stopping = False
+        # Bytes sent per running job; only meaningful within this process
+        self.progress: Dict[str, int] = {}
+
+    async def start(self, requeue: bool = True) -> None:
+        """
+        Start the workers. `requeue` puts jobs a previous process left running
+        back in the queue; pass False when other worker processes may be
+        running jobs right now. Either way, jobs of a worker that died are
+        taken over once their lease expires.
+        """
+        os.makedirs(self.spool_dir, exist_ok=True)
+        if requeue:
+            await self.requeue_interrupted()
+        self.wakeup = asyncio.Event()
+        self.stopping = False
+        self.tasks = [asyncio.create_task(self.work()) for _ in range(self.worker_count)]
+
+    async def stop(self) -> None:
+        """
+        Idle workers exit once their current poll returns; a worker cancelled
+        inside a query would leave its connection (and the driver's thread)
+        open, holding up process exit. Workers still uploading after
+        STOP_GRACE are cancelled, and their jobs requeued on the next start.
+        """
+        self.stopping = True
+        self.wakeup.set()
+        if self.tasks:
+            _, running = await asyncio.wait(self.tasks, timeout=STOP_GRACE)
+            for task in running:
+                task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def requeue_interrupted(self) -> None:
+        """Jobs left running by a previous process go back in the queue"""
+        async def requeue(db: AsyncSession):
+            await db.execute(
+                update(models.UploadJob)
+                .where(models.UploadJob.status == "running")
+                .values(status="queued", next_attempt_at=datetime.utcnow())
+            )
+        await database.run_in_transaction(requeue)
+
+    async def enqueue(self, file, folder: str = "event_posters") -> models.UploadJob:
+        """Spool the upload to disk and record a queued job"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        file_path = os.path.join(self.spool_dir, job_id)
+
+        def spool() -> int:
+            file.file.seek(0)
+            with open(file_path, "wb") as out:
+                shutil.copyfileobj(file.file, out, COPY_CHUNK)
+                return out.tell()
+
+        size = await asyncio.get_running_loop().run_in_executor(None, spool)
+
+        async def insert_job(db: AsyncSession):
+            job = models.UploadJob(
+                id=job_id,
+                status="queued",
+                folder=folder,
+                filename=file.filename or "upload",
+                file_path=file_path,
+                size=size,
+                attempts=0,
+            )
+            db.add(job)
+            await db.flush()
+            return job
+
+        try:
+            job = await database.run_in_transaction(insert_job)
+        except Exception:
+            os.remove(file_path)
+            raise
+        self.wakeup.set()
+        return job
+
+    async def get(self, db: AsyncSession, job_id: str) -> Optional[models.UploadJob]:
+        return await db.get(models.UploadJob, job_id)
+
+    def progress_of(self, job: models.UploadJob) -> float:
+        if job.status == "succeeded":
+            return 1.0
+        if job.status != "running" or not job.size:
+            return 0.0
+        return round(self.progress.get(job.id, 0) / job.size, 3)
+
+    async def claim(self) -> Optional[models.UploadJob]:
+        """
+        Mark the oldest due job as running: a queued one, or a running one whose
+        lease has expired. None when there is nothing to do.
+        """
+        async def claim_job(db: AsyncSession):
+            now = datetime.utcnow()
+            claimable = or_(
+                and_(models.UploadJob.status == "queued", models.UploadJob.next_attempt_at <= now),
+                and_(
+                    models.UploadJob.status == "running",
+                    models.UploadJob.updated_at < now - timedelta(seconds=UPLOAD_LEASE_SECONDS),
+                ),
+            )
+            job_id = await db.scalar(
+                select(models.UploadJob.id).where(claimable).order_by(models.UploadJob.created_at).limit(1)
+            )
+            if job_id is None:
+                return None
+            claimed = await db.execute(
+                update(models.UploadJob)
+                .where(models.UploadJob.id == job_id, claimable)
+                .values(status="running", attempts=models.UploadJob.attempts + 1, updated_at=now)
+            )
+            if claimed.rowcount != 1:
+                return None  # another worker got there first
+            return await db.get(models.UploadJob, job_id)
+        return await database.run_in_transaction(claim_job)
+
+    async def work(self) -> None:
+        while not self.stopping:
+            try:
+                job = await self.claim()
+            except Exception as e:
+                logger.error(f"Could not claim upload job: {str(e)}")
+                job = None
+            if job is None:
+                if self.stopping:
+                    return
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run(job)
+
+    async def run(self, job: models.UploadJob) -> None:
+        if job.attempts > UPLOAD_MAX_ATTEMPTS:
+            # Taken over from dead workers every time; the upload itself may be what kills them
+            await self.record_failure(job, RuntimeError("Worker stopped while uploading"))
+            return
+
+        def upload():
+            with open(job.file_path, "rb") as stream:
+                reader = ProgressReader(stream, job.id, self.progress)
+                return cloudinary_setup.uploader(reader, job.size, job.filename, job.folder)
+
+        loop = asyncio.get_running_loop()
+        uploaded = asyncio.Event()
+        lease = asyncio.create_task(self.renew_lease(job, uploaded))
+        try:
+            result = await loop.run_in_executor(cloudinary_setup.upload_executor, upload)
+        except Exception as e:
+            await self.record_failure(job, e)
+        else:
+            await self.record_success(job, result)
+        finally:
+            self.progress.pop(job.id, None)
+            # Not cancelled: a renewal cut off mid-query would leave its connection open
+            uploaded.set()
+            await lease
+
+    async def renew_lease(self, job: models.UploadJob, uploaded: asyncio.Event) -> None:
+        """Touch the job's updated_at every third of the lease until the upload is over"""
+        async def renew(db: AsyncSession):
+            await db.execute(
+                update(models.UploadJob)
+                .where(
+                    models.UploadJob.id == job.id,
+                    models.UploadJob.status == "running",
+                    models.UploadJob.attempts == job.attempts,  # not taken over meanwhile
+                )
+                .values(updated_at=datetime.utcnow())
+            )
+
+        while True:
+            try:
+                await asyncio.wait_for(uploaded.wait(), timeout=UPLOAD_LEASE_SECONDS / 3)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await database.run_in_transaction(renew)
+            except Exception as e:
+                logger.warning(f"Could not renew the lease of upload job {job.id}: {str(e)}")
+
+    async def record_success(self, job: models.UploadJob, result: dict) -> None:
+        async def finish(db: AsyncSession):
+            await db.execute(
+                update(models.UploadJob)
+                .where(models.UploadJob.id == job.id)
+                .values(
+                    status="succeeded",
+                    error=None,
+                    secure_url=result["secure_url"],
+                    public_id=result["public_id"],
+                    format=result.get("format"),
+                    width=result.get("width"),
+                    height=result.get("height"),
+                    updated_at=datetime.utcnow(),
+                )
+            )
+        await database.run_in_transaction(finish)
+        self.discard_file(job)
+
+    async def record_failure(self, job: models.UploadJob, error: Exception) -> None:
+        retry = is_transient(error) and job.attempts < UPLOAD_MAX_ATTEMPTS
+        delay = retry_delay(job.attempts) if retry else 0
+        if retry:
+            logger.warning(f"Upload job {job.id} failed ({str(error)}), retrying in {delay:.1f}s")
+        else:
+            logger.error(f"Upload job {job.id} failed after {job.attempts} attempts: {str(error)}")
+
+        async def fail(db: AsyncSession):
+            now = datetime.utcnow()
+            failed = await db.execute(
+                update(models.UploadJob)
+                # Unless another worker has taken the job over since this attempt began
+                .where(models.UploadJob.id == job.id, models.UploadJob.attempts == job.attempts)
+                .values(
+                    status="queued" if retry else "failed",
+                    error=str(error),
+                    next_attempt_at=now + timedelta(seconds=delay),
+                    updated_at=now,
+                )
+            )
+            return failed.rowcount == 1
+        if await database.run_in_transaction(fail) and not retry:
+            self.discard_file(job)
+
+    def discard_file(self, job: models.UploadJob) -> None:
+        try:
+            os.remove(job.file_path)
+        except FileNotFoundError:
+            pass
+
+upload_queue = UploadQueue()
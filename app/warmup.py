@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Message
+
+from .snapshot import public_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Public reads a first visitor is most likely to make, comma-separated
+WARMUP_PATHS = [path for path in os.getenv("WARMUP_PATHS", "/events/?upcoming=true,/djs/,/content/").split(",") if path]
+
+async def get(app: ASGIApp, url: str) -> int:
+    """GET `url` through the app itself, as a visitor would, and return the status"""
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"warmup")],
+        "client": ("127.0.0.1", 0),
+        "server": ("warmup", 80),
+    }
+    status = 500
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+async def warm(app: ASGIApp) -> None:
+    """Build the public snapshot and fill the response cache for WARMUP_PATHS"""
+    started = time.perf_counter()
+    try:
+        await public_snapshot.refresh()
+        for url in WARMUP_PATHS:
+            status = await get(app, url)
+            if status != 200:
+                logger.warning(f"Warm-up request {url} returned {status}")
+    except Exception as e:
+        logger.error(f"Warm-up failed: {str(e)}")
+        return
+    logger.info(f"Warm-up finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+# Held so the task is not garbage collected while it runs
+warmup_task: Optional[asyncio.Task] = None
+
+def start(app: ASGIApp) -> None:
+    """Warm up in the background, so startup (and the first request) does not wait for it"""
+    global warmup_task
+    warmup_task = asyncio.get_running_loop().create_task(warm(app))
+
+async def stop() -> None:
+    """Let a running warm-up finish; cancelled mid-query, it would leave its connection checked out"""
+    if warmup_task is not None and warmup_task.get_loop() is asyncio.get_running_loop():
+        await asyncio.gather(warmup_task, return_exceptions=True)
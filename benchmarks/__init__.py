@@ -0,0 +1,2 @@
+# Benchmark, load-test and check scripts; run them as modules, e.g. `python -m benchmarks.bench_async_db`.
+# Checks (and benchmarks guarding a property) exit non-zero when it does not hold.
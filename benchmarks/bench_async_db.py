@@ -0,0 +1,72 @@
+"""
+Concurrent `GET /events/` throughput with the async session layer versus the
+previous handler, which ran a sync `Session` query inside an `async def` route.
+
+    python -m benchmarks.bench_async_db --events 20000 --concurrency 25 --requests 2000
+
+Loop lag is the delay a sleeping task sees while the load runs; a blocking
+handler shows up there as stalls that every other request has to wait out.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import List
+
+import httpx
+import pytz
+from fastapi import FastAPI
+
+from app import models, schemas
+from .common import BenchDatabase, LoopLagProbe, client, hammer, report, seed_events
+
+
+def legacy_app(db: BenchDatabase) -> FastAPI:
+    """The pre-async handler: sync query on the event loop"""
+    legacy = FastAPI()
+
+    @legacy.get("/events/", response_model=List[schemas.Event])
+    async def read_events(skip: int = 0, limit: int = 100, upcoming: bool = False):
+        with db.SessionLocal() as session:
+            today_utc = datetime.now(pytz.UTC).date()
+            query = session.query(models.Event)
+            if upcoming:
+                query = query.filter(models.Event.start_date >= today_utc)
+            else:
+                query = query.filter(models.Event.start_date < today_utc)
+            return query.order_by(models.Event.start_date).offset(skip).limit(limit).all()
+
+    return legacy
+
+
+async def run(http: httpx.AsyncClient, args) -> dict:
+    probe = LoopLagProbe()
+    probe.start()
+    result = await hammer(
+        http, "/events/?upcoming=true&limit=50",
+        concurrency=args.concurrency, requests=args.requests,
+    )
+    result.update(await probe.stop())
+    return result
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_events(db, args.events)
+    db.install(response_cache=False)
+    try:
+        transport = httpx.ASGITransport(app=legacy_app(db))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            before = await run(http, args)
+        async with client() as http:
+            after = await run(http, args)
+    finally:
+        await db.close()
+    report("async_db", {"sync_session_on_loop": before, "async_session": after})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
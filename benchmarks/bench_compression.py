@@ -0,0 +1,69 @@
+"""
+Bytes on the wire and server CPU per request for `GET /events/` pages of
+events with long descriptions, uncompressed, gzip and brotli. Compressed runs
+are timed twice: compressing every response afresh, and reusing compressed
+bodies of identical responses (the default). The response cache is on in all
+runs, as in production, so the database is out of the picture.
+
+    python -m benchmarks.bench_compression --events 2000 --limit 100
+"""
+import argparse
+import asyncio
+import time
+
+from app import compression
+from .common import BenchDatabase, drain, report, seed_events
+
+CODINGS = ["identity", "gzip", "br"]
+
+
+async def measure(path: str, query: str, coding: str, repeat: int) -> dict:
+    headers = {"Accept-Encoding": coding}
+    await drain(path, query, headers)  # fill the response cache
+    latencies = []
+    cpu_started = time.process_time()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        received = await drain(path, query, headers)
+        latencies.append(time.perf_counter() - started)
+    cpu = time.process_time() - cpu_started
+    latencies.sort()
+    return {
+        "bytes": received,
+        "cpu_ms_per_request": round(cpu / repeat * 1000, 3),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+    }
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_events(db, args.events)
+    db.install(response_cache=True)
+    path, query = "/events/", f"upcoming=true&limit={args.limit}"
+    results = {}
+    try:
+        for coding in CODINGS:
+            if coding == "identity":
+                results[coding] = await measure(path, query, coding, args.repeat)
+                continue
+            max_bytes = compression.compressed_bodies.max_bytes
+            compression.compressed_bodies.max_bytes = 0
+            compression.compressed_bodies.clear()
+            results[f"{coding}_every_request"] = await measure(path, query, coding, args.repeat)
+            compression.compressed_bodies.max_bytes = max_bytes
+            results[f"{coding}_reused"] = await measure(path, query, coding, args.repeat)
+    finally:
+        await db.close()
+    identity = results["identity"]["bytes"]
+    for name, result in results.items():
+        result["ratio"] = round(result["bytes"] / identity, 3)
+    results["compression_stats"] = compression.snapshot()
+    report("compression", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,56 @@
+"""
+Statement count of `GET /djs/` and `GET /djs/{id}` as the number of DJs grows.
+Lazy-loading socials per DJ is shown for comparison; the endpoints must stay
+constant, and the script exits non-zero if they do not. CI runs it on every
+push (.github/workflows/checks.yml).
+
+    python -m benchmarks.bench_dj_queries --sizes 10 100 500
+"""
+import argparse
+import asyncio
+import sys
+
+from app import models
+from .common import BenchDatabase, QueryCounter, client, report, seed_djs
+
+
+def lazy_listing(db: BenchDatabase) -> int:
+    """The old listing: one SELECT for the DJs, then one per DJ for socials"""
+    with db.SessionLocal() as session, QueryCounter(db.engine) as counter:
+        for dj in session.query(models.Dj).all():
+            dj.socials
+    return counter.count
+
+
+async def main(args):
+    results = {}
+    for size in args.sizes:
+        db = BenchDatabase()
+        seed_djs(db, size)
+        db.install(response_cache=False)
+        try:
+            async with client() as http:
+                counts = {"lazy_listing": lazy_listing(db)}
+                for name, path in [
+                    ("listing", f"/djs/?limit={size}"),
+                    ("listing_without_socials", f"/djs/?limit={size}&fields=id,alias"),
+                    ("single", "/djs/1"),
+                ]:
+                    with QueryCounter(db.async_engine.sync_engine) as counter:
+                        response = await http.get(path)
+                        response.raise_for_status()
+                    counts[name] = counter.count
+                results[size] = counts
+        finally:
+            await db.close()
+    report("dj_queries", results)
+
+    for name in ("listing", "listing_without_socials", "single"):
+        if len({counts[name] for counts in results.values()}) != 1:
+            sys.exit(f"{name}: query count grows with the number of DJs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    asyncio.run(main(parser.parse_args()))
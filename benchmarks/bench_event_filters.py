@@ -0,0 +1,105 @@
+"""
+Latency of "upcoming events with genre X / featuring artist Y" on 100k
+synthetic events: loading every upcoming event and filtering the decoded
+JSON lists in Python, against the indexed `genre=`, `artist=` and `dj_id=`
+filters of `GET /events/`. Prints the query plan of each filter.
+
+    python -m benchmarks.bench_event_filters --events 100000 --limit 100
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+from sqlalchemy import select
+
+from app import event_tags, models
+from .common import BenchDatabase, client, report, seed_djs, seed_events, summarize
+
+FILTERS = {
+    "genre": ("genres", "techno"),
+    "artist": ("lineup", "DJ 42"),
+}
+
+
+def python_filter(db: BenchDatabase, column: str, value: str, limit: int) -> int:
+    """Load every upcoming event and filter its JSON list, as before the tag tables"""
+    key = event_tags.normalize(value)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    with db.SessionLocal() as session:
+        events = session.scalars(
+            select(models.Event).where(models.Event.start_date >= today).order_by(models.Event.start_date, models.Event.id)
+        ).all()
+        matches = [event for event in events if key in event_tags.unique_keys(getattr(event, column))]
+    return len(matches[:limit])
+
+
+def time_python(db: BenchDatabase, column: str, value: str, limit: int, repeat: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        request_started = time.perf_counter()
+        hits = python_filter(db, column, value, limit)
+        latencies.append(time.perf_counter() - request_started)
+    result = summarize(latencies, time.perf_counter() - started)
+    result["hits"] = hits
+    return result
+
+
+async def measure(http, path: str, repeat: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        request_started = time.perf_counter()
+        response = await http.get(path)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - request_started)
+    result = summarize(latencies, time.perf_counter() - started)
+    result["hits"] = len(response.json())
+    return result
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_djs(db, args.djs)
+    seed_events(db, args.events)
+    db.install(response_cache=False)
+    results = {}
+    try:
+        async with client() as http:
+            for name, (column, value) in FILTERS.items():
+                results[name] = {
+                    "python_filter": time_python(db, column, value, args.limit, args.repeat),
+                    "indexed": await measure(http, f"/events/?upcoming=true&limit={args.limit}&{name}={quote(value)}", args.repeat),
+                }
+            with db.SessionLocal() as session:
+                dj_id = session.scalar(select(models.Dj.id).where(models.Dj.alias == "DJ 42"))
+            results["dj_id"] = {
+                "indexed": await measure(http, f"/events/?upcoming=true&limit={args.limit}&dj_id={dj_id}", args.repeat),
+            }
+    finally:
+        plans = {}
+        with db.engine.connect() as connection:
+            for name, column, key in (("genre", models.EventGenre.genre, "techno"), ("artist", models.EventLineup.artist, "dj 42")):
+                subquery = select(column.class_.event_id).where(column == key)
+                query = (
+                    select(models.Event.id)
+                    .where(models.Event.start_date >= datetime.utcnow().date().isoformat(), models.Event.id.in_(subquery))
+                    .order_by(models.Event.start_date, models.Event.id)
+                    .limit(args.limit)
+                )
+                compiled = query.compile(connection, compile_kwargs={"literal_binds": True})
+                plans[name] = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+        await db.close()
+    results["query_plans"] = plans
+    report("event_filters", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--djs", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
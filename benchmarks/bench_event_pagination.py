@@ -0,0 +1,69 @@
+"""
+Deep-page latency of `GET /events/` on 100k synthetic events: OFFSET paging
+without the start_date index, OFFSET paging with it, and keyset paging with
+the cursor from the `X-Next-Cursor` header.
+
+    python -m benchmarks.bench_event_pagination --events 100000 --page 1000 --limit 20
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select, text
+
+from app import models, pagination
+from .common import BenchDatabase, client, report, seed_events, summarize
+
+
+def cursor_for_page(db: BenchDatabase, page: int, limit: int) -> str:
+    """Cursor a client would hold after paging through `page - 1` full pages"""
+    with db.SessionLocal() as session:
+        last = session.execute(
+            select(models.Event.start_date, models.Event.id)
+            .where(models.Event.start_date >= text("date('now')"))
+            .order_by(models.Event.start_date, models.Event.id)
+            .offset((page - 1) * limit - 1)
+            .limit(1)
+        ).one()
+    return pagination.encode_cursor(tuple(last))
+
+
+async def measure(http, path: str, repeat: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        request_started = time.perf_counter()
+        response = await http.get(path)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - request_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_events(db, args.events)
+    db.install(response_cache=False)
+    offset_path = f"/events/?upcoming=true&limit={args.limit}&skip={(args.page - 1) * args.limit}"
+    cursor_path = f"/events/?upcoming=true&limit={args.limit}&cursor={cursor_for_page(db, args.page, args.limit)}"
+    results = {}
+    try:
+        async with client() as http:
+            with db.engine.begin() as connection:
+                connection.execute(text("DROP INDEX ix_events_start_date_id"))
+            results["offset_no_index"] = await measure(http, offset_path, args.repeat)
+            with db.engine.begin() as connection:
+                connection.execute(text("CREATE INDEX ix_events_start_date_id ON events (start_date, id)"))
+            results["offset_indexed"] = await measure(http, offset_path, args.repeat)
+            results["keyset_indexed"] = await measure(http, cursor_path, args.repeat)
+    finally:
+        await db.close()
+    report("event_pagination", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
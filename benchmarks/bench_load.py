@@ -0,0 +1,260 @@
+"""
+Mixed-traffic load test: public browsing, admin edits and mailing-list
+subscribe bursts against a seeded database, each scenario on its own and then
+all at once. Reports throughput and p50/p95/p99 per scenario and per request
+as JSON. Saved with --output, a report becomes the baseline of a later run:
+--baseline compares against it and exits 1 on a regression, so the run can
+gate a release.
+
+    python -m benchmarks.bench_load --duration 10 --output baseline.json
+    python -m benchmarks.bench_load --duration 10 --baseline baseline.json
+
+Baselines only compare runs on the same machine with the same volumes.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from .common import (
+    ADMIN_HEADERS,
+    GENRES,
+    BenchDatabase,
+    LoopLagProbe,
+    client,
+    report,
+    seed_content,
+    seed_djs,
+    seed_events,
+    seed_mailing_list,
+    summarize,
+)
+
+# label, method, url, JSON body, headers
+Call = Tuple[str, str, str, Optional[dict], Optional[dict]]
+
+PHASES = ("browse", "admin", "subscribe", "mixed")
+
+# Requests a label needs in both runs before its p95 is compared; rarer ones are mostly noise
+MIN_SAMPLES = 50
+
+
+class Traffic:
+    """Builds the requests of each scenario from the seeded ids and keys"""
+
+    def __init__(self, args, seed: int = 7):
+        self.args = args
+        self.rng = random.Random(seed)
+        self.emails = itertools.count()
+
+    def browse(self) -> Call:
+        rng, args = self.rng, self.args
+        roll = rng.random()
+        if roll < 0.25:
+            return "GET /events/?upcoming=true", "GET", "/events/?upcoming=true&limit=20", None, None
+        if roll < 0.40:
+            return "GET /events/{id}", "GET", f"/events/{rng.randint(1, args.events)}", None, None
+        if roll < 0.50:
+            return "GET /events/?genre=", "GET", f"/events/?genre={rng.choice(GENRES)}&limit=20", None, None
+        if roll < 0.60:
+            return "GET /djs/", "GET", "/djs/?limit=50", None, None
+        if roll < 0.70:
+            return "GET /djs/{id}", "GET", f"/djs/{rng.randint(1, args.djs)}", None, None
+        if roll < 0.85:
+            return "GET /content/{key}", "GET", f"/content/page.section.{rng.randrange(args.content)}", None, None
+        if roll < 0.93:
+            return "GET /public/snapshot", "GET", "/public/snapshot", None, None
+        return "GET /search", "GET", f"/search?q=azulu+{rng.randrange(500)}", None, None
+
+    def admin(self) -> Call:
+        rng, args = self.rng, self.args
+        roll = rng.random()
+        if roll < 0.35:
+            body = {"description": f"Updated {time.time()}", "genres": rng.sample(GENRES, 2)}
+            return "PUT /events/{id}", "PUT", f"/events/{rng.randint(1, args.events)}", body, ADMIN_HEADERS
+        if roll < 0.50:
+            body = {
+                "name": f"Load Test Night {next(self.emails)}",
+                "venue_name": "Venue 0",
+                "address": "1 Main Street, Amsterdam",
+                "start_date": "2030-01-01T00:00:00",
+                "start_time": "22:00",
+                "end_time": "05:00",
+                "time_zone": "Europe/Amsterdam",
+                "ticket_status": "Available",
+                "lineup": [f"DJ {rng.randrange(args.djs)}" for _ in range(3)],
+                "genres": rng.sample(GENRES, 2),
+                "description": "Added during a load test.",
+                "currency": "EUR",
+            }
+            return "POST /events/", "POST", "/events/", body, ADMIN_HEADERS
+        if roll < 0.80:
+            body = {"big_string": f"Updated {time.time()}"}
+            return "PUT /content/{key}", "PUT", f"/content/page.section.{rng.randrange(args.content)}", body, ADMIN_HEADERS
+        dj = rng.randint(1, args.djs)
+        body = {"profile_url": f"https://azulu.nl/djs/{dj}?v={time.time()}"}
+        return "PUT /djs/{id}", "PUT", f"/djs/{dj}", body, ADMIN_HEADERS
+
+    def subscribe(self) -> Call:
+        if self.rng.random() < 0.1:
+            # An address already on the list: answered with its existing entry
+            email = f"subscriber{self.rng.randrange(self.args.subscribers)}@example.com"
+        else:
+            email = f"load{next(self.emails)}@example.com"
+        return "POST /mailing-list/subscribe", "POST", "/mailing-list/subscribe", {"name": "Load Test", "email": email}, None
+
+
+class Recorder:
+    """Latencies and statuses of one phase, by request label"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[int, int]] = {}
+
+    async def call(self, http: httpx.AsyncClient, call: Call) -> None:
+        label, method, url, body, headers = call
+        started = time.perf_counter()
+        response = await http.request(method, url, json=body, headers=headers)
+        self.latencies.setdefault(label, []).append(time.perf_counter() - started)
+        statuses = self.statuses.setdefault(label, {})
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict:
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        result = summarize(everything, elapsed)
+        result["server_errors"] = sum(
+            count for statuses in self.statuses.values() for status, count in statuses.items() if status >= 500
+        )
+        result["requests_by_label"] = {
+            label: {**summarize(self.latencies[label], elapsed), "statuses": self.statuses[label]}
+            for label in sorted(self.latencies)
+        }
+        return result
+
+
+async def closed_loop(http, recorder: Recorder, next_call: Callable[[], Call], concurrency: int, deadline: float):
+    """`concurrency` clients, each sending its next request as soon as the last one returns"""
+    async def worker():
+        while time.perf_counter() < deadline:
+            await recorder.call(http, next_call())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def bursts(http, recorder: Recorder, next_call: Callable[[], Call], size: int, interval: float, deadline: float):
+    """`size` requests at once every `interval` seconds, as after a newsletter or a post goes out"""
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await asyncio.gather(*(recorder.call(http, next_call()) for _ in range(size)))
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+async def run_phase(http, traffic: Traffic, phase: str, args) -> Dict:
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+    runs = []
+    if phase in ("browse", "mixed"):
+        runs.append(closed_loop(http, recorder, traffic.browse, args.browse_concurrency, deadline))
+    if phase in ("admin", "mixed"):
+        runs.append(closed_loop(http, recorder, traffic.admin, args.admin_concurrency, deadline))
+    if phase in ("subscribe", "mixed"):
+        runs.append(bursts(http, recorder, traffic.subscribe, args.burst_size, args.burst_interval, deadline))
+
+    probe = LoopLagProbe()
+    probe.start()
+    started = time.perf_counter()
+    await asyncio.gather(*runs)
+    elapsed = time.perf_counter() - started
+    return {**recorder.summary(elapsed), **await probe.stop()}
+
+
+def regressions(results: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """
+    Ways `results` is worse than `baseline`: any server error, a scenario or
+    request whose p95 grew by more than `tolerance` (and `min_delta_ms`, so
+    sub-millisecond jitter does not count), or a scenario whose throughput
+    fell by more than `tolerance`.
+    """
+    found = []
+    for phase, current in results["phases"].items():
+        if current["server_errors"]:
+            found.append(f"{phase}: {current['server_errors']} server errors")
+        before = baseline["phases"].get(phase)
+        if before is None:
+            continue
+        pairs = [(phase, current, before)] + [
+            (f"{phase} {label}", stats, before["requests_by_label"][label])
+            for label, stats in current["requests_by_label"].items()
+            if label in before["requests_by_label"]
+            and min(stats["requests"], before["requests_by_label"][label]["requests"]) >= MIN_SAMPLES
+        ]
+        for name, now, then in pairs:
+            if now["p95_ms"] > then["p95_ms"] * (1 + tolerance) and now["p95_ms"] - then["p95_ms"] > min_delta_ms:
+                found.append(f"{name}: p95 {then['p95_ms']} ms -> {now['p95_ms']} ms")
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            found.append(f"{phase}: throughput {before['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return found
+
+
+async def main(args) -> int:
+    config = {
+        key: getattr(args, key)
+        for key in ("events", "djs", "content", "subscribers", "duration", "browse_concurrency",
+                    "admin_concurrency", "burst_size", "burst_interval")
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if baseline["config"] != config:
+            print(f"{args.baseline} was recorded with {baseline['config']}, not {config}", file=sys.stderr)
+            return 2
+
+    db = BenchDatabase()
+    seed_events(db, args.events)
+    seed_djs(db, args.djs)
+    seed_content(db, args.content)
+    seed_mailing_list(db, args.subscribers)
+    db.install(response_cache=not args.no_response_cache)
+    results = {"config": config, "phases": {}}
+    try:
+        async with client() as http:
+            traffic = Traffic(args)
+            for phase in args.phases:
+                results["phases"][phase] = await run_phase(http, traffic, phase, args)
+    finally:
+        await db.close()
+
+    if baseline is not None:
+        results["regressions"] = regressions(results, baseline, args.tolerance, args.min_delta_ms)
+    report("load", results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "load", "results": results}, f, indent=2)
+    return 1 if results.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--djs", type=int, default=300)
+    parser.add_argument("--content", type=int, default=100)
+    parser.add_argument("--subscribers", type=int, default=20000)
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=list(PHASES))
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--browse-concurrency", type=int, default=20)
+    parser.add_argument("--admin-concurrency", type=int, default=2)
+    parser.add_argument("--burst-size", type=int, default=50)
+    parser.add_argument("--burst-interval", type=float, default=1.0, help="seconds between subscribe bursts")
+    parser.add_argument("--no-response-cache", action="store_true")
+    parser.add_argument("--output", help="write the report here, for use as a later --baseline")
+    parser.add_argument("--baseline", help="report of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth / throughput drop (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="p95 growth below this is never a regression")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,61 @@
+"""
+Exporting the mailing list: the streamed `GET /mailing-list/export` against
+paging through `GET /mailing-list/` with skip/limit. Peak Python memory is
+measured with tracemalloc in a separate pass so it does not skew the timings.
+The app is driven over raw ASGI here because httpx's ASGI transport buffers
+whole response bodies.
+
+    python -m benchmarks.bench_mailing_export --rows 100000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from .common import BenchDatabase, drain, report, seed_mailing_list
+
+
+async def paged(rows: int, limit: int) -> int:
+    received = 0
+    for skip in range(0, rows, limit):
+        received += await drain("/mailing-list/", f"skip={skip}&limit={limit}&subscribed_only=false")
+    return received
+
+
+async def measure(run):
+    started = time.perf_counter()
+    received = await run()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    await run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(elapsed, 3), "mb_sent": round(received / 1e6, 1), "peak_python_mb": round(peak / 1e6, 1)}
+
+
+async def main(args):
+    year_ago = (datetime.utcnow() - timedelta(days=365)).isoformat(timespec="seconds")
+    db = BenchDatabase()
+    seed_mailing_list(db, args.rows)
+    db.install(response_cache=False)
+    try:
+        results = {
+            f"paged_limit_{args.limit}": await measure(lambda: paged(args.rows, args.limit)),
+            "export_csv": await measure(lambda: drain("/mailing-list/export", "format=csv")),
+            "export_ndjson": await measure(lambda: drain("/mailing-list/export", "format=ndjson")),
+            "export_csv_gzip": await measure(lambda: drain("/mailing-list/export", "format=csv&gzip=true")),
+            "export_subscribed_last_year": await measure(
+                lambda: drain("/mailing-list/export", f"subscribed=true&created_after={year_ago}")
+            ),
+        }
+    finally:
+        await db.close()
+    report("mailing_export", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=1000, help="page size for the skip/limit baseline")
+    asyncio.run(main(parser.parse_args()))
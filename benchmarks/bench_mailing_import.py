@@ -0,0 +1,110 @@
+"""
+Bulk mailing-list import against one `POST /mailing-list/subscribe` per row.
+The per-row path is timed on a sample and extrapolated to the full size.
+The import then runs three times: into an empty table, again with the same
+file (all rows skipped), and after a tenth of the list has unsubscribed.
+
+    python -m benchmarks.bench_mailing_import --rows 50000 --sample 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import update
+
+from app import models
+from .common import ADMIN_HEADERS, BenchDatabase, client, report
+
+CHUNK = 64 * 1024
+
+
+def csv_body(rows: int) -> bytes:
+    lines = ["name,email"] + [f"Subscriber {i},subscriber{i}@example.com" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def ndjson_body(rows: int) -> bytes:
+    return "".join(
+        json.dumps({"name": f"Subscriber {i}", "email": f"subscriber{i}@example.com"}) + "\n"
+        for i in range(rows)
+    ).encode()
+
+
+async def stream(body: bytes):
+    for start in range(0, len(body), CHUNK):
+        yield body[start:start + CHUNK]
+
+
+async def timed_import(http, body: bytes, content_type: str):
+    started = time.perf_counter()
+    response = await http.post(
+        "/mailing-list/import",
+        content=stream(body),
+        headers={**ADMIN_HEADERS, "Content-Type": content_type},
+    )
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    summary = response.json()
+    summary.pop("errors")
+    return {"seconds": round(elapsed, 3), "rows_per_second": round(len(body.splitlines()) / elapsed), **summary}
+
+
+async def per_row(http, sample: int, rows: int):
+    started = time.perf_counter()
+    for i in range(sample):
+        response = await http.post(
+            "/mailing-list/subscribe",
+            json={"name": f"Subscriber {i}", "email": f"subscriber{i}@example.com"},
+        )
+        response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    return {
+        "sample_rows": sample,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(sample / elapsed),
+        "extrapolated_seconds": round(elapsed / sample * rows, 1),
+    }
+
+
+async def main(args):
+    results = {}
+
+    db = BenchDatabase()
+    db.install()
+    try:
+        async with client() as http:
+            results["per_row_subscribe"] = await per_row(http, args.sample, args.rows)
+    finally:
+        await db.close()
+
+    for name, body, content_type in [
+        ("csv", csv_body(args.rows), "text/csv"),
+        ("ndjson", ndjson_body(args.rows), "application/x-ndjson"),
+    ]:
+        db = BenchDatabase()
+        db.install()
+        try:
+            async with client() as http:
+                runs = {"empty_table": await timed_import(http, body, content_type)}
+                runs["same_file_again"] = await timed_import(http, body, content_type)
+                with db.SessionLocal() as session:
+                    session.execute(
+                        update(models.MailingListEntry)
+                        .where(models.MailingListEntry.id % 10 == 0)
+                        .values(subscribed=False)
+                    )
+                    session.commit()
+                runs["after_unsubscribes"] = await timed_import(http, body, content_type)
+                results[f"import_{name}"] = runs
+        finally:
+            await db.close()
+
+    report("mailing_import", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--sample", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""
+Deep-page latency of the admin `GET /mailing-list/` on 200k subscribers:
+OFFSET paging without the listing indexes, OFFSET paging with them, and
+keyset paging with the `X-Next-Cursor` cursor. Also times the total count
+behind `X-Total-Count` with and without the count cache.
+
+    python -m benchmarks.bench_mailing_pagination --rows 200000 --page 1500 --limit 100
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import func, select, text
+
+from app import cache, models, pagination
+from .common import ADMIN_HEADERS, BenchDatabase, client, report, seed_mailing_list, summarize
+
+INDEXES = {
+    "ix_mailing_list_subscribed_created_at_id": "mailing_list (subscribed, created_at, id)",
+    "ix_mailing_list_created_at_id": "mailing_list (created_at, id)",
+}
+
+
+def cursor_for_page(db: BenchDatabase, page: int, limit: int, subscribed_only: bool) -> str:
+    """Cursor a client would hold after paging through `page - 1` full pages"""
+    entry = models.MailingListEntry
+    query = select(entry.created_at, entry.id)
+    if subscribed_only:
+        query = query.where(entry.subscribed == True)
+    with db.SessionLocal() as session:
+        last = session.execute(
+            query.order_by(entry.created_at, entry.id).offset((page - 1) * limit - 1).limit(1)
+        ).one()
+    return pagination.encode_cursor(tuple(last))
+
+
+async def measure(http, path: str, repeat: int, count_cache: bool = True) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        if not count_cache:
+            cache.count_cache.counts.clear()
+        request_started = time.perf_counter()
+        response = await http.get(path, headers=ADMIN_HEADERS)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - request_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def time_count(db: BenchDatabase, repeat: int) -> dict:
+    """The COUNT(*) itself, as run on a count cache miss"""
+    latencies = []
+    with db.SessionLocal() as session:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            request_started = time.perf_counter()
+            session.scalar(select(func.count()).select_from(models.MailingListEntry).where(models.MailingListEntry.subscribed == True))
+            latencies.append(time.perf_counter() - request_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_mailing_list(db, args.rows)
+    db.install(response_cache=False)
+    results = {}
+    try:
+        async with client() as http:
+            for subscribed_only in (True, False):
+                flag = str(subscribed_only).lower()
+                offset_path = f"/mailing-list/?subscribed_only={flag}&limit={args.limit}&skip={(args.page - 1) * args.limit}"
+                cursor = cursor_for_page(db, args.page, args.limit, subscribed_only)
+                cursor_path = f"/mailing-list/?subscribed_only={flag}&limit={args.limit}&cursor={cursor}"
+                runs = {}
+                with db.engine.begin() as connection:
+                    for name in INDEXES:
+                        connection.execute(text(f"DROP INDEX {name}"))
+                runs["offset_no_index"] = await measure(http, offset_path, args.repeat)
+                with db.engine.begin() as connection:
+                    for name, definition in INDEXES.items():
+                        connection.execute(text(f"CREATE INDEX {name} ON {definition}"))
+                runs["offset_indexed"] = await measure(http, offset_path, args.repeat)
+                runs["keyset_indexed"] = await measure(http, cursor_path, args.repeat)
+                runs["keyset_indexed_count_uncached"] = await measure(http, cursor_path, args.repeat, count_cache=False)
+                results[f"subscribed_only_{flag}"] = runs
+            results["count_query"] = time_count(db, args.repeat)
+    finally:
+        await db.close()
+    report("mailing_pagination", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--page", type=int, default=1500)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=30)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,146 @@
+"""
+Overhead of the request metrics, measured in parts:
+
+- `middleware`: MetricsMiddleware around an ASGI app that does nothing,
+  against the bare app
+- `query_hooks`: a statement on a SQLite engine with and without the
+  engine hooks that count queries and time them
+- `cached_listing`: a response cache hit through the full app with and
+  without both; the cheapest real request, so the worst case in relative terms
+
+End-to-end timings of database-backed requests are left out: the thread hop
+of aiosqlite varies by more than the overhead being measured.
+
+    python -m benchmarks.bench_metrics
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+
+from app import metrics
+from app.main import app
+from .common import BenchDatabase, drain, report, seed_events
+
+HOOKS = [
+    ("before_cursor_execute", metrics._start_query),
+    ("after_cursor_execute", metrics._end_query),
+    ("handle_error", metrics._failed_query),
+]
+
+ORIGINAL_MIDDLEWARE = list(app.user_middleware)
+
+
+def set_hooks(enabled: bool) -> None:
+    for name, hook in HOOKS:
+        if enabled and not event.contains(Engine, name, hook):
+            event.listen(Engine, name, hook)
+        elif not enabled and event.contains(Engine, name, hook):
+            event.remove(Engine, name, hook)
+
+
+def set_metrics(enabled: bool) -> None:
+    """Add or remove the middleware and hooks; Starlette rebuilds its stack on the next request"""
+    app.user_middleware = [m for m in ORIGINAL_MIDDLEWARE if enabled or m.cls is not metrics.MetricsMiddleware]
+    app.middleware_stack = None
+    set_hooks(enabled)
+
+
+def compare(off, on) -> dict:
+    return {
+        "off_us": round(off, 2),
+        "on_us": round(on, 2),
+        "overhead_us": round(on - off, 2),
+        "overhead_pct": round((on - off) / off * 100, 1),
+    }
+
+
+async def time_asgi(asgi, repeat: int) -> float:
+    """Microseconds per request through `asgi`"""
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await asgi(scope, receive, send)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def time_queries(engine, repeat: int) -> float:
+    """Microseconds per statement"""
+    with engine.connect() as connection:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            connection.execute(text("SELECT 1"))
+        return (time.perf_counter() - started) / repeat * 1e6
+
+
+async def time_requests(path: str, query: str, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await drain(path, query, headers={})
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+async def best_of(rounds: int, measure_off, measure_on) -> dict:
+    """Interleave rounds so drift affects both sides equally; keep each side's best"""
+    off, on = [], []
+    for _ in range(rounds):
+        off.append(await measure_off())
+        on.append(await measure_on())
+    return compare(min(off), min(on))
+
+
+async def main(args):
+    results = {}
+    wrapped = metrics.MetricsMiddleware(noop_app)
+    results["middleware"] = await best_of(
+        args.rounds,
+        lambda: time_asgi(noop_app, args.repeat),
+        lambda: time_asgi(wrapped, args.repeat),
+    )
+
+    engine = create_engine("sqlite://")
+
+    async def queries(enabled: bool) -> float:
+        set_hooks(enabled)
+        return time_queries(engine, args.repeat)
+
+    results["query_hooks"] = await best_of(args.rounds, lambda: queries(False), lambda: queries(True))
+    engine.dispose()
+
+    db = BenchDatabase()
+    seed_events(db, 2000)
+    db.install(response_cache=True)
+    path, query = "/events/", "upcoming=true&limit=20"
+
+    async def requests(enabled: bool) -> float:
+        set_metrics(enabled)
+        await drain(path, query, headers={})
+        return await time_requests(path, query, args.repeat)
+
+    try:
+        results["cached_listing"] = await best_of(args.rounds, lambda: requests(False), lambda: requests(True))
+    finally:
+        set_metrics(True)
+        await db.close()
+    report("metrics_overhead", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
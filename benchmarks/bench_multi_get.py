@@ -0,0 +1,76 @@
+"""
+Cost of the data behind one page render: a dozen content keys, the DJs of a
+lineup and a few events, fetched one `GET /content/{key}`, `GET /djs/{id}`
+and `GET /events/{id}` at a time, against three multi-gets (`keys=` / `ids=`).
+The response cache is off, so every request reaches the database.
+
+    python -m benchmarks.bench_multi_get --keys 12 --djs 8 --events 3
+"""
+import argparse
+import asyncio
+import time
+
+from .common import BenchDatabase, QueryCounter, client, report, seed_content, seed_djs, seed_events, summarize
+
+
+async def one_by_one(http, keys, dj_ids, event_ids) -> int:
+    requests = 0
+    for key in keys:
+        (await http.get(f"/content/{key}")).raise_for_status()
+        requests += 1
+    for dj_id in dj_ids:
+        (await http.get(f"/djs/{dj_id}")).raise_for_status()
+        requests += 1
+    for event_id in event_ids:
+        (await http.get(f"/events/{event_id}")).raise_for_status()
+        requests += 1
+    return requests
+
+
+async def batched(http, keys, dj_ids, event_ids) -> int:
+    (await http.get(f"/content/?keys={','.join(keys)}")).raise_for_status()
+    (await http.get(f"/djs/?ids={','.join(map(str, dj_ids))}")).raise_for_status()
+    (await http.get(f"/events/?ids={','.join(map(str, event_ids))}")).raise_for_status()
+    return 3
+
+
+async def measure(db: BenchDatabase, http, render, args) -> dict:
+    keys = [f"page.section.{i}" for i in range(args.keys)]
+    dj_ids = list(range(1, args.djs + 1))
+    event_ids = list(range(1, args.events + 1))
+    latencies = []
+    started = time.perf_counter()
+    with QueryCounter(db.async_engine.sync_engine) as queries:
+        for _ in range(args.repeat):
+            page_started = time.perf_counter()
+            requests = await render(http, keys, dj_ids, event_ids)
+            latencies.append(time.perf_counter() - page_started)
+    result = summarize(latencies, time.perf_counter() - started)
+    result["requests_per_page"] = requests
+    result["queries_per_page"] = queries.count / args.repeat
+    return result
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_content(db, 50)
+    seed_djs(db, 100)
+    seed_events(db, 1000)
+    db.install(response_cache=False)
+    results = {}
+    try:
+        async with client() as http:
+            for render in (one_by_one, batched):
+                results[render.__name__] = await measure(db, http, render, args)
+    finally:
+        await db.close()
+    report("multi_get", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=12)
+    parser.add_argument("--djs", type=int, default=8)
+    parser.add_argument("--events", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
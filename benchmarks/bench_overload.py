@@ -0,0 +1,151 @@
+"""
+Public browsing offered at several times what the app can serve, with admin
+edits running alongside, without and with admission control. Arrivals are open
+loop (they keep coming whatever the latency, as on a ticket drop), so without
+a limit the backlog and every request's latency keep growing; with it, excess
+requests get a quick 503 and the ones served keep a bounded p99.
+
+    python -m benchmarks.bench_overload --overload 3 --duration 10
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List, Tuple, Union
+
+from app import admission
+from .bench_load import Call, Traffic
+from .common import BenchDatabase, client, report, seed_content, seed_djs, seed_events, summarize
+
+
+class Outcomes:
+    """Latency and status of every request of one kind"""
+
+    def __init__(self):
+        self.results: List[Tuple[str, float, Union[int, str]]] = []
+
+    async def call(self, http, call: Call) -> None:
+        label, method, url, body, headers = call
+        started = time.perf_counter()
+        try:
+            status = (await http.request(method, url, json=body, headers=headers)).status_code
+        except Exception as e:
+            # The in-process transport raises what a server would answer with a 500,
+            # e.g. the connection pool timing out under an unbounded backlog
+            status = type(e).__name__
+        self.results.append((label, time.perf_counter() - started, status))
+
+    def summary(self, elapsed: float) -> Dict:
+        statuses: Dict[Union[int, str], int] = {}
+        served: Dict[str, List[float]] = {}
+        shed = []
+        for label, latency, status in self.results:
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 503:
+                shed.append(latency)
+            elif status == 200:
+                served.setdefault(label, []).append(latency)
+        everything = [latency for latencies in served.values() for latency in latencies]
+        result = {"offered": len(self.results), "statuses": statuses, "served": summarize(everything, elapsed)}
+        if shed:
+            result["shed_p99_ms"] = summarize(shed, elapsed)["p99_ms"]
+        result["served_p99_ms_by_request"] = {
+            label: summarize(latencies, elapsed)["p99_ms"] for label, latencies in sorted(served.items())
+        }
+        return result
+
+
+def unlimited() -> Dict[str, admission.Gate]:
+    return {name: admission.Gate(10 ** 9, 0, 0) for name in admission.gates}
+
+
+async def capacity(http, traffic: Traffic, seconds: float, concurrency: int) -> float:
+    """Public reads per second the app sustains at a moderate concurrency"""
+    done = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            _, method, url, body, headers = traffic.browse()
+            await http.request(method, url, json=body, headers=headers)
+            done += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done / (time.perf_counter() - started)
+
+
+async def flood(http, traffic: Traffic, rate: float, args) -> Dict:
+    public, admin = Outcomes(), Outcomes()
+    rng = random.Random(11)
+    deadline = time.perf_counter() + args.duration
+    pending: List[asyncio.Task] = []
+
+    async def arrivals():
+        # Arrival times are fixed up front: when the busy loop wakes this late,
+        # every arrival that is due goes out at once, so the offered rate holds
+        due = time.perf_counter()
+        while due < deadline:
+            while due <= time.perf_counter() and due < deadline:
+                pending.append(asyncio.create_task(public.call(http, traffic.browse())))
+                due += rng.expovariate(rate)
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+    async def editor():
+        while time.perf_counter() < deadline:
+            await admin.call(http, traffic.admin())
+            await asyncio.sleep(args.admin_think)
+
+    started = time.perf_counter()
+    await asyncio.gather(arrivals(), *(editor() for _ in range(args.admin_concurrency)))
+    # Requests still waiting or running when arrivals stop are part of the run
+    await asyncio.gather(*pending)
+    elapsed = time.perf_counter() - started
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "public": public.summary(elapsed),
+        "admin": admin.summary(elapsed),
+        "gates": admission.snapshot(),
+    }
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_events(db, args.events)
+    seed_djs(db, args.djs)
+    seed_content(db, args.content)
+    # Without the response cache every read reaches the database, which is what overloads
+    db.install(response_cache=False)
+    traffic = Traffic(args)
+    configured = admission.gates
+    results = {}
+    try:
+        async with client() as http:
+            admission.gates = unlimited()
+            rate = await capacity(http, traffic, args.calibrate, args.calibrate_concurrency)
+            results["capacity_rps"] = round(rate, 1)
+            results["offered_rps"] = round(rate * args.overload, 1)
+            results["without_admission"] = await flood(http, traffic, rate * args.overload, args)
+            admission.gates = {
+                name: admission.Gate(gate.limit, gate.queue_length, gate.timeout) for name, gate in configured.items()
+            }
+            results["with_admission"] = await flood(http, traffic, rate * args.overload, args)
+    finally:
+        admission.gates = configured
+        await db.close()
+    report("overload", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--overload", type=float, default=3.0, help="offered load as a multiple of the measured capacity")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of arrivals per run")
+    parser.add_argument("--admin-concurrency", type=int, default=2)
+    parser.add_argument("--admin-think", type=float, default=0.1, help="seconds each admin pauses between edits")
+    parser.add_argument("--calibrate", type=float, default=3.0, help="seconds spent measuring capacity")
+    parser.add_argument("--calibrate-concurrency", type=int, default=8)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--djs", type=int, default=300)
+    parser.add_argument("--content", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,40 @@
+"""
+Public read throughput with the response cache off and on.
+
+    python -m benchmarks.bench_response_cache --events 2000 --concurrency 25 --requests 3000
+"""
+import argparse
+import asyncio
+
+from app import cache
+from .common import ADMIN_HEADERS, BenchDatabase, client, hammer, report, seed_events
+
+PATHS = ["/events/?upcoming=true", "/djs/", "/content/homepage"]
+
+
+async def run(args, enabled: bool) -> dict:
+    db = BenchDatabase()
+    seed_events(db, args.events)
+    db.install(response_cache=enabled)
+    results = {}
+    try:
+        async with client() as http:
+            await http.post("/content/", json={"key": "homepage", "string_collection": ["Azulu"] * 20}, headers=ADMIN_HEADERS)
+            for path in PATHS:
+                results[path] = await hammer(http, path, concurrency=args.concurrency, requests=args.requests)
+        results["cache"] = cache.response_cache.snapshot()
+    finally:
+        await db.close()
+    return results
+
+
+async def main(args):
+    report("response_cache", {"disabled": await run(args, False), "enabled": await run(args, True)})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--requests", type=int, default=3000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""
+Latency of `GET /search` over 100k synthetic events and 500 DJs, from rare
+terms to terms present in every event. The response cache is off, so each
+request runs the FTS5 queries. Exits non-zero if any p50 exceeds --budget-ms,
+or if the best match for a term in every event, the oldest event, is not
+ranked first.
+
+    python -m benchmarks.bench_search --events 100000 --budget-ms 150
+    python -m benchmarks.bench_search --events 100000 --rank-window 1000 --budget-ms 10
+
+Ranking every match (the default) costs ~100 ms per broad term at 100k events
+here; a rank window keeps it near 6 ms, but the second run fails the ranking
+check, as that event is outside the window.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+from sqlalchemy import insert
+
+from app import event_tags, models, search
+from .common import BenchDatabase, client, report, seed_djs, seed_events, summarize
+
+QUERIES = {
+    "rare_name": "Azulu Night 48213",
+    "venue": "Venue 17",
+    "dj_prefix": "DJ 12",
+    "genre_common": "techno",
+    "two_genres": "afro house",
+    "prefix_short": "ve",
+    "every_event": "grooves",
+}
+
+
+async def measure(http, q: str, repeat: int) -> dict:
+    path = f"/search?q={quote(q)}&limit=20"
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        request_started = time.perf_counter()
+        response = await http.get(path)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - request_started)
+    result = summarize(latencies, time.perf_counter() - started)
+    body = response.json()
+    result["hits"] = len(body["events"]) + len(body["djs"])
+    return result
+
+
+# Inserted first, so it is the oldest match for "grooves", and the best one:
+# the term is in its name, which outweighs the description of every other event
+BEST_OLD_MATCH = "Grooves Anniversary"
+
+
+def seed_best_old_match(db: BenchDatabase):
+    with db.SessionLocal() as session:
+        session.execute(insert(models.Event), [dict(
+            name=BEST_OLD_MATCH, venue_name="Venue 0", address="1 Main Street, Amsterdam",
+            start_date=datetime.utcnow() - timedelta(days=2000), lineup=[], genres=[],
+            description="The first night.",
+        )])
+        event_tags.rebuild(session.connection())
+        session.commit()
+
+
+async def main(args):
+    search.RANK_WINDOW = args.rank_window
+    db = BenchDatabase()
+    started = time.perf_counter()
+    seed_best_old_match(db)
+    seed_events(db, args.events)
+    seed_djs(db, args.djs)
+    seeded = time.perf_counter() - started
+    db.install(response_cache=False)
+    results = {"seed_seconds_with_triggers": round(seeded, 1), "rank_window": args.rank_window}
+    try:
+        async with client() as http:
+            for name, q in QUERIES.items():
+                results[name] = await measure(http, q, args.repeat)
+            top = (await http.get("/search?q=grooves&limit=1")).json()["events"]
+            results["best_old_match_first"] = bool(top) and top[0]["name"] == BEST_OLD_MATCH
+    finally:
+        await db.close()
+    report("search", results)
+
+    slow = [name for name in QUERIES if results[name]["p50_ms"] > args.budget_ms]
+    if slow:
+        sys.exit(f"p50 over {args.budget_ms} ms: {', '.join(slow)}")
+    if not results["best_old_match_first"]:
+        sys.exit(f"the best match for 'grooves', {BEST_OLD_MATCH!r}, is not ranked first")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--djs", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--rank-window", type=int, default=search.RANK_WINDOW, help="SEARCH_RANK_WINDOW; 0 ranks every match")
+    asyncio.run(main(parser.parse_args()))
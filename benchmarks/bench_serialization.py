@@ -0,0 +1,108 @@
+"""
+CPU time to fetch and render 1,000-event listings, per response:
+
+- `fastapi_default`: ORM objects validated through the response model, run
+  through jsonable_encoder and encoded with the stdlib json module, as
+  FastAPI does for a `response_model` route
+- `pydantic_dump_json`: ORM objects validated and dumped by pydantic-core,
+  the cache.render() path the listings used before
+- `rows_orjson`: plain column rows turned into dicts by a RowMapper and
+  encoded with orjson, the path the listings use now
+
+Also checks, exiting non-zero otherwise, that all three produce the same JSON,
+including for events with NULL in columns the create schema requires.
+
+    python -m benchmarks.bench_serialization --events 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import select, update
+
+from app import cache, models, schemas, serialization
+from .common import BenchDatabase, report, seed_events
+
+EVENTS = TypeAdapter(List[schemas.Event])
+EVENT_ROWS = serialization.RowMapper(models.Event, schemas.Event)
+ORDER = (models.Event.start_date, models.Event.id)
+
+
+def blank_some_columns(db: BenchDatabase):
+    """NULL in the nullable columns of every tenth event, as rows written outside the API can have"""
+    with db.SessionLocal() as session:
+        session.execute(
+            update(models.Event)
+            .where(models.Event.id % 10 == 0)
+            .values(description=None, venue_name=None, start_time=None, lineup=None, currency=None)
+        )
+        session.commit()
+
+
+def fastapi_default(session) -> bytes:
+    events = session.scalars(select(models.Event).order_by(*ORDER)).all()
+    validated = EVENTS.validate_python(events, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated), separators=(",", ":")).encode()
+
+
+def pydantic_dump_json(session) -> bytes:
+    events = session.scalars(select(models.Event).order_by(*ORDER)).all()
+    return cache.render(List[schemas.Event], events)
+
+
+def rows_orjson(session) -> bytes:
+    rows = session.execute(EVENT_ROWS.select().order_by(*ORDER))
+    return serialization.dumps(EVENT_ROWS.to_dicts(rows))
+
+
+def measure(db: BenchDatabase, render, repeat: int) -> dict:
+    cpu = []
+    wall = []
+    for _ in range(repeat):
+        # A fresh session per response, as per request, so nothing comes from the identity map
+        with db.SessionLocal() as session:
+            wall_started = time.perf_counter()
+            cpu_started = time.process_time()
+            body = render(session)
+            cpu.append(time.process_time() - cpu_started)
+            wall.append(time.perf_counter() - wall_started)
+    cpu.sort()
+    wall.sort()
+    return {
+        "cpu_ms_p50": round(cpu[len(cpu) // 2] * 1000, 3),
+        "wall_ms_p50": round(wall[len(wall) // 2] * 1000, 3),
+        "bytes": len(body),
+    }, body
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_events(db, args.events)
+    blank_some_columns(db)
+    results = {}
+    bodies = {}
+    try:
+        for render in (fastapi_default, pydantic_dump_json, rows_orjson):
+            measure(db, render, 3)  # warm the statement cache
+            results[render.__name__], bodies[render.__name__] = measure(db, render, args.repeat)
+    finally:
+        await db.close()
+    decoded = [json.loads(body) for body in bodies.values()]
+    results["same_json"] = all(body == decoded[0] for body in decoded)
+    baseline = results["fastapi_default"]["cpu_ms_p50"]
+    results["cpu_reduction_vs_fastapi_default"] = f"{1 - results['rows_orjson']['cpu_ms_p50'] / baseline:.0%}"
+    report("serialization", results)
+    if not results["same_json"]:
+        sys.exit("the listings' JSON differs between the three paths")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
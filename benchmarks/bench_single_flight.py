@@ -0,0 +1,83 @@
+"""
+A ticket-drop burst: an admin publishes (invalidating events and content), then
+hundreds of visitors request the same few pages at once. Each round is run with
+request coalescing off and on, counting SQL statements and latency.
+
+    python -m benchmarks.bench_single_flight --burst 500 --rounds 5
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+from app import cache, single_flight
+from .common import BenchDatabase, QueryCounter, client, report, seed_content, seed_events, summarize
+
+# The pages everyone opens after an announcement
+HOT_URLS = ["/events/?upcoming=true", "/content/page.section.0", "/content/page.section.1"]
+
+
+async def burst(http, size: int, seed: int, statuses: Dict[int, int]) -> List[float]:
+    rng = random.Random(seed)
+    urls = [rng.choice(HOT_URLS) for _ in range(size)]
+    latencies = []
+
+    async def one(url):
+        started = time.perf_counter()
+        status = (await http.get(url)).status_code
+        latencies.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    await asyncio.gather(*(one(url) for url in urls))
+    return latencies
+
+
+async def run(db: BenchDatabase, http, args, paths) -> Dict:
+    single_flight.SINGLE_FLIGHT_PATHS = paths
+    single_flight.single_flight.stats = single_flight.SingleFlightStats()
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    elapsed = 0.0
+    with QueryCounter(db.async_engine.sync_engine) as queries:
+        for round_ in range(args.rounds):
+            # The admin's publish: every cached copy of the hot pages is dropped
+            cache.response_cache.invalidate("events")
+            cache.response_cache.invalidate("content")
+            started = time.perf_counter()
+            latencies += await burst(http, args.burst, round_, statuses)
+            elapsed += time.perf_counter() - started
+    result = summarize(latencies, elapsed)
+    # Without coalescing, a large enough burst is partly shed by admission control
+    result["statuses"] = statuses
+    result["queries"] = queries.count
+    result["queries_per_request"] = round(queries.count / len(latencies), 3)
+    result["single_flight"] = single_flight.single_flight.snapshot()
+    return result
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_events(db, args.events)
+    seed_content(db, args.content)
+    db.install(response_cache=not args.no_response_cache)
+    configured = single_flight.SINGLE_FLIGHT_PATHS
+    results = {}
+    try:
+        async with client() as http:
+            results["without_coalescing"] = await run(db, http, args, ())
+            results["with_coalescing"] = await run(db, http, args, configured)
+    finally:
+        single_flight.SINGLE_FLIGHT_PATHS = configured
+        await db.close()
+    report("single_flight", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--burst", type=int, default=500, help="concurrent requests per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--content", type=int, default=50)
+    parser.add_argument("--no-response-cache", action="store_true")
+    asyncio.run(main(parser.parse_args()))
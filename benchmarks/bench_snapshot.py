@@ -0,0 +1,82 @@
+"""
+Data for one public page render: `GET /events/?upcoming=true`, `GET /djs/`
+and `GET /content/` with the response cache off, against one
+`GET /public/snapshot`. Also reports the bundle size per encoding, the
+database queries per render, and how long a write takes to show up in the
+snapshot.
+
+    python -m benchmarks.bench_snapshot --events 2000 --djs 200 --content 50
+"""
+import argparse
+import asyncio
+import time
+
+from app.snapshot import public_snapshot
+from .common import ADMIN_HEADERS, BenchDatabase, QueryCounter, client, report, seed_content, seed_djs, seed_events, summarize
+
+
+async def separate_endpoints(http, limit: int) -> int:
+    for path in (f"/events/?upcoming=true&limit={limit}", f"/djs/?limit={limit}", f"/content/?limit={limit}"):
+        (await http.get(path, headers={"Accept-Encoding": "identity"})).raise_for_status()
+    return 3
+
+
+async def snapshot(http, limit: int) -> int:
+    (await http.get("/public/snapshot", headers={"Accept-Encoding": "br"})).raise_for_status()
+    return 1
+
+
+async def measure(db: BenchDatabase, http, render, args) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    with QueryCounter(db.async_engine.sync_engine) as queries:
+        for _ in range(args.repeat):
+            page_started = time.perf_counter()
+            requests = await render(http, args.events)
+            latencies.append(time.perf_counter() - page_started)
+    result = summarize(latencies, time.perf_counter() - started)
+    result["requests_per_page"] = requests
+    result["queries_per_page"] = queries.count / args.repeat
+    return result
+
+
+async def write_to_visible(http) -> float:
+    """Seconds from a committed content update until the snapshot carries it"""
+    marker = f"updated {time.time()}"
+    started = time.perf_counter()
+    response = await http.put("/content/page.section.0", json={"big_string": marker}, headers=ADMIN_HEADERS)
+    response.raise_for_status()
+    while True:
+        body = (await http.get("/public/snapshot")).json()
+        if body["content"]["page.section.0"]["big_string"] == marker:
+            return time.perf_counter() - started
+        await asyncio.sleep(0.001)
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_events(db, args.events)
+    seed_djs(db, args.djs)
+    seed_content(db, args.content)
+    db.install(response_cache=False)
+    results = {}
+    try:
+        async with client() as http:
+            await public_snapshot.get()
+            bundle = public_snapshot.bundle
+            results["bundle_bytes"] = {"identity": len(bundle.identity), "gzip": len(bundle.gzip), "br": len(bundle.br)}
+            results["separate_endpoints"] = await measure(db, http, separate_endpoints, args)
+            results["snapshot"] = await measure(db, http, snapshot, args)
+            results["write_to_visible_ms"] = round(await write_to_visible(http) * 1000, 1)
+    finally:
+        await db.close()
+    report("snapshot", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--djs", type=int, default=200)
+    parser.add_argument("--content", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=30)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,67 @@
+"""
+Mixed read/write throughput for the tuned SQLite profile versus the legacy
+engine settings (rollback journal, driver-default pool, no pragmas).
+
+    python -m benchmarks.bench_sqlite_profile --readers 20 --writers 2 --seconds 5
+
+Readers page through upcoming events while writers update events through the
+admin PUT handler, so every write commit competes with the public reads.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from .common import ADMIN_HEADERS, BenchDatabase, client, report, seed_events, summarize
+
+
+async def run_profile(profile: str, args) -> dict:
+    db = BenchDatabase(profile)
+    seed_events(db, args.events)
+    db.install(response_cache=False)
+    reads, writes, errors = [], [], {}
+    deadline = time.perf_counter() + args.seconds
+
+    async def loop(http, samples, request):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await request(http)
+            if response.status_code >= 400:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+            else:
+                samples.append(time.perf_counter() - started)
+
+    def read(http):
+        return http.get("/events/?upcoming=true&limit=20")
+
+    def write(http):
+        event_id = random.randint(1, args.events)
+        return http.put(f"/events/{event_id}", json={"ticket_status": "Sold Out"}, headers=ADMIN_HEADERS)
+
+    try:
+        async with client() as http:
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(loop(http, reads, read) for _ in range(args.readers)),
+                *(loop(http, writes, write) for _ in range(args.writers)),
+            )
+            elapsed = time.perf_counter() - started
+    finally:
+        await db.close()
+    return {"reads": summarize(reads, elapsed), "writes": summarize(writes, elapsed), "errors": errors}
+
+
+async def main(args):
+    results = {}
+    for profile in ("legacy", "tuned"):
+        results[profile] = await run_profile(profile, args)
+    report("sqlite_profile", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
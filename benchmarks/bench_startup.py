@@ -0,0 +1,98 @@
+"""
+Cold start, as a scale-to-zero machine pays it: each run boots a fresh
+interpreter against a seeded database and reports the import time of
+`app.main`, the startup handlers, the first request and the whole process.
+The first boot of a database creates its schema; later boots only check the
+schema fingerprint. Also compared: `SCHEMA_CHECK=0` (create_all on every
+boot) and `STARTUP_WARMUP=1`.
+
+    python -m benchmarks.bench_startup --runs 5 --path "/events/?upcoming=true"
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# The parent only spawns and seeds; the app is imported in the child, where it is timed
+
+VARIANTS = {
+    "schema_check": {},
+    "create_all_every_boot": {"SCHEMA_CHECK": "0"},
+    "warmup": {"STARTUP_WARMUP": "1"},
+}
+
+
+async def child(path: str) -> None:
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+    await app.router.startup()
+    ready = time.perf_counter()
+    from app.warmup import get
+    status = await get(app, path)
+    answered = time.perf_counter()
+    await app.router.shutdown()
+    print(json.dumps({
+        "import_ms": round((imported - started) * 1000, 1),
+        "startup_ms": round((ready - imported) * 1000, 1),
+        "first_request_ms": round((answered - ready) * 1000, 1),
+        "first_request_status": status,
+        "cloudinary_imported": "cloudinary" in sys.modules,
+    }))
+
+
+def boot(url: str, path: str, env: dict) -> dict:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--path", path],
+        env={**os.environ, "SQLITE_DATABASE_URL": url, **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def median(runs):
+    keys = [key for key, value in runs[0].items() if isinstance(value, float)]
+    return {key: round(statistics.median(run[key] for run in runs), 1) for key in keys}
+
+
+def main(args):
+    from .common import BenchDatabase, report, seed_content, seed_djs, seed_events
+
+    results = {}
+    for name, env in VARIANTS.items():
+        db = BenchDatabase()
+        seed_events(db, args.events)
+        seed_djs(db, args.djs)
+        seed_content(db, args.content)
+        try:
+            first = boot(db.url, args.path, env)
+            later = [boot(db.url, args.path, env) for _ in range(args.runs)]
+        finally:
+            asyncio.run(db.close())
+        results[name] = {"first_boot": first, "later_boots_median": median(later)}
+        results[name]["cloudinary_imported"] = first["cloudinary_imported"]
+    report("startup", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--djs", type=int, default=200)
+    parser.add_argument("--content", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/events/?upcoming=true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child(args.path))
+    else:
+        main(args)
@@ -0,0 +1,100 @@
+"""
+A burst of concurrent `POST /mailing-list/subscribe` calls, as after a lineup
+announcement: one transaction per request (the previous behaviour) against the
+group-committing subscriptions.SubscribeBatcher. A tenth of the burst are
+addresses already on the list, half of them unsubscribed.
+
+    python -m benchmarks.bench_subscribe_burst --burst 5000 --subscribers 20000
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import func, select, update
+
+from app import admission, cache, database, models, subscriptions
+from .common import BenchDatabase, client, report, seed_mailing_list, summarize
+
+
+class PerRequest:
+    """One transaction per subscribe, as the endpoint did before batching"""
+
+    async def subscribe(self, entry):
+        (result,) = await database.run_in_transaction(lambda db: subscriptions.upsert(db, [entry]))
+        cache.response_cache.invalidate("mailing_list")
+        return result
+
+
+async def burst(http, size: int, subscribers: int, round_: int):
+    def body(i):
+        if i % 10 == 0:
+            return {"name": "Returning", "email": f"subscriber{(i * 7) % subscribers}@example.com"}
+        return {"name": "New Fan", "email": f"fan{round_}.{i}@example.com"}
+
+    latencies, statuses = [], {}
+
+    async def one(i):
+        started = time.perf_counter()
+        try:
+            outcome = (await http.post("/mailing-list/subscribe", json=body(i))).status_code
+        except Exception as e:
+            # The in-process transport raises what a server would answer with a 500,
+            # e.g. the connection pool timing out under the per-request path
+            outcome = type(e).__name__
+        latencies.append(time.perf_counter() - started)
+        statuses[outcome] = statuses.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(size)))
+    result = summarize(latencies, time.perf_counter() - started)
+    result["statuses"] = statuses
+    return result
+
+
+async def run(db: BenchDatabase, http, batcher, args, round_: int):
+    with db.SessionLocal() as session:
+        # Half of the returning addresses have unsubscribed since
+        session.execute(update(models.MailingListEntry).where(models.MailingListEntry.id % 2 == 0).values(subscribed=False))
+        session.commit()
+    subscriptions.subscribe_batcher = batcher
+    retries = database.retry_stats.retries
+    result = await burst(http, args.burst, args.subscribers, round_)
+    result["db_retries"] = database.retry_stats.retries - retries
+    if isinstance(batcher, subscriptions.SubscribeBatcher):
+        await batcher.stop()
+        result["transactions"] = batcher.stats.batches
+        result["largest_batch"] = batcher.stats.largest_batch
+    else:
+        result["transactions"] = args.burst
+    with db.SessionLocal() as session:
+        result["new_rows"] = session.scalar(
+            select(func.count()).where(models.MailingListEntry.email.like(f"fan{round_}.%"))
+        )
+    return result
+
+
+async def main(args):
+    db = BenchDatabase()
+    seed_mailing_list(db, args.subscribers)
+    db.install()
+    batched = subscriptions.subscribe_batcher
+    gates = admission.gates
+    # Measures the write path, so the whole burst is let in rather than mostly shed
+    admission.gates = {**gates, "public_write": admission.Gate(args.burst, 0, 0)}
+    results = {}
+    try:
+        async with client() as http:
+            results["per_request"] = await run(db, http, PerRequest(), args, 0)
+            results["batched"] = await run(db, http, subscriptions.SubscribeBatcher(), args, 1)
+    finally:
+        subscriptions.subscribe_batcher = batched
+        admission.gates = gates
+        await db.close()
+    report("subscribe_burst", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--burst", type=int, default=5000)
+    parser.add_argument("--subscribers", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
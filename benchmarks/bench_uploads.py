@@ -0,0 +1,257 @@
+"""
+Poster uploads through `POST /upload/image` against a local fake uploader that
+drains the stream at a fixed bandwidth, comparing the old path (read the whole
+file, upload on the event loop) with the streamed upload on the worker pool.
+
+    python -m benchmarks.bench_uploads --size-mb 20 --uploads 4
+
+Reports how the event loop and `GET /health` fared while the uploads were in
+flight, and the memory a single upload adds at its peak, measured with one
+upload at a time (of --memory-size-mb, several chunks long) so that no other
+request's allocations count. The fake reads the way the Cloudinary SDK does:
+files up to UPLOAD_CHUNK_SIZE whole, larger ones one chunk at a time.
+
+Also checks, exiting non-zero if any fails, that the streamed path hands the
+uploader every byte, keeps the loop responsive and adds at most
+MEMORY_BOUND_CHUNKS chunks (plus 1 MB) of memory per upload, and that bodies over
+MAX_UPLOAD_BYTES get 413 without being read (with Content-Length) or within a
+message of passing the limit (without).
+"""
+import argparse
+import asyncio
+import io
+import sys
+import time
+import tracemalloc
+from typing import List, Optional, Tuple
+
+from app import body_limit, cloudinary_setup
+from app.main import app
+from .common import ADMIN_HEADERS, LoopLagProbe, client, report, summarize
+
+# Peak memory one streamed upload may add: the chunk the uploader holds while it
+# reads the next, in UPLOAD_CHUNK_SIZE chunks, plus headroom for everything else
+MEMORY_BOUND_CHUNKS = 2
+MEMORY_HEADROOM_MB = 1
+
+
+def fake_uploader(bandwidth: float, received: List[int]):
+    """Reads the stream as the SDK would and sleeps as if sending it over the network"""
+    def upload(stream, size, filename, folder):
+        # upload() reads the file whole; upload_large() one chunk at a time
+        chunk_size = cloudinary_setup.UPLOAD_CHUNK_SIZE if size > cloudinary_setup.UPLOAD_CHUNK_SIZE else max(size, 1)
+        sent = 0
+        chunk = stream.read(chunk_size)
+        while chunk:
+            sent += len(chunk)
+            time.sleep(len(chunk) / bandwidth)
+            chunk = stream.read(chunk_size)
+        received.append(sent)
+        return {"secure_url": f"https://fake/{folder}/{filename}", "public_id": filename,
+                "format": "jpg", "width": 1080, "height": 1350, "bytes": sent}
+    return upload
+
+
+def legacy_upload(upload):
+    """The previous handler body: whole file in memory, blocking call on the loop"""
+    async def upload_image_async(file, folder="event_posters"):
+        content = file.file.read()
+        result = upload(io.BytesIO(content), len(content), file.filename, folder)
+        return {"success": True, "url": result["secure_url"], "public_id": result["public_id"],
+                "format": result["format"], "width": result["width"], "height": result["height"]}
+    return upload_image_async
+
+
+def install(upload, legacy: bool, peaks: List[int]):
+    """Swap in the fake uploader and the measured handler; returns the handler to restore"""
+    cloudinary_setup.uploader = upload
+    original = cloudinary_setup.upload_image_async
+    handler = legacy_upload(upload) if legacy else original
+    cloudinary_setup.upload_image_async = measure_handler(handler, peaks)
+    return original
+
+
+def restore(original) -> None:
+    cloudinary_setup.upload_image_async = original
+    cloudinary_setup.uploader = cloudinary_setup.cloudinary_upload
+
+
+def measure_handler(upload_image_async, peaks):
+    """Traced memory allocated from the start of the upload until it returns"""
+    async def measured(file, folder="event_posters"):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = await upload_image_async(file, folder)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        return result
+    return measured
+
+
+async def run(args, legacy: bool) -> dict:
+    received: List[int] = []
+    upload = fake_uploader(args.bandwidth_mb * 1024 * 1024, received)
+    original = install(upload, legacy, [])
+    poster = b"\xff" * int(args.size_mb * 1024 * 1024)
+    health = []
+    done = asyncio.Event()
+
+    async def poll_health(http):
+        while not done.is_set():
+            started = time.perf_counter()
+            await http.get("/health")
+            health.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+
+    async def post(http):
+        files = {"file": ("poster.jpg", poster, "image/jpeg")}
+        response = await http.post("/upload/image", files=files, headers=ADMIN_HEADERS)
+        response.raise_for_status()
+
+    try:
+        async with client() as http:
+            probe = LoopLagProbe()
+            probe.start()
+            poller = asyncio.create_task(poll_health(http))
+            started = time.perf_counter()
+            await asyncio.gather(*(post(http) for _ in range(args.uploads)))
+            elapsed = time.perf_counter() - started
+            done.set()
+            await poller
+            result = {"elapsed_s": round(elapsed, 3)}
+            result.update(await probe.stop())
+            result["health"] = summarize(health, elapsed)
+            result["complete_uploads"] = sum(sent == len(poster) for sent in received)
+    finally:
+        restore(original)
+    return result
+
+
+async def upload_peak(args, legacy: bool) -> float:
+    """MB one upload adds at its peak, with nothing else in flight"""
+    peaks: List[int] = []
+    original = install(fake_uploader(args.bandwidth_mb * 1024 * 1024, []), legacy, peaks)
+    files = {"file": ("poster.jpg", b"\xff" * int(args.memory_size_mb * 1024 * 1024), "image/jpeg")}
+    try:
+        async with client() as http:
+            tracemalloc.start()
+            try:
+                response = await http.post("/upload/image", files=files, headers=ADMIN_HEADERS)
+            finally:
+                tracemalloc.stop()
+            response.raise_for_status()
+    finally:
+        restore(original)
+    return round(peaks[0] / 1024 / 1024, 2)
+
+
+async def memory(args) -> dict:
+    chunk_mb = cloudinary_setup.UPLOAD_CHUNK_SIZE / 1024 / 1024
+    return {
+        "file_mb": args.memory_size_mb,
+        "chunk_mb": round(chunk_mb, 2),
+        "read_and_block_peak_mb": await upload_peak(args, True),
+        "streamed_pool_peak_mb": await upload_peak(args, False),
+        "streamed_bound_mb": round(MEMORY_BOUND_CHUNKS * chunk_mb + MEMORY_HEADROOM_MB, 2),
+    }
+
+
+async def post_raw(size: int, content_length: bool, piece: int = 1024 * 1024) -> Tuple[Optional[int], int]:
+    """
+    POST a multipart body of `size` file bytes over raw ASGI, in `piece`-sized
+    messages; returns the status and how many body bytes the app asked for
+    """
+    boundary = "limitcheck"
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.jpg\"\r\n"
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    total = len(head) + size + len(tail)
+    headers = [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())]
+    headers += [(name.lower().encode(), value.encode()) for name, value in ADMIN_HEADERS.items()]
+    if content_length:
+        headers.append((b"content-length", str(total).encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/upload/image", "raw_path": b"/upload/image", "query_string": b"",
+        "headers": headers, "server": ("bench", 80), "client": ("127.0.0.1", 1234), "root_path": "",
+    }
+    sent = 0
+    status = None
+
+    async def receive():
+        nonlocal sent
+        if sent >= total:
+            await asyncio.sleep(3600)  # nothing more; the app only waits here for a disconnect
+        if sent == 0:
+            body = head
+        else:
+            body = b"\xff" * min(piece, total - len(tail) - sent) or tail
+        sent += len(body)
+        return {"type": "http.request", "body": body, "more_body": sent < total}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await asyncio.wait_for(app(scope, receive, send), 60)
+    return status, sent
+
+
+async def limit_checks() -> dict:
+    # Well past the limit, so a body read to the end cannot pass for one cut off
+    oversized = 2 * cloudinary_setup.MAX_UPLOAD_BYTES
+    declared_status, declared_read = await post_raw(oversized, content_length=True)
+    streamed_status, streamed_read = await post_raw(oversized, content_length=False)
+    return {
+        "with_content_length": {"status": declared_status, "body_bytes_read": declared_read},
+        "without_content_length": {"status": streamed_status, "body_bytes_read": streamed_read},
+    }
+
+
+def failures(results: dict, args) -> List[str]:
+    found = []
+    streamed = results["streamed_pool"]
+    if streamed["complete_uploads"] != args.uploads:
+        found.append(f"only {streamed['complete_uploads']} of {args.uploads} uploads reached the uploader whole")
+    if streamed["loop_lag_p99_ms"] > args.max_loop_lag_ms:
+        found.append(f"loop lag p99 {streamed['loop_lag_p99_ms']} ms over {args.max_loop_lag_ms} ms")
+    peak = results["memory"]
+    if peak["streamed_pool_peak_mb"] > peak["streamed_bound_mb"]:
+        found.append(f"one upload added {peak['streamed_pool_peak_mb']} MB, over {peak['streamed_bound_mb']} MB")
+    limits = results["limits"]
+    if limits["with_content_length"] != {"status": 413, "body_bytes_read": 0}:
+        found.append(f"oversized upload with Content-Length: {limits['with_content_length']}")
+    streamed_limit = limits["without_content_length"]
+    # The limit on the body, plus the message that crossed it
+    cutoff = cloudinary_setup.MAX_UPLOAD_BYTES + body_limit.MULTIPART_OVERHEAD + 1024 * 1024
+    if streamed_limit["status"] != 413 or streamed_limit["body_bytes_read"] > cutoff:
+        found.append(f"oversized upload without Content-Length: {streamed_limit}")
+    return found
+
+
+async def main(args):
+    results = {
+        "read_and_block": await run(args, True),
+        "streamed_pool": await run(args, False),
+        "memory": await memory(args),
+        "limits": await limit_checks(),
+    }
+    report("uploads", results)
+    found = failures(results, args)
+    if found:
+        sys.exit("; ".join(found))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=float, default=20)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--bandwidth-mb", type=float, default=40, help="fake uploader speed, MB/s")
+    parser.add_argument(
+        "--memory-size-mb", type=float, default=4 * cloudinary_setup.UPLOAD_CHUNK_SIZE / 1024 / 1024,
+        help="file size for the memory measurement; default four chunks",
+    )
+    parser.add_argument("--max-loop-lag-ms", type=float, default=250, help="fail above this loop lag p99 while uploading")
+    asyncio.run(main(parser.parse_args()))
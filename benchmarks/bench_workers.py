@@ -0,0 +1,152 @@
+"""
+Throughput of `serve.py` with 1 to N worker processes, over real TCP, for a
+mix of public reads. After each run, one content write is followed by reads on
+fresh connections (spread over the workers by the kernel) to count responses
+still serving the old value from some worker's cache.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --clients 4 --duration 10
+
+Clients run in their own processes so the load generator is not the limit;
+the numbers only scale as far as the machine has free cores.
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import httpx
+
+from .common import ADMIN_HEADERS, BenchDatabase, report, seed_content, seed_djs, seed_events, summarize
+
+
+def paths(args) -> List[str]:
+    rng = random.Random(3)
+    return (
+        ["/events/?upcoming=true&limit=20", "/djs/?limit=50", "/public/snapshot"]
+        + [f"/events/{rng.randint(1, args.events)}" for _ in range(20)]
+        + [f"/content/page.section.{rng.randrange(args.content)}" for _ in range(20)]
+    )
+
+
+def drive(base_url: str, targets: List[str], concurrency: int, duration: float) -> Tuple[List[float], int]:
+    """One client process: `concurrency` connections reading `targets` until `duration` passes"""
+    async def run():
+        latencies, errors = [], 0
+        deadline = time.perf_counter() + duration
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+            async def worker(seed):
+                nonlocal errors
+                rng = random.Random(seed)
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        response = await http.get(rng.choice(targets))
+                        if response.status_code != 200:
+                            errors += 1
+                    except httpx.HTTPError:
+                        errors += 1
+                    latencies.append(time.perf_counter() - started)
+            await asyncio.gather(*(worker(seed) for seed in range(concurrency)))
+        return latencies, errors
+
+    return asyncio.run(run())
+
+
+def start_server(workers: int, port: int, db: BenchDatabase, directory: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "SQLITE_DATABASE_URL": db.url,
+        "CACHE_GENERATIONS_FILE": os.path.join(directory, f"generations-{workers}"),
+        "UPLOAD_SPOOL_DIR": os.path.join(directory, "spool"),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"serve.py with {workers} workers did not come up")
+
+
+def stale_reads(base_url: str, reads: int) -> Dict[str, int]:
+    """Prime every worker's cache, write once, then count reads of the old value"""
+    path = "/content/page.section.0"
+    fresh = {"Connection": "close"}  # a new connection per read, so reads reach different workers
+    for _ in range(reads):
+        httpx.get(base_url + path, headers=fresh).raise_for_status()
+    marker = f"written at {time.time()}"
+    httpx.put(base_url + path, json={"big_string": marker}, headers=ADMIN_HEADERS).raise_for_status()
+    stale = sum(
+        httpx.get(base_url + path, headers=fresh).json()["big_string"] != marker
+        for _ in range(reads)
+    )
+    return {"reads_after_write": reads, "stale": stale}
+
+
+def measure(workers: int, args, db: BenchDatabase, directory: str, port: int) -> Dict:
+    server = start_server(workers, port, db, directory)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        targets = paths(args)
+        per_client = max(1, args.concurrency // args.clients)
+        with ProcessPoolExecutor(args.clients) as pool:
+            started = time.perf_counter()
+            runs = list(pool.map(drive, *zip(*[(base_url, targets, per_client, args.duration)] * args.clients)))
+            elapsed = time.perf_counter() - started
+        latencies = [latency for run, _ in runs for latency in run]
+        result = summarize(latencies, elapsed)
+        result["errors"] = sum(errors for _, errors in runs)
+        result["coherence"] = stale_reads(base_url, args.reads)
+        return result
+    finally:
+        server.terminate()
+        server.wait(30)
+
+
+def main(args):
+    db = BenchDatabase()
+    seed_events(db, args.events)
+    seed_djs(db, args.djs)
+    seed_content(db, args.content)
+    results = {"cpus": os.cpu_count()}
+    try:
+        with tempfile.TemporaryDirectory(prefix="azulu-workers-") as directory:
+            for workers in args.workers:
+                results[f"workers_{workers}"] = measure(workers, args, db, directory, args.port)
+    finally:
+        asyncio.run(db.close())
+    base = results[f"workers_{args.workers[0]}"]["throughput_rps"]
+    results["speedup"] = {
+        f"workers_{workers}": round(results[f"workers_{workers}"]["throughput_rps"] / base, 2)
+        for workers in args.workers
+    }
+    report("workers", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="connections across all clients")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--reads", type=int, default=50, help="reads before and after the coherence write")
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--djs", type=int, default=200)
+    parser.add_argument("--content", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+"""
+Pages through the admin `GET /mailing-list/` with `X-Next-Cursor` on a list
+where some subscribers have no created_at (NULL sorts first, so pages end on
+NULL rows and carry a NULL in the cursor), and exits non-zero unless every
+entry comes back exactly once, in (created_at, id) order.
+
+    python -m benchmarks.check_keyset_pagination
+"""
+import asyncio
+import sys
+from typing import List
+
+from sqlalchemy import select, update
+
+from app import models, pagination
+from .common import ADMIN_HEADERS, BenchDatabase, client, seed_mailing_list
+
+ROWS = 500
+# Small and prime, so page boundaries fall inside, at the end of and past the NULL rows
+LIMIT = 7
+
+
+def blank_created_at(db: BenchDatabase):
+    """No created_at on every 25th subscriber, as rows written outside the API can have"""
+    entry = models.MailingListEntry
+    with db.SessionLocal() as session:
+        session.execute(update(entry).where(entry.id % 25 == 0).values(created_at=None))
+        session.commit()
+
+
+def expected_ids(db: BenchDatabase, subscribed_only: bool) -> List[int]:
+    entry = models.MailingListEntry
+    query = select(entry.id).order_by(entry.created_at, entry.id)
+    if subscribed_only:
+        query = query.where(entry.subscribed == True)
+    with db.SessionLocal() as session:
+        return list(session.scalars(query))
+
+
+async def walk(http, subscribed_only: bool) -> List[int]:
+    """Every id the listing returns, following the cursor until a short page"""
+    ids = []
+    path = f"/mailing-list/?subscribed_only={str(subscribed_only).lower()}&limit={LIMIT}"
+    cursor = None
+    while True:
+        response = await http.get(path + (f"&cursor={cursor}" if cursor else ""), headers=ADMIN_HEADERS)
+        if response.status_code != 200:
+            raise RuntimeError(f"page after {len(ids)} entries: {response.status_code} {response.text}")
+        ids += [entry["id"] for entry in response.json()]
+        cursor = response.headers.get(pagination.NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return ids
+
+
+async def main():
+    db = BenchDatabase()
+    seed_mailing_list(db, ROWS)
+    blank_created_at(db)
+    db.install(response_cache=False)
+    failures = []
+    try:
+        async with client() as http:
+            for subscribed_only in (True, False):
+                expected = expected_ids(db, subscribed_only)
+                try:
+                    found = await walk(http, subscribed_only)
+                except RuntimeError as e:
+                    failures.append(f"subscribed_only={subscribed_only}: {e}")
+                    continue
+                if found != expected:
+                    failures.append(
+                        f"subscribed_only={subscribed_only}: {len(found)} entries paged, {len(expected)} expected"
+                        f" ({len(set(expected) - set(found))} missing, {len(found) - len(set(found))} repeated)"
+                    )
+            # Events cannot list NULL start dates, but a NULL cursor must still not be a 500
+            response = await http.get(f"/events/?cursor={pagination.encode_cursor((None, 0))}")
+            if response.status_code != 200:
+                failures.append(f"events with a NULL cursor: {response.status_code}")
+    finally:
+        await db.close()
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(f"{len(failures)} keyset pagination checks failed")
+    print(f"{ROWS} subscribers paged {LIMIT} at a time, NULL created_at included")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
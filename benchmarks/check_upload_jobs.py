@@ -0,0 +1,159 @@
+"""
+Runs background upload jobs through the queue against a stub uploader and
+exits non-zero unless each one ends as expected: enqueue, claim, retry of
+transient errors, success or failure, and recovery of jobs left running by a
+restart or by a worker that died (once its lease expires).
+
+    python -m benchmarks.check_upload_jobs
+"""
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+import types
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from app import cloudinary_setup, database, models, upload_jobs
+from .common import BenchDatabase
+
+# Short enough that the check takes seconds; renewed every third of it
+LEASE_SECONDS = 1.0
+SLOW_UPLOAD_SECONDS = 2.5 * LEASE_SECONDS
+MAX_ATTEMPTS = 3
+FILE_SIZE = 256 * 1024
+
+# filename: (status, attempts, uploader calls) each job must end with
+EXPECTED = {
+    "ok.jpg": ("succeeded", 1, 1),
+    "flaky.jpg": ("succeeded", 2, 2),  # a transient error, then success
+    "bad.jpg": ("failed", 1, 1),  # not transient, not retried
+    "down.jpg": ("failed", MAX_ATTEMPTS, MAX_ATTEMPTS),
+    "slow.jpg": ("succeeded", 1, 1),  # outlives the lease, which is renewed
+    "restart.jpg": ("succeeded", 2, 1),  # left running by the previous process
+    "held.jpg": ("succeeded", 2, 1),  # its worker died; taken over once the lease expires
+    "dead.jpg": ("failed", MAX_ATTEMPTS + 1, 0),  # taken over too many times
+}
+
+
+class StubUploader:
+    """Behaves according to the file name and counts calls and bytes received"""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.received: Dict[str, int] = {}
+
+    def __call__(self, stream, size, filename, folder):
+        self.calls[filename] = self.calls.get(filename, 0) + 1
+        data = stream.read()
+        if filename == "flaky.jpg" and self.calls[filename] == 1 or filename == "down.jpg":
+            raise ConnectionError("connection reset")
+        if filename == "bad.jpg":
+            raise ValueError("not an image")
+        if filename == "slow.jpg":
+            time.sleep(SLOW_UPLOAD_SECONDS)
+        self.received[filename] = len(data)
+        return {"secure_url": f"https://stub/{folder}/{filename}", "public_id": filename,
+                "format": "jpg", "width": 1, "height": 1}
+
+
+async def insert_running(spool_dir: str, filename: str, attempts: int, updated_at: datetime) -> str:
+    """A job some other worker claimed: as a crashed process or a dead worker leaves it"""
+    job_id = uuid.uuid4().hex
+    file_path = os.path.join(spool_dir, job_id)
+    with open(file_path, "wb") as out:
+        out.write(b"\xff" * FILE_SIZE)
+
+    async def insert(db):
+        db.add(models.UploadJob(
+            id=job_id, status="running", folder="event_posters", filename=filename, file_path=file_path,
+            size=FILE_SIZE, attempts=attempts, next_attempt_at=updated_at, updated_at=updated_at,
+        ))
+    await database.run_in_transaction(insert)
+    return job_id
+
+
+async def load(job_id: str) -> models.UploadJob:
+    async with database.AsyncSessionLocal() as db:
+        return await db.get(models.UploadJob, job_id)
+
+
+async def settle(job_ids: List[str], timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        jobs = [await load(job_id) for job_id in job_ids]
+        if all(job.status in ("succeeded", "failed") for job in jobs):
+            return
+        await asyncio.sleep(0.1)
+
+
+async def run(spool_dir: str, stub: StubUploader) -> List[str]:
+    failures = []
+    queue = upload_jobs.UploadQueue(workers=2, spool_dir=spool_dir)
+    jobs = {"restart.jpg": await insert_running(spool_dir, "restart.jpg", 1, datetime.utcnow())}
+    await queue.start(requeue=True)
+    try:
+        for name in ("ok.jpg", "flaky.jpg", "bad.jpg", "down.jpg", "slow.jpg"):
+            upload = types.SimpleNamespace(file=io.BytesIO(b"\xff" * FILE_SIZE), filename=name)
+            jobs[name] = (await queue.enqueue(upload)).id
+        now = datetime.utcnow()
+        jobs["held.jpg"] = await insert_running(spool_dir, "held.jpg", 1, now)
+        expired = now - timedelta(seconds=2 * LEASE_SECONDS)
+        jobs["dead.jpg"] = await insert_running(spool_dir, "dead.jpg", MAX_ATTEMPTS, expired)
+
+        await asyncio.sleep(LEASE_SECONDS / 2)
+        held = await load(jobs["held.jpg"])
+        if held.status != "running" or held.attempts != 1:
+            failures.append(f"held.jpg: taken over before its lease expired ({held.status}, attempts {held.attempts})")
+
+        await settle(list(jobs.values()), timeout=30)
+    finally:
+        await queue.stop()
+
+    for name, job_id in jobs.items():
+        job = await load(job_id)
+        status, attempts, calls = EXPECTED[name]
+        found = (job.status, job.attempts, stub.calls.get(name, 0))
+        if found != (status, attempts, calls):
+            failures.append(f"{name}: ended {found}, expected {(status, attempts, calls)}")
+        if status == "succeeded" and (stub.received.get(name) != FILE_SIZE or job.secure_url is None):
+            failures.append(f"{name}: uploader got {stub.received.get(name)} of {FILE_SIZE} bytes")
+        if os.path.exists(job.file_path):
+            failures.append(f"{name}: spooled file left behind")
+    return failures
+
+
+async def main():
+    db = BenchDatabase()
+    db.install()
+    stub = StubUploader()
+    patched = {
+        "UPLOAD_LEASE_SECONDS": LEASE_SECONDS,
+        "UPLOAD_MAX_ATTEMPTS": MAX_ATTEMPTS,
+        "UPLOAD_RETRY_BASE_DELAY": 0.05,
+        "UPLOAD_RETRY_MAX_DELAY": 0.2,
+    }
+    configured = {name: getattr(upload_jobs, name) for name in patched}
+    for name, value in patched.items():
+        setattr(upload_jobs, name, value)
+    cloudinary_setup.uploader = stub
+    try:
+        with tempfile.TemporaryDirectory(prefix="azulu-spool-") as spool_dir:
+            failures = await run(spool_dir, stub)
+    finally:
+        cloudinary_setup.uploader = cloudinary_setup.cloudinary_upload
+        for name, value in configured.items():
+            setattr(upload_jobs, name, value)
+        await db.close()
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(f"{len(failures)} upload job checks failed")
+    print(f"{len(EXPECTED)} upload jobs ended as expected")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
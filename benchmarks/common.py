@@ -0,0 +1,290 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every benchmark runs against a throwaway SQLite file and drives the real
+FastAPI app in-process through httpx's ASGI transport, so numbers exclude
+network time but include routing, validation, the database and serialization.
+"""
+import asyncio
+import json
+import logging
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import cache, database, dependencies, event_tags, models
+from app.main import app
+
+# httpx logs every request at INFO, which drowns out the report
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+ADMIN_HEADERS = {"X-Admin-Password": dependencies.ADMIN_PASSWORD}
+
+GENRES = ["techno", "house", "afro house", "melodic techno", "disco", "amapiano"]
+
+
+class BenchDatabase:
+    """Temporary SQLite database wired into the app in place of the real one"""
+
+    def __init__(self, profile: str = database.SQLITE_PROFILE):
+        self.directory = tempfile.TemporaryDirectory(prefix="azulu-bench-")
+        self.url = f"sqlite:///{self.directory.name}/bench.db"
+        self.engine = database.build_engine(self.url, profile)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_engine = database.build_async_engine(self.url, profile)
+        database.Base.metadata.create_all(bind=self.engine)
+
+    def install(self, response_cache: bool = True):
+        """
+        Point the app's session factories at this database. Benchmarks that measure
+        the database itself pass response_cache=False so reads are not served from memory.
+        """
+        database.SessionLocal.configure(bind=self.engine)
+        database.AsyncSessionLocal.configure(bind=self.async_engine)
+        cache.response_cache.clear()
+        cache.response_cache.max_bytes = cache.CACHE_MAX_BYTES if response_cache else 0
+
+    async def close(self):
+        database.SessionLocal.configure(bind=database.engine)
+        database.AsyncSessionLocal.configure(bind=database.async_engine)
+        cache.response_cache.clear()
+        cache.response_cache.max_bytes = cache.CACHE_MAX_BYTES
+        await self.async_engine.dispose()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+
+def seed_events(db: BenchDatabase, count: int, upcoming_ratio: float = 0.5, seed: int = 42):
+    """Insert synthetic events spread around today, in one transaction"""
+    rng = random.Random(seed)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = []
+    for i in range(count):
+        offset = rng.randint(1, 365)
+        upcoming = rng.random() < upcoming_ratio
+        rows.append(dict(
+            name=f"Azulu Night {i}",
+            venue_name=f"Venue {i % 50}",
+            address=f"{i} Main Street, Amsterdam",
+            start_date=today + timedelta(days=offset if upcoming else -offset),
+            start_time="22:00",
+            end_time="05:00",
+            time_zone="Europe/Amsterdam",
+            ticket_status="Available",
+            ticket_link=f"https://tickets.example/{i}",
+            lineup=[f"DJ {rng.randint(0, 500)}" for _ in range(3)],
+            genres=rng.sample(GENRES, 2),
+            description="An evening of deep grooves. " * 10,
+            poster_url=None,
+            price=25.0,
+            currency="EUR",
+        ))
+    with db.SessionLocal() as session:
+        session.execute(insert(models.Event), rows)
+        event_tags.rebuild(session.connection())  # bulk inserts bypass the route handlers
+        session.commit()
+
+
+def seed_djs(db: BenchDatabase, count: int):
+    """Insert DJs, each with its own socials row"""
+    with db.SessionLocal() as session:
+        for i in range(count):
+            socials = models.DjSocials(instagram=f"@dj{i}", soundcloud=f"https://soundcloud.com/dj{i}")
+            session.add(models.Dj(alias=f"DJ {i}", profile_url=f"https://azulu.nl/djs/{i}", socials=socials))
+        session.flush()
+        event_tags.rebuild(session.connection())  # link lineup entries to the new DJs
+        session.commit()
+
+
+def seed_mailing_list(db: BenchDatabase, count: int, unsubscribed_ratio: float = 0.1, seed: int = 42):
+    """Insert subscribers signed up over the past two years, in one transaction"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    rows = [
+        dict(
+            name=f"Subscriber {i}",
+            email=f"subscriber{i}@example.com",
+            created_at=now - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60)),
+            subscribed=rng.random() >= unsubscribed_ratio,
+        )
+        for i in range(count)
+    ]
+    with db.SessionLocal() as session:
+        session.execute(insert(models.MailingListEntry), rows)
+        session.commit()
+
+
+def seed_content(db: BenchDatabase, count: int):
+    """Insert content entries keyed `page.section.<i>`"""
+    rows = [
+        dict(key=f"page.section.{i}", string_collection=[f"Line {j}" for j in range(5)], big_string="Lorem ipsum. " * 40)
+        for i in range(count)
+    ]
+    with db.SessionLocal() as session:
+        session.execute(insert(models.Content), rows)
+        session.commit()
+
+
+class QueryCounter:
+    """Counts statements executed on an engine while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+def client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+async def drain(path: str, query: str = "", headers: Optional[Dict[str, str]] = None) -> int:
+    """
+    GET `path` over raw ASGI, discarding the body; returns the bytes received.
+    Unlike client(), nothing is buffered or decoded, so streamed and compressed
+    bodies are measured as sent. Sends the admin header unless `headers` is given.
+    """
+    received = 0
+    status = None
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (ADMIN_HEADERS if headers is None else headers).items()],
+        "server": ("bench", 80),
+        "client": ("127.0.0.1", 1234),
+        "root_path": "",
+    }
+
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        # StreamingResponse keeps listening for a disconnect while it sends
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    if status != 200:
+        raise RuntimeError(f"{path}?{query} returned {status}")
+    return received
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (milliseconds) for a batch of requests"""
+    if not latencies:
+        return {"requests": 0}
+    ordered = sorted(latencies)
+    cuts = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+    return {
+        "requests": len(ordered),
+        "throughput_rps": round(len(ordered) / elapsed, 1),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def hammer(
+    http: httpx.AsyncClient,
+    path: str,
+    *,
+    concurrency: int,
+    requests: int,
+    method: str = "GET",
+    headers: Optional[Dict[str, str]] = None,
+    json_body=None,
+) -> Dict[str, float]:
+    """Fire `requests` calls at `path` from `concurrency` workers and summarize them"""
+    latencies: List[float] = []
+    remaining = requests
+    statuses: Dict[int, int] = {}
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            body = json_body() if callable(json_body) else json_body
+            response = await http.request(method, path, headers=headers, json=body)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - started)
+    result["statuses"] = statuses
+    return result
+
+
+class LoopLagProbe:
+    """Measures how late the event loop wakes a sleeping task while load runs"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+        self._sleeping_since = 0.0
+
+    async def _run(self):
+        while True:
+            self._sleeping_since = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(time.perf_counter() - self._sleeping_since - self.interval)
+
+    def start(self):
+        self._sleeping_since = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Dict[str, float]:
+        # A loop that never yielded leaves the probe stuck in its first sleep
+        self.lags.append(max(0.0, time.perf_counter() - self._sleeping_since - self.interval))
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        lags = sorted(self.lags)
+        return {
+            "loop_lag_p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 3),
+            "loop_lag_max_ms": round(lags[-1] * 1000, 3),
+        }
+
+
+def report(name: str, results: Dict) -> None:
+    print(json.dumps({"benchmark": name, "results": results}, indent=2, default=str))
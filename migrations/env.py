@@ -9,6 +9,7 @@ from sqlalchemy.engine import make_url
 from alembic import context
 from app.database import Base
 from app.models import Event, Content, MailingListEntry, Dj, DjSocials, JSONList# noqa: F401 ensures metadata is populated
+from app.search import is_search_table
 
 
 load_dotenv()
@@ -74,6 +75,13 @@ config.set_main_option("sqlalchemy.url", database_url)
 
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Leave the FTS5 search tables, which are managed by raw SQL, out of autogenerate."""
+    if type_ == "table" and reflected and is_search_table(name):
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -96,6 +104,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -119,7 +128,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
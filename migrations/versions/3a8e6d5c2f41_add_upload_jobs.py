@@ -0,0 +1,48 @@
+"""add upload jobs
+
+Revision ID: 3a8e6d5c2f41
+Revises: 9c4f2b7d1e3a
+Create Date: 2026-10-17 18:40:27.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a8e6d5c2f41'
+down_revision: Union[str, Sequence[str], None] = '9c4f2b7d1e3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('upload_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=True),
+    sa.Column('folder', sa.String(length=255), nullable=True),
+    sa.Column('filename', sa.String(length=255), nullable=True),
+    sa.Column('file_path', sa.String(length=1024), nullable=True),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('secure_url', sa.String(length=1024), nullable=True),
+    sa.Column('public_id', sa.String(length=255), nullable=True),
+    sa.Column('format', sa.String(length=16), nullable=True),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_upload_jobs_status'), 'upload_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_upload_jobs_status'), table_name='upload_jobs')
+    op.drop_table('upload_jobs')
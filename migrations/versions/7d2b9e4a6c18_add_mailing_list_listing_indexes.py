@@ -0,0 +1,30 @@
+"""add mailing list listing indexes
+
+Revision ID: 7d2b9e4a6c18
+Revises: 3a8e6d5c2f41
+Create Date: 2026-10-17 18:52:40.127734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2b9e4a6c18'
+down_revision: Union[str, Sequence[str], None] = '3a8e6d5c2f41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_mailing_list_subscribed_created_at_id', 'mailing_list', ['subscribed', 'created_at', 'id'], unique=False)
+    op.create_index('ix_mailing_list_created_at_id', 'mailing_list', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_mailing_list_created_at_id', table_name='mailing_list')
+    op.drop_index('ix_mailing_list_subscribed_created_at_id', table_name='mailing_list')
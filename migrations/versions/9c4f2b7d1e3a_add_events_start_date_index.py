@@ -0,0 +1,29 @@
+"""add events start_date index
+
+Revision ID: 9c4f2b7d1e3a
+Revises: 5e555d80e983
+Create Date: 2026-10-17 18:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4f2b7d1e3a'
+down_revision: Union[str, Sequence[str], None] = '5e555d80e983'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The composite index also serves start_date-only filters as its leftmost prefix
+    op.create_index('ix_events_start_date_id', 'events', ['start_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_events_start_date_id', table_name='events')
@@ -0,0 +1,83 @@
+"""add fts5 search index
+
+Revision ID: b5f1c8e2a7d9
+Revises: 7d2b9e4a6c18
+Create Date: 2026-10-17 19:14:03.562871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5f1c8e2a7d9'
+down_revision: Union[str, Sequence[str], None] = '7d2b9e4a6c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Column weights for ranking: name, venue_name, description, lineup, genres
+SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+        name, venue_name, description, lineup, genres,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4 5 6 7 8'
+    )""",
+    "INSERT INTO events_fts(events_fts, rank) VALUES ('rank', 'bm25(10.0, 4.0, 1.0, 6.0, 3.0)')",
+    """CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts(rowid, name, venue_name, description, lineup, genres) VALUES (new.id, new.name, new.venue_name, new.description, (SELECT group_concat(value, ', ') FROM json_each(CASE WHEN json_valid(new.lineup) THEN new.lineup END)), (SELECT group_concat(value, ', ') FROM json_each(CASE WHEN json_valid(new.genres) THEN new.genres END)));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_fts_update
+        AFTER UPDATE OF name, venue_name, description, lineup, genres ON events BEGIN
+        DELETE FROM events_fts WHERE rowid = old.id;
+        INSERT INTO events_fts(rowid, name, venue_name, description, lineup, genres) VALUES (new.id, new.name, new.venue_name, new.description, (SELECT group_concat(value, ', ') FROM json_each(CASE WHEN json_valid(new.lineup) THEN new.lineup END)), (SELECT group_concat(value, ', ') FROM json_each(CASE WHEN json_valid(new.genres) THEN new.genres END)));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
+        DELETE FROM events_fts WHERE rowid = old.id;
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS djs_fts USING fts5(
+        alias, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4 5 6 7 8'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS djs_fts_insert AFTER INSERT ON djs BEGIN
+        INSERT INTO djs_fts(rowid, alias) VALUES (new.id, new.alias);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS djs_fts_update AFTER UPDATE OF alias ON djs BEGIN
+        DELETE FROM djs_fts WHERE rowid = old.id;
+        INSERT INTO djs_fts(rowid, alias) VALUES (new.id, new.alias);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS djs_fts_delete AFTER DELETE ON djs BEGIN
+        DELETE FROM djs_fts WHERE rowid = old.id;
+    END""",
+]
+
+# Index the rows that already exist
+SEARCH_BACKFILL = [
+    "DELETE FROM events_fts",
+    """INSERT INTO events_fts(rowid, name, venue_name, description, lineup, genres)
+        SELECT id, name, venue_name, description,
+            (SELECT group_concat(value, ', ') FROM json_each(CASE WHEN json_valid(lineup) THEN lineup END)),
+            (SELECT group_concat(value, ', ') FROM json_each(CASE WHEN json_valid(genres) THEN genres END))
+        FROM events""",
+    "DELETE FROM djs_fts",
+    "INSERT INTO djs_fts(rowid, alias) SELECT id, alias FROM djs",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # FTS5 is SQLite-only; other backends go without search
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for statement in SEARCH_DDL + SEARCH_BACKFILL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for trigger in ("events_fts_insert", "events_fts_update", "events_fts_delete",
+                    "djs_fts_insert", "djs_fts_update", "djs_fts_delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS events_fts")
+    op.execute("DROP TABLE IF EXISTS djs_fts")
@@ -0,0 +1,86 @@
+"""add event genre and lineup tables
+
+Revision ID: e3a7c9d4b186
+Revises: b5f1c8e2a7d9
+Create Date: 2026-10-17 19:48:21.904415
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c9d4b186'
+down_revision: Union[str, Sequence[str], None] = 'b5f1c8e2a7d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+# Same keys as app.event_tags.normalize, inlined so the migration does not
+# change with the application code
+def normalize(value) -> str:
+    return " ".join(str(value).split()).casefold()
+
+
+def unique_keys(raw) -> list:
+    try:
+        values = json.loads(raw) if raw else []
+    except ValueError:
+        values = []
+    if not isinstance(values, list):
+        values = []
+    return list(dict.fromkeys(key for key in (normalize(value) for value in values) if key))
+
+
+def backfill(bind, genres_table, lineup_table) -> None:
+    dj_ids = {}
+    for dj_id, alias in sorted(bind.execute(sa.text("SELECT id, alias FROM djs")).all()):
+        if alias:
+            dj_ids.setdefault(normalize(alias), dj_id)
+    genre_rows = []
+    lineup_rows = []
+    for event_id, genres, lineup in bind.execute(sa.text("SELECT id, genres, lineup FROM events")):
+        genre_rows.extend({"event_id": event_id, "genre": genre} for genre in unique_keys(genres))
+        lineup_rows.extend(
+            {"event_id": event_id, "artist": artist, "dj_id": dj_ids.get(artist)}
+            for artist in unique_keys(lineup)
+        )
+    for table, rows in ((genres_table, genre_rows), (lineup_table, lineup_rows)):
+        for start in range(0, len(rows), BATCH_SIZE):
+            op.bulk_insert(table, rows[start:start + BATCH_SIZE])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    genres_table = op.create_table('event_genres',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('genre', sa.String(length=255), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id', 'genre')
+    )
+    op.create_index('ix_event_genres_genre_event_id', 'event_genres', ['genre', 'event_id'], unique=False)
+    lineup_table = op.create_table('event_lineup',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('artist', sa.String(length=255), nullable=False),
+    sa.Column('dj_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['dj_id'], ['djs.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id', 'artist')
+    )
+    op.create_index('ix_event_lineup_artist_event_id', 'event_lineup', ['artist', 'event_id'], unique=False)
+    op.create_index('ix_event_lineup_dj_id_event_id', 'event_lineup', ['dj_id', 'event_id'], unique=False)
+    backfill(op.get_bind(), genres_table, lineup_table)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_event_lineup_dj_id_event_id', table_name='event_lineup')
+    op.drop_index('ix_event_lineup_artist_event_id', table_name='event_lineup')
+    op.drop_table('event_lineup')
+    op.drop_index('ix_event_genres_genre_event_id', table_name='event_genres')
+    op.drop_table('event_genres')
@@ -1,10 +1,6 @@
 import uvicorn
 import os
-from dotenv import load_dotenv
-from app.main import app  # Import the app object from app.main
-
-# Load environment variables
-load_dotenv()
+from app.main import app  # Import the app object from app.main; it loads .env
 
 if __name__ == "__main__":
     # port = os.getenv("PORT")
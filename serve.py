@@ -0,0 +1,63 @@
+"""
+Production entry point: one-off startup work, then uvicorn with several worker
+processes sharing the SQLite database (WAL, so readers in every worker run
+alongside the one writer) and their cache invalidations.
+
+    WEB_CONCURRENCY=4 python serve.py
+
+run.py stays the single-process development server with reload.
+"""
+import argparse
+import asyncio
+import logging
+import os
+
+import uvicorn
+
+from app import database, models  # models registers the tables for ensure_schema
+from app.upload_jobs import upload_queue
+
+logger = logging.getLogger("serve")
+
+# Not the CPU count: in a container that is the host's, and every worker holds its
+# own caches, connection pool and batcher, enough to run a small instance out of memory
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY") or "1")
+
+async def requeue_interrupted_uploads() -> None:
+    await upload_queue.requeue_interrupted()
+    await database.async_engine.dispose()
+
+def prepare() -> None:
+    """
+    Work that must run once per deployment rather than once per worker: creating
+    the schema (workers racing on create_all would fail), and requeueing uploads
+    a previous run left running (a worker doing it would requeue its siblings' jobs).
+    """
+    if database.ensure_schema():
+        logger.info("Database schema created or updated")
+    asyncio.run(requeue_interrupted_uploads())
+    database.engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="default: $WEB_CONCURRENCY or 1")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    args = parser.parse_args()
+
+    prepare()
+    # Workers read it through settings.workers: above 1 they share invalidations
+    # and skip the work prepare() has done
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+    )
+
+if __name__ == "__main__":
+    main()